@@ -2,6 +2,7 @@
     Missing Updates by Device
     Description: Returns count of missing updates per device
     Views Used: v_R_System_Valid, v_UpdateComplianceStatus, v_UpdateInfo
+    Profile: reporting
 */
 
 SELECT
@@ -2,6 +2,7 @@
     Missing Updates Detail
     Description: Returns detailed list of missing updates with KB article info
     Views Used: v_R_System_Valid, v_UpdateComplianceStatus, v_UpdateInfo
+    Profile: reporting
 */
 
 SELECT
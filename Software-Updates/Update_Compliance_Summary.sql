@@ -2,6 +2,7 @@
     Software Update Compliance Summary
     Description: Returns overall patch compliance status by update classification
     Views Used: v_R_System_Valid, v_UpdateComplianceStatus, v_UpdateInfo
+    Profile: reporting
 */
 
 SELECT
@@ -2,6 +2,7 @@
     Update Deployment Status
     Description: Returns deployment status for software update groups
     Views Used: v_CIAssignment, v_AuthListInfo, v_AssignmentTargetedMachines, v_UpdateComplianceStatus
+    Profile: reporting
 */
 
 SELECT
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Dashboard Generator Benchmark Suite
+
+Times the generator's hot paths on synthetic data and records throughput and
+peak RSS for each case:
+
+- write_table: 1k / 100k / 1M rows x 2 and 10 columns (normal engine up to
+  100k rows, streaming engine at every size)
+- make_pie / make_bar with 10, 100 and 1000 categories
+- inject_connections on the default dashboard and on a very large workbook
+- read_sql over every .sql file, cold (index rebuilt) and warm
+- main() end to end, with sample data and against the SQLite stand-in
+
+Every case runs in a fresh child process so peak RSS belongs to that case
+alone. Results are written as JSON; --compare fails (exit code 1) when a
+case's throughput drops or its peak memory grows past --threshold relative
+to a stored baseline.
+
+    python3 bench_suite.py --output results.json
+    python3 bench_suite.py --quick --compare baseline.json --threshold 0.15
+    python3 bench_suite.py --cases write_table inject --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+DASHBOARDS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DASHBOARDS_DIR)
+
+from bench_write_table import peak_rss_mb, synthetic_rows  # noqa: E402
+
+FULL_ROWS = [1000, 100000, 1000000]
+QUICK_ROWS = [1000, 10000]
+NORMAL_ENGINE_MAX_ROWS = 100000
+COLUMNS = [2, 10]
+CATEGORIES = [10, 100, 1000]
+LARGE_WORKBOOK_ROWS = {"full": 500000, "quick": 50000}
+STANDIN_DEVICES = {"full": 20000, "quick": 2000}
+
+
+# ── Cases (run in the child process) ─────────────────────────────────────────
+def case_write_table(fixtures, engine, rows, cols):
+    import generate_dashboard as gd
+
+    headers = [f"Column {c + 1}" for c in range(cols)]
+    out = os.path.join(fixtures, f"write_table_{os.getpid()}.xlsx")
+    start = time.perf_counter()
+    wb = gd.DashboardWorkbook(streaming=(engine == "stream"))
+    wb.remove(wb.active)
+    ws = wb.create_sheet("Bench")
+    r = gd.add_title(ws, "Benchmark", "write_table throughput")
+    gd.write_table(ws, headers, synthetic_rows(rows, cols), r, name="Bench")
+    wb.save(out)
+    elapsed = time.perf_counter() - start
+    os.remove(out)
+    return elapsed, rows, "rows/s"
+
+
+def case_chart(fixtures, kind, categories):
+    import generate_dashboard as gd
+
+    out = os.path.join(fixtures, f"chart_{os.getpid()}.xlsx")
+    start = time.perf_counter()
+    wb = gd.DashboardWorkbook()
+    ws = wb.active
+    ws.append(["Category", "Count"])
+    for i in range(categories):
+        ws.append([f"Category {i}", (i * 37) % 101 + 1])
+    make = gd.make_pie if kind == "pie" else gd.make_bar
+    for i in range(10):
+        make(ws, f"Chart {i}", 1, 2, 1, categories + 1, f"D{1 + i * 20}")
+    wb.save(out)
+    elapsed = time.perf_counter() - start
+    os.remove(out)
+    return elapsed, 10 * categories, "points/s"
+
+
+def case_inject(fixtures, size):
+    import generate_dashboard as gd
+
+    src = os.path.join(fixtures, f"inject_{size}.xlsx")
+    work = os.path.join(fixtures, f"inject_{size}_{os.getpid()}.xlsx")
+    shutil.copyfile(src, work)
+    connections = [{"id": i, "name": f"MECM - {name}", "sql": info["sql"]}
+                   for i, (name, info) in enumerate(gd.build_query_catalog().items(), start=1)]
+    size_mb = os.path.getsize(work) / (1024 * 1024)
+    start = time.perf_counter()
+    gd.inject_connections(work, connections)
+    elapsed = time.perf_counter() - start
+    os.remove(work)
+    return elapsed, size_mb, "MiB/s"
+
+
+def case_read_sql(fixtures, state):
+    import sql_catalog
+
+    index = os.path.join(fixtures, "sql_catalog.json")
+    if state == "cold" and os.path.exists(index):
+        os.remove(index)
+    elif state == "warm":
+        sql_catalog.SqlCatalog.load(index_path=index)
+    start = time.perf_counter()
+    catalog = sql_catalog.SqlCatalog.load(index_path=index)
+    total = sum(len(entry["sql"]) for entry in catalog)
+    elapsed = time.perf_counter() - start
+    assert total
+    return elapsed, len(catalog), "files/s"
+
+
+def case_main(fixtures, mode):
+    import generate_dashboard as gd
+
+    out = os.path.join(fixtures, f"main_{os.getpid()}.xlsx")
+    argv = ["--output", out]
+    if mode == "standin":
+        argv += ["--standin", os.path.join(fixtures, "standin.db"), "--no-cache"]
+    start = time.perf_counter()
+    gd.main(argv)
+    elapsed = time.perf_counter() - start
+    os.remove(out)
+    return elapsed, 1, "runs/s"
+
+
+CASES = {
+    "write_table": case_write_table,
+    "chart": case_chart,
+    "inject": case_inject,
+    "read_sql": case_read_sql,
+    "main": case_main,
+}
+
+
+def plan(groups, quick):
+    """Return [(case id, group, args)] for the selected case groups."""
+    tier = "quick" if quick else "full"
+    cases = []
+    if "write_table" in groups:
+        for rows in (QUICK_ROWS if quick else FULL_ROWS):
+            for cols in COLUMNS:
+                for engine in ("normal", "stream"):
+                    if engine == "normal" and rows > NORMAL_ENGINE_MAX_ROWS:
+                        continue
+                    cases.append((f"write_table/{engine}/{rows}x{cols}", "write_table",
+                                  [engine, rows, cols]))
+    if "chart" in groups:
+        for kind in ("pie", "bar"):
+            for n in CATEGORIES:
+                cases.append((f"chart/{kind}/{n}", "chart", [kind, n]))
+    if "inject" in groups:
+        for size in ("small", "large"):
+            cases.append((f"inject/{size}" + (f"/{LARGE_WORKBOOK_ROWS[tier]}rows"
+                                              if size == "large" else ""), "inject", [size]))
+    if "read_sql" in groups:
+        for state in ("cold", "warm"):
+            cases.append((f"read_sql/{state}", "read_sql", [state]))
+    if "main" in groups:
+        for mode in ("sample", "standin"):
+            cases.append((f"main/{mode}", "main", [mode]))
+    return cases
+
+
+# ── Fixtures (built once in the parent) ──────────────────────────────────────
+def build_fixtures(fixtures, groups, quick):
+    tier = "quick" if quick else "full"
+    if "inject" in groups:
+        import generate_dashboard as gd
+
+        gd.main(["--output", os.path.join(fixtures, "inject_small.xlsx")])
+        wb = gd.DashboardWorkbook(streaming=True)
+        wb.remove(wb.active)
+        ws = wb.create_sheet("Large")
+        r = gd.add_title(ws, "Large", "inject_connections fixture")
+        gd.write_table(ws, [f"Column {c + 1}" for c in range(10)],
+                       synthetic_rows(LARGE_WORKBOOK_ROWS[tier], 10), r, name="Large")
+        wb.save(os.path.join(fixtures, "inject_large.xlsx"))
+    if "main" in groups:
+        from standin_db import create_standin
+        create_standin(os.path.join(fixtures, "standin.db"), devices=STANDIN_DEVICES[tier])
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+def run_child(fixtures, group, args):
+    """Run one case in this process and print a JSON result line."""
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            elapsed, amount, unit = CASES[group](fixtures, *args)
+        finally:
+            sys.stdout = stdout
+    print(json.dumps({"seconds": elapsed, "throughput": amount / elapsed if elapsed else None,
+                      "unit": unit, "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(fixtures, group, args, repeat):
+    """Best of repeat runs, each in a fresh child process."""
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", fixtures, group,
+             json.dumps(args)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        res = json.loads(out.strip().splitlines()[-1])
+        if best is None or res["seconds"] < best["seconds"]:
+            best = res
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DASHBOARDS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages against a baseline results file."""
+    base = {r["id"]: r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'Case':<36} {'Throughput':>12} {'Baseline':>12} {'Change':>8} "
+          f"{'RSS':>8} {'Baseline':>9}")
+    for res in results:
+        old = base.get(res["id"])
+        if old is None:
+            continue
+        change = res["throughput"] / old["throughput"] - 1
+        rss_change = res["peak_rss_mb"] / old["peak_rss_mb"] - 1
+        print(f"{res['id']:<36} {res['throughput']:>12.1f} {old['throughput']:>12.1f} "
+              f"{change:>+8.1%} {res['peak_rss_mb']:>8.1f} {old['peak_rss_mb']:>9.1f}")
+        if change < -threshold:
+            regressions.append(f"{res['id']}: throughput {change:+.1%}")
+        if rss_change > threshold:
+            regressions.append(f"{res['id']}: peak RSS {rss_change:+.1%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard generator.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES),
+                        help="case groups to run (default: all)")
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes for a fast check (write_table up to 10k rows)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per case; the fastest is kept (default: 1)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="fail if a case regressed against this results file")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed throughput drop / peak RSS growth (default: 0.10)")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        fixtures, group, case_args = args.child
+        run_child(fixtures, group, json.loads(case_args))
+        return
+
+    cases = plan(args.cases, args.quick)
+    fixtures = tempfile.mkdtemp(prefix="mecm_bench_")
+    results = []
+    try:
+        print("Building fixtures...")
+        build_fixtures(fixtures, args.cases, args.quick)
+        print(f"{'Case':<36} {'Seconds':>9} {'Throughput':>16} {'Peak RSS (MiB)':>15}")
+        for case_id, group, case_args in cases:
+            res = measure(fixtures, group, case_args, args.repeat)
+            res["id"] = case_id
+            results.append(res)
+            print(f"{case_id:<36} {res['seconds']:>9.3f} "
+                  f"{res['throughput']:>10.1f} {res['unit']:<5} {res['peak_rss_mb']:>15.1f}")
+    finally:
+        shutil.rmtree(fixtures, ignore_errors=True)
+
+    import openpyxl
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "openpyxl": openpyxl.__version__,
+            "quick": args.quick,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) past {args.threshold:.0%}:")
+            for msg in regressions:
+                print(f"  {msg}")
+            sys.exit(1)
+        print(f"\nNo regressions past {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
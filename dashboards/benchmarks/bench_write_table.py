@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+write_table Benchmark: normal vs streaming (write-only) engine
+
+Writes a synthetic per-device table (shaped like Installed_Software.sql
+output) through each engine and reports rows/sec and peak RSS. Every
+measurement runs in a fresh child process so peak RSS is not polluted by
+earlier runs.
+
+    python3 bench_write_table.py --rows 10000 100000 --cols 7
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENGINES = ["normal", "stream"]
+
+
+def synthetic_rows(n_rows, n_cols):
+    """Yield rows of mixed strings and integers without materialising them."""
+    publishers = ["Microsoft Corporation", "Google LLC", "Adobe Inc.", "Igor Pavlov"]
+    for i in range(n_rows):
+        row = [f"PC-{i // 40:06d}", f"user{i % 997:04d}", f"Software Title {i % 1500}",
+               f"{i % 17}.{i % 100}.{i % 1000}", publishers[i % len(publishers)],
+               "2025-01-15", i]
+        yield tuple(row[c % len(row)] for c in range(n_cols))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    # VmHWM is reset by exec, unlike ru_maxrss which a child inherits from its parent
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS reports bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil  # Windows
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+
+
+def run_child(engine, n_rows, n_cols):
+    """Measure one engine in this process and print a JSON result line."""
+    import generate_dashboard as gd
+
+    headers = [f"Column {c + 1}" for c in range(n_cols)]
+    rows = synthetic_rows(n_rows, n_cols)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        wb = gd.DashboardWorkbook(streaming=(engine == "stream"))
+        wb.remove(wb.active)
+        ws = wb.create_sheet("Bench")
+        r = gd.add_title(ws, "Benchmark", "write_table throughput")
+        gd.write_table(ws, headers, rows, r, name="Bench")
+        wb.save(os.path.join(tmp, "bench.xlsx"))
+        elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "engine": engine, "rows": n_rows, "cols": n_cols,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(n_rows / elapsed) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }))
+
+
+def measure(engine, n_rows, n_cols):
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", engine,
+         "--rows", str(n_rows), "--cols", str(n_cols)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark write_table engines.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--cols", type=int, default=7)
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=ENGINES)
+    parser.add_argument("--child", choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.rows[0], args.cols)
+        return
+
+    print(f"{'Engine':<8} {'Rows':>10} {'Cols':>5} {'Seconds':>9} {'Rows/sec':>10} "
+          f"{'Peak RSS (MiB)':>15}")
+    for n_rows in args.rows:
+        for engine in args.engines:
+            res = measure(engine, n_rows, args.cols)
+            print(f"{engine:<8} {res['rows']:>10} {res['cols']:>5} {res['seconds']:>9} "
+                  f"{res['rows_per_sec']:>10} {res['peak_rss_mb']:>15}")
+
+
+if __name__ == "__main__":
+    main()
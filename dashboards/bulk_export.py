@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Streaming CSV/JSONL Export
+
+Exports the raw rows of catalog queries straight from the cursor to CSV or
+JSON Lines, without building a workbook: no styling, no openpyxl, and no
+1,048,576-row sheet limit. Rows are pulled with fetchmany() and written as
+they arrive, so memory stays at one fetch batch however large the result.
+Headers are the query's column aliases from cursor.description.
+
+Queries are picked from the SQL catalog by name or title, by folder, by a
+view they use, or all at once. Each is written to <out>/<query>.csv or
+.jsonl, optionally gzip- or zstd-compressed (.gz / .zst):
+
+    python3 bulk_export.py Missing_Updates_By_Device Low_Disk_Space --compress gzip
+    python3 bulk_export.py --folder Collections --format jsonl --standin standin.db
+    python3 bulk_export.py --view v_GS_LOGICAL_DISK --out exports
+
+zstd uses the standard library on Python 3.14+, or the zstandard package:
+pip install zstandard
+"""
+
+import argparse
+import csv
+import datetime
+import decimal
+import gzip
+import io
+import json
+import os
+import time
+
+from query_executor import prepare_query
+from sql_catalog import get_catalog
+
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports")
+FORMATS = {"csv": ".csv", "jsonl": ".jsonl"}
+COMPRESSION = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+
+# ── Selection ────────────────────────────────────────────────────────────────
+def select_queries(names=(), folders=(), views=(), everything=False):
+    """Catalog entries named, in one of folders, or using one of views; each once."""
+    catalog = get_catalog()
+    if everything:
+        return list(catalog)
+    selected = {}
+    for name in names:
+        try:
+            entry = catalog.get(name)
+        except KeyError as exc:
+            raise SystemExit(exc.args[0])
+        selected[entry["path"]] = entry
+    wanted = {f.lower() for f in folders}
+    for entry in catalog:
+        if entry["folder"].lower() in wanted:
+            selected[entry["path"]] = entry
+    for view in views:
+        for entry in catalog.by_view(view):
+            selected[entry["path"]] = entry
+    return list(selected.values())
+
+
+# ── Writers ──────────────────────────────────────────────────────────────────
+def open_output(path, compression):
+    """Open path for text writing through the chosen compressor."""
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6)
+    if compression == "zstd":
+        try:
+            from compression import zstd
+            return zstd.open(path, "wt", encoding="utf-8", newline="")
+        except ImportError:
+            pass
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd compression requires zstandard: pip install zstandard")
+        raw = open(path, "wb")
+        writer = zstandard.ZstdCompressor(level=3).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def json_value(value):
+    """JSON fallback for the non-JSON types a cursor returns."""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+def write_csv(f, columns, chunks):
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    rows = 0
+    for chunk in chunks:
+        writer.writerows(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def write_jsonl(f, columns, chunks):
+    encode = json.JSONEncoder(default=json_value, ensure_ascii=False,
+                              separators=(",", ":")).encode
+    rows = 0
+    for chunk in chunks:
+        f.write("".join(encode(dict(zip(columns, row))) + "\n" for row in chunk))
+        rows += len(chunk)
+    return rows
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+# ── Export ───────────────────────────────────────────────────────────────────
+def export_query(conn, entry, out_dir=EXPORT_DIR, fmt="csv", compression="none",
+                 values=None, fetch_size=5000, timeout=None):
+    """
+    Stream one catalog query's rows to a file; returns (path, rows). The file
+    is written under a temporary name and renamed when complete.
+    """
+    query = prepare_query(entry, values)
+    path = os.path.join(out_dir, entry["name"] + FORMATS[fmt] + COMPRESSION[compression])
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    conn.timeout = int(timeout or 0)
+    cur = conn.cursor()
+    try:
+        if query["input_sizes"] and query["params"]:
+            cur.setinputsizes(query["input_sizes"])
+        cur.execute(query["command"], query["params"])
+        columns = [d[0] for d in cur.description]
+        with open_output(tmp_path, compression) as f:
+            rows = WRITERS[fmt](f, columns, iter(lambda: cur.fetchmany(fetch_size), []))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cur.close()
+    return path, rows
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    from delta_refresh import parse_param
+    from generate_dashboard import add_connection_args, open_connection
+
+    parser = argparse.ArgumentParser(description="Stream query results to CSV or JSON Lines.")
+    parser.add_argument("queries", nargs="*", metavar="QUERY",
+                        help="catalog queries by file name, title or path")
+    parser.add_argument("--folder", action="append", default=[],
+                        help="export every query in a folder, e.g. Software-Updates (repeatable)")
+    parser.add_argument("--view", action="append", default=[],
+                        help="export every query using a view (repeatable)")
+    parser.add_argument("--all", action="store_true", help="export every catalog query")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--compress", choices=list(COMPRESSION), default="none")
+    parser.add_argument("--out", default=EXPORT_DIR, help="output directory")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a DECLARE default, e.g. MinFreeGB=20")
+    add_connection_args(parser)
+    parser.add_argument("--fetch-size", type=int, default=5000)
+    parser.add_argument("--query-timeout", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    entries = select_queries(args.queries, args.folder, args.view, args.all)
+    if not entries:
+        parser.error("no queries selected: name queries or use --folder, --view or --all")
+    if args.compress == "zstd":
+        open_output(os.devnull, "zstd").close()
+
+    conn = open_connection(args)
+
+    values = dict(parse_param(p) for p in args.param)
+    try:
+        for entry in entries:
+            declared = {p["name"] for p in entry["params"]}
+            start = time.perf_counter()
+            path, rows = export_query(conn, entry, args.out, args.format, args.compress,
+                                      {k: v for k, v in values.items() if k in declared},
+                                      fetch_size=args.fetch_size, timeout=args.query_timeout)
+            print(f"  {entry['name']}: {rows} rows -> {os.path.relpath(path)} "
+                  f"({os.path.getsize(path) / 1048576:.1f} MB, "
+                  f"{time.perf_counter() - start:.2f}s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Dashboard Data Service
+
+A small HTTP service that runs the dashboard query catalog once per interval
+and serves each table from memory, so workbook readers refreshing their
+data put no load on the site database: it takes the catalog's 14 queries
+per interval however many people hit Refresh All.
+
+    python3 data_service.py --standin standin.db --port 8765 --interval 300
+    python3 generate_dashboard.py --data-url http://reports01:8765
+
+Endpoints:
+
+    GET /                          index of tables (JSON)
+    GET /tables/<table>.json       {"name", "columns", "rows", "refreshed"}
+    GET /tables/<table>.csv        header row + rows
+    GET /tables/<table>.html       one <table>, for Excel web queries
+
+<table> is the query name in lower case with hyphens (os-count-summary).
+Responses carry a content-hash ETag and honour If-None-Match with 304 Not
+Modified; they are gzip-compressed for clients that accept it. A query that
+fails keeps serving its last good result. Bodies are rendered once per
+refresh, not per request.
+
+The service has no authentication and binds to 127.0.0.1 unless --host is
+given. Without --standin it queries SQL Server with --conn-str.
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import html
+import io
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FORMATS = {
+    "json": "application/json; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+}
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 300
+
+
+def table_slug(name):
+    """URL name of a dashboard table: 'OS Count Summary' -> 'os-count-summary'."""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def render(fmt, name, columns, rows, refreshed):
+    """Response body for one table in one format."""
+    if fmt == "json":
+        return json.dumps({"name": name, "columns": columns, "rows": rows,
+                           "refreshed": refreshed}, default=str).encode("utf-8")
+    if fmt == "csv":
+        out = io.StringIO(newline="")
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return out.getvalue().encode("utf-8")
+    cells = ["<tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in columns) + "</tr>"]
+    for row in rows:
+        cells.append("<tr>" + "".join(f"<td>{html.escape(_text(v))}</td>" for v in row)
+                     + "</tr>")
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{html.escape(name)}"
+            f"</title></head><body><table id=\"data\">" + "".join(cells)
+            + "</table></body></html>").encode("utf-8")
+
+
+class Representation:
+    """One rendered body with its ETag and gzip-compressed form."""
+
+    def __init__(self, body, last_modified):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = last_modified
+
+
+# ── Data ─────────────────────────────────────────────────────────────────────
+class DashboardData:
+    """
+    The latest results of the query catalog, rendered per table and format.
+    refresh() runs the catalog on a warm connection pool and swaps in the new
+    representations; a table keeps its Last-Modified while its body is unchanged.
+    """
+
+    def __init__(self, pool, catalog, workers=4, timeout=120, batches=None):
+        self.pool = pool
+        self.catalog = catalog
+        self.workers = workers
+        self.timeout = timeout
+        self.batches = batches
+        self.tables = {}
+        self.index = None
+        self.refreshed = None
+
+    def refresh(self):
+        from query_executor import run_queries
+
+        start = time.perf_counter()
+        results = run_queries(self.pool, self.catalog, workers=self.workers,
+                              timeout=self.timeout, log=lambda msg: None, batches=self.batches)
+        now = datetime.now(timezone.utc)
+        refreshed = now.isoformat(timespec="seconds")
+        tables, failed, changed = dict(self.tables), [], 0
+        for name, res in results.items():
+            if res["error"]:
+                failed.append(name)
+                continue
+            slug = table_slug(name)
+            old = self.tables.get(slug, {})
+            reps = {}
+            for fmt in FORMATS:
+                body = render(fmt, name, res["columns"], res["rows"],
+                              refreshed if fmt == "json" else None)
+                prev = old.get(fmt)
+                if prev is not None and fmt != "json" and prev.body == body:
+                    reps[fmt] = prev
+                else:
+                    reps[fmt] = Representation(body, now)
+            # JSON carries the refresh time: keep the old body when the data is the same
+            if old.get("csv") is reps["csv"]:
+                reps["json"] = old["json"]
+            else:
+                changed += 1
+            tables[slug] = dict(reps, name=name, rows=len(res["rows"]))
+        self.tables = tables
+        self.refreshed = refreshed
+        self.index = Representation(json.dumps({
+            "refreshed": refreshed,
+            "tables": [{"name": t["name"], "rows": t["rows"],
+                        **{fmt: f"/tables/{slug}.{fmt}" for fmt in FORMATS}}
+                       for slug, t in tables.items()],
+        }).encode("utf-8"), now)
+        print(f"[{refreshed}] refreshed {len(results)} queries in "
+              f"{time.perf_counter() - start:.2f}s: {changed} changed"
+              + (f", failed (serving last result): {', '.join(failed)}" if failed else ""))
+
+    def lookup(self, path):
+        """Return (representation, content type) for a request path, or None."""
+        if path in ("/", "/index.json"):
+            return (self.index, FORMATS["json"]) if self.index else None
+        m = re.fullmatch(r"/tables/([a-z0-9-]+)\.(json|csv|html)", path)
+        if not m or m.group(1) not in self.tables:
+            return None
+        return self.tables[m.group(1)][m.group(2)], FORMATS[m.group(2)]
+
+
+# ── HTTP ─────────────────────────────────────────────────────────────────────
+def etag_matches(header, etag):
+    """True if an If-None-Match header value matches etag (weak comparison)."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+class DataRequestHandler(BaseHTTPRequestHandler):
+    server_version = "MECMDashboardData/1.0"
+    data = None
+    max_age = DEFAULT_INTERVAL
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        found = self.data.lookup(self.path.split("?", 1)[0])
+        if found is None:
+            self.send_error(404, "no such table")
+            return
+        rep, content_type = found
+        if etag_matches(self.headers.get("If-None-Match", ""), rep.etag):
+            self.send_response(304)
+            self._cache_headers(rep)
+            self.end_headers()
+            return
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "").lower()
+        body = rep.gzipped if gzipped else rep.body
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self._cache_headers(rep)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _cache_headers(self, rep):
+        self.send_header("ETag", rep.etag)
+        self.send_header("Last-Modified", format_datetime(rep.last_modified, usegmt=True))
+        self.send_header("Cache-Control", f"max-age={self.max_age}")
+        self.send_header("Vary", "Accept-Encoding")
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def serve(data, host, port, interval):
+    """Serve data until interrupted, refreshing it every interval seconds."""
+    handler = type("Handler", (DataRequestHandler,), {"data": data, "max_age": int(interval)})
+    server = ThreadingHTTPServer((host, port), handler)
+    stop = threading.Event()
+
+    def refresher():
+        while not stop.wait(interval):
+            try:
+                data.refresh()
+            except Exception as exc:
+                print(f"Warning: refresh failed, serving the previous results: {exc}")
+
+    thread = threading.Thread(target=refresher, name="refresh", daemon=True)
+    thread.start()
+    print(f"Serving {len(data.tables)} tables on http://{host}:{server.server_address[1]}/ "
+          f"(refresh every {interval:g}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    import generate_dashboard as gd
+
+    parser = argparse.ArgumentParser(description="Serve the dashboard tables over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to bind (default: 127.0.0.1; 0.0.0.0 for all)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"seconds between catalog runs (default: {DEFAULT_INTERVAL})")
+    parser.add_argument("--standin", metavar="PATH", help="use a SQLite stand-in database")
+    parser.add_argument("--conn-str", default=None,
+                        help="ODBC connection string (default: from --conn-profile)")
+    parser.add_argument("--conn-profile", default=gd.DEFAULT_PROFILE,
+                        choices=list(gd.CONNECTION_PROFILES),
+                        help="connection profile, as in generate_dashboard.py")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--query-timeout", type=int, default=120)
+    parser.add_argument("--top-n", type=int, default=None, metavar="N",
+                        help="rows kept per chart-backed table, as in generate_dashboard.py")
+    parser.add_argument("--no-batch", action="store_true")
+    parser.add_argument("--summary-tables", action="store_true",
+                        help="read the pre-aggregated rpt summary tables (reporting_schema.py)")
+    args = parser.parse_args(argv)
+
+    connect, target = gd.live_target(args, args.conn_profile)
+    catalog = gd.build_query_catalog()
+    if args.summary_tables:
+        gd.check_summary_tables(connect, target, args.query_timeout)
+        from reporting_schema import summary_catalog
+        catalog = summary_catalog(catalog)
+    catalog = gd.apply_profiles(gd.top_n_catalog(catalog, args.top_n), args.conn_profile)
+    with gd.profile_pools(args, args.workers) as pool:
+        data = DashboardData(pool, catalog, workers=args.workers, timeout=args.query_timeout,
+                             batches=gd.live_batches(args))
+        print(f"Running {len(catalog)} queries against {target}")
+        data.refresh()
+        serve(data, args.host, args.port, args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Incremental Delta Refresh for Per-Device Reports
+
+Keeps the previous result of a per-device query as a snapshot keyed by
+ResourceID and, on the next refresh, re-queries only the devices whose
+inventory timestamp moved past the stored high-water mark:
+
+- hardware/software inventory reports: v_CH_ClientSummary.LastHW
+- client activity reports: v_CH_ClientSummary.LastDDR
+- software update reports: v_UpdateScanStatus.LastScanTime
+
+The delta rows replace those devices' rows in the snapshot, devices that
+left v_R_System_Valid are dropped, and the merged result is re-sorted. A
+snapshot is rebuilt in full when the query text, parameters or target
+database change, when it is older than --max-age, or with --full.
+
+Devices whose timestamp is NULL are re-queried every time. Reports whose
+output drifts with the clock (Inactive_Clients' "Days Inactive") declare a
+recheck predicate so devices currently past the threshold are re-queried
+too. Changes made on the site server rather than reported by a client (a new
+software update deployment, for instance) only show up at the next full
+rebuild.
+
+    python3 delta_refresh.py Missing_Updates_By_Device Inactive_Clients --standin standin.db
+    python3 delta_refresh.py --all --full
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from query_executor import execute_query, prepare_query
+from sql_catalog import get_catalog, strip_order_by
+
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots")
+
+# Watermark name -> (view, timestamp column); one row per ResourceID
+WATERMARKS = {
+    "LastHW": ("v_CH_ClientSummary", "LastHW"),
+    "LastDDR": ("v_CH_ClientSummary", "LastDDR"),
+    "LastScanTime": ("v_UpdateScanStatus", "LastScanTime"),
+}
+
+# Per-device queries that support delta refresh. order_by restores the
+# query's ORDER BY on the merged rows: (output column, descending).
+# recheck: extra predicate on the watermark view (aliased wm) selecting
+# devices to re-query regardless of their timestamp, with the DECLARE
+# parameters bound to its ? markers.
+DELTA_QUERIES = {
+    "Computer_Summary": {"watermark": "LastHW", "order_by": [("Computer Name", False)]},
+    "Disk_Space": {"watermark": "LastHW",
+                   "order_by": [("Computer Name", False), ("Drive", False)]},
+    "Low_Disk_Space": {"watermark": "LastHW", "order_by": [("Free Space (GB)", False)]},
+    "Installed_Software": {"watermark": "LastHW",
+                           "order_by": [("Computer Name", False), ("Software Name", False)]},
+    "Windows11_Clients": {"watermark": "LastHW", "order_by": [("Computer Name", False)]},
+    "Server_Summary": {"watermark": "LastHW", "order_by": [("Computer Name", False)]},
+    "BitLocker_Status": {"watermark": "LastHW",
+                         "order_by": [("Computer Name", False), ("Drive", False)]},
+    "Secure_Boot_Status": {"watermark": "LastHW", "order_by": [("Computer Name", False)]},
+    "TPM_Status": {"watermark": "LastHW", "order_by": [("Computer Name", False)]},
+    "Missing_Updates_By_Device": {"watermark": "LastScanTime",
+                                  "order_by": [("Missing Updates", True)]},
+    "Inactive_Clients": {
+        "watermark": "LastDDR",
+        "recheck": ("DATEDIFF(DAY, wm.LastDDR, GETDATE()) > ?", ["InactiveDays"]),
+        "order_by": [("Days Inactive", True)],
+    },
+}
+
+
+# ── SQL ──────────────────────────────────────────────────────────────────────
+def candidates_sql(spec):
+    """Devices to re-query: timestamp NULL or past the high-water mark, or rechecked."""
+    view, column = WATERMARKS[spec["watermark"]]
+    sql = (f"SELECT sys.ResourceID FROM v_R_System_Valid sys "
+           f"LEFT JOIN {view} wm ON sys.ResourceID = wm.ResourceID "
+           f"WHERE wm.{column} IS NULL OR wm.{column} > DATEADD(SECOND, -?, ?)")
+    if spec.get("recheck"):
+        sql += f" OR {spec['recheck'][0]}"
+    return sql
+
+
+def recheck_params(spec, entry, values):
+    if not spec.get("recheck"):
+        return ()
+    defaults = {p["name"]: p["default"] for p in entry["params"]}
+    return tuple(values.get(n, defaults[n]) for n in spec["recheck"][1])
+
+
+# ── Snapshots ────────────────────────────────────────────────────────────────
+def snapshot_path(state_dir, name):
+    return os.path.join(state_dir, f"{name}.pickle")
+
+
+def load_snapshot(state_dir, name):
+    try:
+        with open(snapshot_path(state_dir, name), "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def save_snapshot(state_dir, name, snapshot):
+    os.makedirs(state_dir, exist_ok=True)
+    path = snapshot_path(state_dir, name)
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+
+
+def group_by_device(columns, rows):
+    """Return ResourceID -> [rows], keeping each device's rows in query order."""
+    if "ResourceID" not in columns:
+        raise ValueError("delta refresh needs a ResourceID column in the query output")
+    rid = columns.index("ResourceID")
+    devices = {}
+    for row in rows:
+        devices.setdefault(row[rid], []).append(row)
+    return devices
+
+
+def ordered_rows(columns, devices, order_by):
+    """Flatten a snapshot and apply order_by (NULLs sort lowest, as in SQL Server)."""
+    rows = [row for device_rows in devices.values() for row in device_rows]
+    for column, descending in reversed(order_by):
+        i = columns.index(column)
+        rows.sort(key=lambda r: (r[i] is not None, r[i] if r[i] is not None else 0),
+                  reverse=descending)
+    return rows
+
+
+# ── Refresh ──────────────────────────────────────────────────────────────────
+def refresh(conn, name, values=None, state_dir=STATE_DIR, full=False, max_age=24 * 3600,
+            overlap=3600, timeout=None, target=None):
+    """
+    Bring one query's snapshot up to date and return (columns, rows, stats).
+    values overrides DECLARE defaults; overlap (seconds) re-reads devices just
+    under the high-water mark to cover inventory that arrives out of order.
+    target names the database (connection_target), so a snapshot taken from
+    another database is rebuilt instead of merged.
+    """
+    values = values or {}
+    spec = DELTA_QUERIES[name]
+    entry = get_catalog().get(name)
+    query = prepare_query(entry, values)
+    key = hashlib.sha256(json.dumps([query["command"], [repr(p) for p in query["params"]],
+                                     spec["watermark"], target]).encode("utf-8")).hexdigest()
+    view, column = WATERMARKS[spec["watermark"]]
+    start = time.perf_counter()
+
+    snapshot = load_snapshot(state_dir, name)
+    if (snapshot is None or snapshot["key"] != key or snapshot["hwm"] is None
+            or time.time() - snapshot["full_at"] > max_age):
+        full = True
+
+    # Read the new high-water mark first so nothing reported meanwhile is missed
+    _, hwm = execute_query(conn, f"SELECT MAX({column}) FROM {view}", timeout=timeout)
+    hwm = hwm[0][0] if hwm else None
+
+    if full:
+        columns, rows = execute_query(conn, query["command"], query["params"], timeout=timeout,
+                                      input_sizes=query["input_sizes"])
+        devices = group_by_device(columns, rows)
+        snapshot = {"key": key, "columns": columns, "full_at": time.time()}
+        stats = {"mode": "full", "requeried": len(devices), "delta_rows": len(rows)}
+    else:
+        cand_sql = candidates_sql(spec)
+        cand_params = (overlap, snapshot["hwm"]) + recheck_params(spec, entry, values)
+        _, moved = execute_query(conn, cand_sql, cand_params, timeout=timeout)
+        _, valid = execute_query(conn, "SELECT ResourceID FROM v_R_System_Valid",
+                                 timeout=timeout)
+        delta_sql = (f"SELECT q.* FROM (\n{strip_order_by(query['command'])}\n) q\n"
+                     f"WHERE q.ResourceID IN ({cand_sql})")
+        delta_params = tuple(query["params"]) + cand_params
+        sizes = query["input_sizes"] and query["input_sizes"] + [None] * len(cand_params)
+        columns, rows = execute_query(conn, delta_sql, delta_params, timeout=timeout,
+                                      input_sizes=sizes)
+
+        moved = {r[0] for r in moved}
+        valid = {r[0] for r in valid}
+        devices = {rid: device_rows for rid, device_rows in snapshot["devices"].items()
+                   if rid in valid and rid not in moved}
+        devices.update(group_by_device(columns, rows))
+        stats = {"mode": "delta", "requeried": len(moved), "delta_rows": len(rows)}
+
+    snapshot.update({"devices": devices, "hwm": hwm, "refreshed": time.time()})
+    save_snapshot(state_dir, name, snapshot)
+    rows = ordered_rows(snapshot["columns"], devices, spec["order_by"])
+    stats.update({"rows": len(rows), "devices": len(devices),
+                  "elapsed": time.perf_counter() - start})
+    return snapshot["columns"], rows, stats
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def parse_param(text):
+    name, _, value = text.partition("=")
+    try:
+        return name.lstrip("@"), int(value)
+    except ValueError:
+        return name.lstrip("@"), value
+
+
+def main(argv=None):
+    from generate_dashboard import add_connection_args, connection_target, open_connection
+
+    parser = argparse.ArgumentParser(description="Incrementally refresh per-device reports.")
+    parser.add_argument("queries", nargs="*", metavar="QUERY",
+                        help=f"queries to refresh: {', '.join(DELTA_QUERIES)}")
+    parser.add_argument("--all", action="store_true", help="refresh every supported query")
+    parser.add_argument("--full", action="store_true", help="rebuild the snapshots in full")
+    parser.add_argument("--max-age", type=float, default=24,
+                        help="hours after which a snapshot is rebuilt in full (default: 24)")
+    parser.add_argument("--overlap", type=int, default=60,
+                        help="minutes re-read below the high-water mark (default: 60)")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a DECLARE default, e.g. InactiveDays=60")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="snapshot directory")
+    add_connection_args(parser)
+    parser.add_argument("--query-timeout", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    names = list(DELTA_QUERIES) if args.all else args.queries
+    unknown = [n for n in names if n not in DELTA_QUERIES]
+    if not names or unknown:
+        parser.error(f"choose queries from: {', '.join(DELTA_QUERIES)}")
+
+    conn = open_connection(args)
+
+    values = dict(parse_param(p) for p in args.param)
+    target = connection_target(args)
+    try:
+        for name in names:
+            declared = {p["name"] for p in get_catalog().get(name)["params"]}
+            _, _, stats = refresh(conn, name, {k: v for k, v in values.items() if k in declared},
+                                  state_dir=args.state_dir, full=args.full,
+                                  max_age=args.max_age * 3600, overlap=args.overlap * 60,
+                                  timeout=args.query_timeout, target=target)
+            print(f"  {name}: {stats['mode']} refresh, {stats['requeried']} devices re-queried, "
+                  f"{stats['delta_rows']} rows fetched, {stats['rows']} rows in snapshot, "
+                  f"{stats['elapsed']:.2f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
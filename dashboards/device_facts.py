@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Device Fact Snapshot
+
+Ten of the dashboard summaries (OS counts, feature updates, memory, device
+models, client versions, server OS versions and the four security
+summaries) are GROUP BYs over v_R_System_Valid joined to one inventory view
+each. With --device-facts the generator replaces them with a single query,
+FACT_SQL, returning one wide row per device, and computes all ten
+summaries locally with pandas group-bys: one pass over the system view on
+the server instead of ten.
+
+Each summary groups by the same raw columns as its server-side query and
+applies the same labels, filters and ORDER BY, so the rows match the
+server's. Every inventory view is pre-aggregated to one row per device
+(the highest value, as the security batch does); on a site where a view
+holds several rows for one device, that device is counted once.
+
+Update compliance and deployment summaries are not per-device facts and
+still run on the server.
+
+Requires pandas (and numpy): pip install pandas
+"""
+
+import time
+
+FACT_QUERY = "Device Facts"
+
+FACT_SQL = """SELECT
+    sys.ResourceID,
+    sys.Client_Version0 AS ClientVersion,
+    os.Caption AS OSCaption,
+    os.BuildNumber AS OSBuild,
+    CASE WHEN os.ResourceID IS NULL THEN 0 ELSE 1 END AS HasOS,
+    cs.Manufacturer,
+    cs.Model,
+    CASE WHEN cs.ResourceID IS NULL THEN 0 ELSE 1 END AS HasComputerSystem,
+    enc.ChassisType,
+    mem.TotalPhysicalMemory,
+    CASE WHEN mem.ResourceID IS NULL THEN 0 ELSE 1 END AS HasMemory,
+    bd.ProtectionStatus,
+    fw.SecureBoot,
+    wds.RealTimeProtection,
+    tpm.IsActivated
+FROM v_R_System_Valid sys
+LEFT JOIN (
+    SELECT ResourceID, MAX(Caption0) AS Caption, MAX(BuildNumber0) AS BuildNumber
+    FROM v_GS_OPERATING_SYSTEM
+    GROUP BY ResourceID
+) os ON sys.ResourceID = os.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(Manufacturer0) AS Manufacturer, MAX(Model0) AS Model
+    FROM v_GS_COMPUTER_SYSTEM
+    GROUP BY ResourceID
+) cs ON sys.ResourceID = cs.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(ChassisTypes0) AS ChassisType
+    FROM v_GS_SYSTEM_ENCLOSURE
+    GROUP BY ResourceID
+) enc ON sys.ResourceID = enc.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(TotalPhysicalMemory0) AS TotalPhysicalMemory
+    FROM v_GS_X86_PC_MEMORY
+    GROUP BY ResourceID
+) mem ON sys.ResourceID = mem.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(ProtectionStatus0) AS ProtectionStatus
+    FROM v_GS_BITLOCKER_DETAILS
+    WHERE DriveLetter0 = 'C:'
+    GROUP BY ResourceID
+) bd ON sys.ResourceID = bd.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(SecureBoot0) AS SecureBoot
+    FROM v_GS_FIRMWARE
+    GROUP BY ResourceID
+) fw ON sys.ResourceID = fw.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(RealTimeProtectionEnabled0) AS RealTimeProtection
+    FROM v_GS_WINDOWS_DEFENDER_STATUS
+    GROUP BY ResourceID
+) wds ON sys.ResourceID = wds.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(IsActivated_InitialValue0) AS IsActivated
+    FROM v_GS_TPM
+    GROUP BY ResourceID
+) tpm ON sys.ResourceID = tpm.ResourceID"""
+
+# Labels from the CASE expressions of the server-side queries
+FEATURE_UPDATES = {
+    "19041": "2004", "19042": "20H2", "19043": "21H1", "19044": "21H2", "19045": "22H2",
+    "22000": "21H2", "22621": "22H2", "22631": "23H2", "26100": "24H2",
+}
+CHASSIS_TYPES = {
+    1: "Other", 2: "Unknown", 3: "Desktop", 4: "Low Profile Desktop", 5: "Pizza Box",
+    6: "Mini Tower", 7: "Tower", 8: "Portable", 9: "Laptop", 10: "Notebook",
+    11: "Hand Held", 12: "Docking Station", 13: "All in One", 14: "Sub Notebook",
+    15: "Space-Saving", 16: "Lunch Box", 17: "Main System Chassis", 18: "Expansion Chassis",
+    19: "Sub Chassis", 20: "Bus Expansion Chassis", 21: "Peripheral Chassis",
+    22: "Storage Chassis", 23: "Rack Mount Chassis", 24: "Sealed-Case PC",
+}
+SERVER_VERSIONS = ["2022", "2019", "2016", "2012 R2", "2012", "2008 R2", "2008"]
+# Security summaries: fact column, output column, value labels
+SECURITY_SUMMARIES = {
+    "BitLocker Protection Summary": ("ProtectionStatus", "Protection Status",
+                                     {0: "Protection Off", 1: "Protection On"}),
+    "Secure Boot Summary": ("SecureBoot", "Secure Boot Status",
+                            {1: "Enabled", 0: "Disabled"}),
+    "Defender Real-Time Protection Summary": ("RealTimeProtection", "Real-Time Protection",
+                                              {1: "Enabled", 0: "Disabled"}),
+    "TPM Status Summary": ("IsActivated", "TPM Status", {1: "Activated", 0: "Not Activated"}),
+}
+FACT_SUMMARIES = [
+    "OS Count Summary", "OS Feature Update Counts", "Memory Summary", "Device Models",
+    "Client Version", "Server OS Versions", *SECURITY_SUMMARIES,
+]
+
+
+def _pandas():
+    try:
+        import numpy as np
+        import pandas as pd
+    except ImportError:
+        raise SystemExit("--device-facts requires pandas: pip install pandas")
+    return np, pd
+
+
+def fact_catalog(catalog):
+    """
+    Return a copy of the query catalog with the FACT_SUMMARIES replaced by
+    the single FACT_QUERY (fresh for as long as the shortest of their TTLs).
+    """
+    _pandas()
+    replaced = [name for name in FACT_SUMMARIES if name in catalog]
+    out = {name: info for name, info in catalog.items() if name not in replaced}
+    out[FACT_QUERY] = {"source": "Dashboard (device facts)", "sql": FACT_SQL,
+                       "ttl": min((catalog[n]["ttl"] for n in replaced), default=None)}
+    return out
+
+
+# ── Local Aggregation ────────────────────────────────────────────────────────
+def factorize(columns, rows):
+    """
+    Split the fact rows into columns, each factorized once into integer
+    codes and its distinct values: name -> (codes, values). NULL is value 0.
+    """
+    np, pd = _pandas()
+    table = np.array(rows, dtype=object)
+    data = {}
+    for i, name in enumerate(columns):
+        if name == "ResourceID":
+            continue
+        codes, uniques = pd.factorize(table[:, i])
+        data[name] = (codes + 1, [None] + uniques.tolist())
+    return data
+
+
+def derive(column, func):
+    """A factorized column with func applied to each distinct value, refactorized."""
+    np, _ = _pandas()
+    codes, values = column
+    index = {}
+    remap = np.array([index.setdefault(func(v), len(index)) for v in values], dtype=np.int64)
+    return remap[codes], list(index)
+
+
+def group_count(keys, where=None):
+    """
+    COUNT(*) ... GROUP BY over factorized columns, restricted to the rows
+    where the boolean array is true: [(key values..., count)].
+    """
+    np, _ = _pandas()
+    combined = np.zeros(len(keys[0][0]), dtype=np.int64)
+    for codes, values in keys:
+        combined = combined * len(values) + codes
+    if where is not None:
+        combined = combined[where]
+    groups, counts = np.unique(combined, return_counts=True)
+    out = []
+    for group, count in zip(groups.tolist(), counts.tolist()):
+        key = []
+        for _, values in reversed(keys):
+            group, code = divmod(group, len(values))
+            key.append(values[code])
+        out.append(tuple(reversed(key)) + (count,))
+    return out
+
+
+def matches(column, func):
+    """Boolean row mask: func evaluated once per distinct value."""
+    np, _ = _pandas()
+    codes, values = column
+    return np.array([bool(func(v)) for v in values], dtype=bool)[codes]
+
+
+def order_by(rows, *order):
+    """ORDER BY on result tuples; order is (index, descending). NULLs sort lowest."""
+    for index, descending in reversed(order):
+        rows = sorted(rows, key=lambda r: (r[index] is not None,
+                                           r[index] if r[index] is not None else 0),
+                      reverse=descending)
+    return rows
+
+
+def server_version(caption):
+    lowered = caption.lower()
+    for name in SERVER_VERSIONS:
+        if name.lower() in lowered:
+            return f"Server {name}"
+    return "Other"
+
+
+def summarize(columns, rows):
+    """Compute every FACT_SUMMARIES result from the fact rows: name -> (columns, rows)."""
+    facts = factorize(columns, rows)
+    out = {}
+    if not rows:
+        return {name: ([], []) for name in FACT_SUMMARIES}
+
+    versions = group_count([facts["ClientVersion"]])
+    out["Client Version"] = (["Client Version", "Device Count"], order_by(
+        [(v if v is not None else "No Client", n) for v, n in versions], (1, True)))
+
+    has_os = matches(facts["HasOS"], lambda v: v == 1)
+    # LIKE is case-insensitive under the site database's default collation
+    windows = has_os & matches(facts["OSCaption"], lambda v: v and "windows" in v.lower())
+    servers = has_os & matches(facts["OSCaption"], lambda v: v and "server" in v.lower())
+
+    out["OS Count Summary"] = (["Operating System", "Device Count"], order_by(
+        group_count([facts["OSCaption"]], windows), (1, True)))
+
+    builds = group_count([facts["OSCaption"], facts["OSBuild"]], windows)
+    out["OS Feature Update Counts"] = (
+        ["Operating System", "Feature Update", "Build Number", "Device Count"],
+        order_by([(caption, FEATURE_UPDATES.get(build, build), build, n)
+                  for caption, build, n in builds], (0, False), (2, True)))
+
+    builds = group_count([facts["OSCaption"], facts["OSBuild"]], servers)
+    out["Server OS Versions"] = (
+        ["Operating System", "Server Version", "Build Number", "Server Count"],
+        order_by([(caption, server_version(caption), build, n)
+                  for caption, build, n in builds], (3, True), (0, False)))
+
+    # CAST(ROUND(kb / 1024.0 / 1024.0, 0) AS INT), ROUND being half away from zero
+    ram = derive(facts["TotalPhysicalMemory"],
+                 lambda kb: None if kb is None else int(kb / 1048576.0 + 0.5))
+    out["Memory Summary"] = (["RAM (GB)", "Device Count"], order_by(
+        group_count([ram], matches(facts["HasMemory"], lambda v: v == 1)), (0, True)))
+
+    models = group_count([facts["Manufacturer"], facts["Model"], facts["ChassisType"]],
+                         matches(facts["HasComputerSystem"], lambda v: v == 1))
+    out["Device Models"] = (
+        ["Manufacturer", "Model", "Chassis Type", "Device Count"],
+        order_by([(make if make is not None else "Unknown",
+                   model if model is not None else "Unknown",
+                   CHASSIS_TYPES.get(chassis, "Unknown"), n)
+                  for make, model, chassis, n in models], (3, True), (0, False), (1, False)))
+
+    for name, (column, output, labels) in SECURITY_SUMMARIES.items():
+        out[name] = ([output, "Device Count"], order_by(
+            [(labels.get(v, "Unknown"), n) for v, n in group_count([facts[column]])],
+            (1, True)))
+    return out
+
+
+def summarize_results(live):
+    """
+    Replace the FACT_QUERY result in run_queries output with the summaries
+    computed from it, in the same result shape. The fact result stays in
+    live for the run metrics; callers drop it before building sheets.
+    """
+    fact = live[FACT_QUERY]
+    start = time.perf_counter()
+    if fact["error"]:
+        summaries = {name: ([], []) for name in FACT_SUMMARIES}
+    else:
+        summaries = summarize(fact["columns"], fact["rows"])
+    elapsed = time.perf_counter() - start
+    print(f"  [live] {len(summaries)} summaries from {len(fact['rows'])} device facts "
+          f"in {elapsed:.3f}s")
+    for name, (columns, rows) in summaries.items():
+        live[name] = {"columns": columns, "rows": rows, "elapsed": elapsed,
+                      "error": f"{FACT_QUERY}: {fact['error']}" if fact["error"] else None,
+                      "cached": fact["cached"], "batch": FACT_QUERY, "round_trips": 0}
+    return live
@@ -8,21 +8,50 @@ Generates a multi-sheet Excel dashboard workbook with:
 - SQL queries sourced from the project's .sql files
 - Dashboard-specific aggregation queries for Security
 - A reference sheet listing all embedded queries
+
+By default the sheets are filled with sample data. With --live the query
+catalog is run once from Python (SQL Server via pyodbc, or a local SQLite
+stand-in with --standin) and the real rows are written instead.
 """
 
+import argparse
+import itertools
 import os
+import random
+import shutil
+import struct
+import time
+from copy import copy
 import zipfile
 import tempfile
-import shutil
+import warnings
 import xml.etree.ElementTree as ET
 
 import openpyxl
 from openpyxl.chart import PieChart, BarChart, Reference
 from openpyxl.chart.series import DataPoint
 from openpyxl.chart.label import DataLabelList
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.cell import Cell, WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
 from openpyxl.utils import get_column_letter
 from openpyxl.worksheet.table import Table, TableStyleInfo
+from openpyxl.writer.excel import ExcelWriter
+
+# StreamingWorksheet and DashboardWorkbook build on openpyxl internals (the
+# write-only worksheet, Table._initialise_columns, Cell._style); they are
+# tested with openpyxl 3.1.
+try:
+    from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+except ImportError:
+    WriteOnlyWorksheet = None
+if WriteOnlyWorksheet is None or not hasattr(Table, "_initialise_columns") \
+        or not hasattr(Cell, "_style"):
+    raise SystemExit(f"openpyxl {openpyxl.__version__} is not supported: "
+                     "pip install 'openpyxl>=3.1,<3.2'")
+
+from query_executor import prepare_query
+from run_metrics import RunMetrics, result_bytes
+from sql_catalog import get_catalog, strip_order_by
 
 # ── Configuration ────────────────────────────────────────────────────────────
 SERVER_NAME = "MECMServer"
@@ -34,6 +63,52 @@ CONN_STRING = (
     f"Provider=SQLOLEDB.1;Data Source={SERVER_NAME};"
     f"Initial Catalog={DATABASE_NAME};Integrated Security=SSPI;"
 )
+# Used by --live; the OLE DB string above is what Excel's connections use
+ODBC_CONN_TEMPLATE = (
+    "Driver={{ODBC Driver 18 for SQL Server}};Server={server};"
+    "Database={database};Trusted_Connection=yes;TrustServerCertificate=yes;"
+)
+ODBC_CONN_STRING = ODBC_CONN_TEMPLATE.format(server=SERVER_NAME, database=DATABASE_NAME)
+
+# Connection profiles, honoured by live mode (ODBC) and by the workbook's
+# connections (OLE DB). 'read_only' adds ApplicationIntent=ReadOnly, which an
+# Availability Group listener routes to a readable secondary (the OLE DB
+# provider must support it: MSOLEDBSQL, not SQLOLEDB). 'isolation' is set on
+# every session (SNAPSHOT needs ALLOW_SNAPSHOT_ISOLATION on the database).
+# 'timeout' is the live-mode command timeout in seconds, else --query-timeout.
+# --conn-profile picks the run's profile; a .sql file can name its own in its
+# header ("Profile: reporting"), which applies only under a non-default
+# --conn-profile. The default profile gives the strings above for every query.
+CONNECTION_PROFILES = {
+    "default": {"oledb": "SQLOLEDB.1", "odbc": "ODBC Driver 18 for SQL Server"},
+    "dashboard": {"oledb": "MSOLEDBSQL", "odbc": "ODBC Driver 18 for SQL Server",
+                  "read_only": True, "isolation": "READ UNCOMMITTED", "timeout": 120},
+    "reporting": {"oledb": "MSOLEDBSQL", "odbc": "ODBC Driver 18 for SQL Server",
+                  "read_only": True, "isolation": "SNAPSHOT", "timeout": 600},
+}
+DEFAULT_PROFILE = "default"
+
+# Live-mode result cache: how long a cached result stays fresh, by source
+# folder, with per-query overrides. Inventory changes slowly; client health
+# and Defender status should be fresher.
+CACHE_TTL_DEFAULT = 60 * 60
+CACHE_TTL_BY_FOLDER = {
+    "Operating-Systems": 6 * 60 * 60,
+    "Hardware-Inventory": 6 * 60 * 60,
+    "Software-Inventory": 6 * 60 * 60,
+    "Server": 6 * 60 * 60,
+    "Collections": 60 * 60,
+    "Applications": 60 * 60,
+    "Software-Updates": 60 * 60,
+    "Client-Health": 15 * 60,
+    "Security": 15 * 60,
+}
+CACHE_TTL_BY_QUERY = {
+    "BitLocker Protection Summary": 60 * 60,
+    "Secure Boot Summary": 6 * 60 * 60,
+    "TPM Status Summary": 6 * 60 * 60,
+    "Defender Real-Time Protection Summary": 15 * 60,
+}
 
 # ── Colors ───────────────────────────────────────────────────────────────────
 C = {
@@ -70,27 +145,33 @@ THIN_BORDER = Border(
     top=Side(style="thin", color=C["navy"]),
 )
 
+# Named styles used by streaming (write-only) sheets: one registered xf per
+# style instead of a fresh Font/Alignment/PatternFill per cell
+NAMED_STYLES = {
+    "MECM Title": dict(font=TITLE_FONT,
+                       alignment=Alignment(horizontal="left", vertical="center")),
+    "MECM Subtitle": dict(font=SUBTITLE_FONT,
+                          alignment=Alignment(horizontal="left", vertical="center")),
+    "MECM Section": dict(font=SUBTITLE_FONT),
+    "MECM Header": dict(font=HEADER_FONT, fill=HEADER_FILL, border=THIN_BORDER,
+                        alignment=Alignment(horizontal="center", vertical="center",
+                                            wrap_text=True)),
+    "MECM Data": dict(font=DATA_FONT,
+                      alignment=Alignment(horizontal="center", vertical="center")),
+    "MECM Data Alt": dict(font=DATA_FONT, fill=ALT_FILL,
+                          alignment=Alignment(horizontal="center", vertical="center")),
+}
+# Column sizing policy for write_table: "all" measures every row as it is
+# written; "head" and "reservoir" measure SIZING_ROWS rows (the first ones, or
+# a uniform random sample). Streaming sheets always size from the head.
+SIZING_POLICIES = ("all", "head", "reservoir")
+SIZING_ROWS = 100
+
 
 # ── SQL Queries ──────────────────────────────────────────────────────────────
 def read_sql(relative_path):
-    """Read a SQL file from the project root."""
-    with open(os.path.join(BASE_DIR, relative_path)) as f:
-        content = f.read()
-    # Strip the comment header, return just the SQL
-    lines = content.strip().splitlines()
-    sql_lines = []
-    in_comment = False
-    for line in lines:
-        stripped = line.strip()
-        if stripped.startswith("/*"):
-            in_comment = True
-            continue
-        if in_comment:
-            if "*/" in stripped:
-                in_comment = False
-            continue
-        sql_lines.append(line)
-    return "\n".join(sql_lines).strip()
+    """Return a project SQL file with its comment header stripped (from the catalog index)."""
+    return get_catalog().get(relative_path)["sql"]
 
 
 # Dashboard-specific aggregation queries for Security
@@ -146,10 +227,714 @@ GROUP BY tpm.IsActivated_InitialValue0
 ORDER BY [Device Count] DESC""",
 }
 
+# The four security summaries as one batch: a single device-level pass over
+# v_R_System_Valid (each v_GS_* view pre-aggregated to one row per device)
+# into a temp table, then the four summaries from it as separate result sets.
+# A device with several inventory rows is counted once, by its highest value.
+SECURITY_BATCH_SQL = """SET NOCOUNT ON;
+DROP TABLE IF EXISTS #SecurityDevices;
+SELECT
+    sys.ResourceID,
+    bd.ProtectionStatus,
+    fw.SecureBoot,
+    wds.RealTimeProtection,
+    tpm.IsActivated
+INTO #SecurityDevices
+FROM v_R_System_Valid sys
+LEFT JOIN (
+    SELECT ResourceID, MAX(ProtectionStatus0) AS ProtectionStatus
+    FROM v_GS_BITLOCKER_DETAILS
+    WHERE DriveLetter0 = 'C:'
+    GROUP BY ResourceID
+) bd ON sys.ResourceID = bd.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(SecureBoot0) AS SecureBoot
+    FROM v_GS_FIRMWARE
+    GROUP BY ResourceID
+) fw ON sys.ResourceID = fw.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(RealTimeProtectionEnabled0) AS RealTimeProtection
+    FROM v_GS_WINDOWS_DEFENDER_STATUS
+    GROUP BY ResourceID
+) wds ON sys.ResourceID = wds.ResourceID
+LEFT JOIN (
+    SELECT ResourceID, MAX(IsActivated_InitialValue0) AS IsActivated
+    FROM v_GS_TPM
+    GROUP BY ResourceID
+) tpm ON sys.ResourceID = tpm.ResourceID;
+SELECT
+    CASE ProtectionStatus
+        WHEN 0 THEN 'Protection Off'
+        WHEN 1 THEN 'Protection On'
+        ELSE 'Unknown'
+    END AS [Protection Status],
+    COUNT(*) AS [Device Count]
+FROM #SecurityDevices
+GROUP BY ProtectionStatus
+ORDER BY [Device Count] DESC;
+SELECT
+    CASE SecureBoot
+        WHEN 1 THEN 'Enabled'
+        WHEN 0 THEN 'Disabled'
+        ELSE 'Unknown'
+    END AS [Secure Boot Status],
+    COUNT(*) AS [Device Count]
+FROM #SecurityDevices
+GROUP BY SecureBoot
+ORDER BY [Device Count] DESC;
+SELECT
+    CASE RealTimeProtection
+        WHEN 1 THEN 'Enabled'
+        WHEN 0 THEN 'Disabled'
+        ELSE 'Unknown'
+    END AS [Real-Time Protection],
+    COUNT(*) AS [Device Count]
+FROM #SecurityDevices
+GROUP BY RealTimeProtection
+ORDER BY [Device Count] DESC;
+SELECT
+    CASE IsActivated
+        WHEN 1 THEN 'Activated'
+        WHEN 0 THEN 'Not Activated'
+        ELSE 'Unknown'
+    END AS [TPM Status],
+    COUNT(*) AS [Device Count]
+FROM #SecurityDevices
+GROUP BY IsActivated
+ORDER BY [Device Count] DESC;
+DROP TABLE #SecurityDevices;"""
+
+# Project .sql files embedded in the workbook, in connection order
+DASHBOARD_SQL_FILES = {
+    "OS Count Summary": "Operating-Systems/OS_Count_Summary.sql",
+    "OS Feature Update Counts": "Operating-Systems/OS_FeatureUpdate_Counts.sql",
+    "Memory Summary": "Hardware-Inventory/Memory_Summary.sql",
+    "Device Models": "Hardware-Inventory/Device_Models.sql",
+    "Client Version": "Client-Health/Client_Version.sql",
+    "Update Compliance Summary": "Software-Updates/Update_Compliance_Summary.sql",
+    "Update Deployment Status": "Software-Updates/Update_Deployment_Status.sql",
+    "Deployment Summary": "Applications/Deployment_Summary.sql",
+    "Application Deployment Status": "Applications/Application_Deployment_Status.sql",
+    "Server OS Versions": "Server/Server_OS_Versions.sql",
+}
+
+
+# Live-mode query batches: each group is sent in one round trip and read back
+# with nextset(). 'command' replaces the members' own SQL with a merged batch
+# returning one result set per member, in 'queries' order.
+QUERY_BATCHES = {
+    "Operating Systems": {"queries": ["OS Count Summary", "OS Feature Update Counts"]},
+    "Hardware": {"queries": ["Memory Summary", "Device Models"]},
+    "Software Updates": {"queries": ["Update Compliance Summary", "Update Deployment Status"]},
+    "Security": {"queries": list(SECURITY_QUERIES), "command": SECURITY_BATCH_SQL},
+}
+
+
+# Large per-device detail queries that --detail can add as their own sheets,
+# with the output columns ordering rows within each device
+DETAIL_QUERIES = {
+    "Installed_Software": ["Software Name", "Version"],
+    "Missing_Updates_Detail": ["Update Title"],
+    "Disk_Space": ["Drive"],
+    "BitLocker_Status": ["Drive"],
+}
+EXCEL_MAX_ROWS = 1048576
+
+# Multi-site (--sites): how each dashboard query's rows are combined into
+# cross-site totals. Rows with equal 'keys' are merged and every other column
+# summed, except 'ratio' columns, recomputed as numerator * 100 / denominator
+# from the summed columns, and 'weighted' columns, averaged weighted by
+# another column where the query does not return its denominator.
+SITE_TOTALS = {
+    "OS Count Summary": {"keys": ["Operating System"]},
+    "OS Feature Update Counts": {"keys": ["Operating System", "Feature Update", "Build Number"]},
+    "Memory Summary": {"keys": ["RAM (GB)"]},
+    "Device Models": {"keys": ["Manufacturer", "Model", "Chassis Type"]},
+    "Client Version": {"keys": ["Client Version"]},
+    "Update Compliance Summary": {"keys": ["Classification"],
+                                  "weighted": {"Compliance %": "Total Devices"}},
+    "Update Deployment Status": {"keys": ["Update Group"],
+                                 "ratio": {"Compliance %": ("Compliant", "Targeted Devices")}},
+    "Deployment Summary": {"keys": [],
+                           "ratio": {"Overall Success Rate %": ("Total Successful",
+                                                                "Total Targeted Devices")}},
+    "Application Deployment Status": {
+        "keys": ["Application Name", "Manufacturer", "Target Collection"],
+        "ratio": {"Success Rate %": ("Success", "Total Targeted")},
+    },
+    "Server OS Versions": {"keys": ["Operating System", "Server Version", "Build Number"]},
+    "BitLocker Protection Summary": {"keys": ["Protection Status"]},
+    "Secure Boot Summary": {"keys": ["Secure Boot Status"]},
+    "Defender Real-Time Protection Summary": {"keys": ["Real-Time Protection"]},
+    "TPM Status Summary": {"keys": ["TPM Status"]},
+}
+
+# Chart-backed tables that can return many categories (--top-n). The query
+# keeps its top 'n' rows by 'rank' and folds the rest into one "Other" row:
+# its key columns read 'Other' and the other columns are combined as in
+# SITE_TOTALS. 'columns' is the query's output, 'order' the display order of
+# the kept rows as (column, descending); by default they are ordered by rank.
+CHART_TOP_N = {
+    "OS Count Summary": {"n": 10, "rank": "Device Count",
+                         "columns": ["Operating System", "Device Count"]},
+    "OS Feature Update Counts": {
+        "n": 12, "rank": "Device Count",
+        "columns": ["Operating System", "Feature Update", "Build Number", "Device Count"],
+        "order": [("Operating System", False), ("Build Number", True)],
+    },
+    "Device Models": {"n": 10, "rank": "Device Count",
+                      "columns": ["Manufacturer", "Model", "Chassis Type", "Device Count"]},
+    "Client Version": {"n": 8, "rank": "Device Count",
+                       "columns": ["Client Version", "Device Count"]},
+    "Server OS Versions": {"n": 10, "rank": "Server Count",
+                           "columns": ["Operating System", "Server Version", "Build Number",
+                                       "Server Count"]},
+    "Update Deployment Status": {
+        "n": 12, "rank": "Targeted Devices",
+        "columns": ["Update Group", "Targeted Devices", "Compliant", "Required",
+                    "Not Required", "Compliance %"],
+        "order": [("Update Group", False)],
+    },
+    "Application Deployment Status": {
+        "n": 12, "rank": "Total Targeted",
+        "columns": ["Application Name", "Manufacturer", "Target Collection", "Total Targeted",
+                    "Success", "In Progress", "Errors", "Unknown", "Success Rate %"],
+        "order": [("Application Name", False), ("Target Collection", False)],
+    },
+}
+
+
+def cache_ttl(name, source):
+    """Result cache TTL (seconds) for a catalog query."""
+    if name in CACHE_TTL_BY_QUERY:
+        return CACHE_TTL_BY_QUERY[name]
+    return CACHE_TTL_BY_FOLDER.get(source.split("/")[0], CACHE_TTL_DEFAULT)
+
+
+def build_query_catalog():
+    """
+    Return name -> {'source', 'sql', 'ttl', ...} for every query used by the
+    dashboards. Files with DECLARE parameters also carry the parameterised
+    'command', bound 'params' and 'input_sizes' used by live mode; 'sql' keeps
+    the DECLAREs for the workbook's connections. Files naming a connection
+    profile in their header carry it as 'profile'.
+    """
+    catalog = {}
+    for name, source in DASHBOARD_SQL_FILES.items():
+        entry = get_catalog().get(source)
+        catalog[name] = {"source": source, **prepare_query(entry)}
+        if entry.get("profile"):
+            catalog[name]["profile"] = entry["profile"]
+    for name, sql in SECURITY_QUERIES.items():
+        catalog[name] = {"source": "Dashboard (aggregation)", "sql": sql}
+    for name, info in catalog.items():
+        info["ttl"] = cache_ttl(name, info["source"])
+    return catalog
+
+
+# ── Connection Profiles ──────────────────────────────────────────────────────
+def connection_profile(name):
+    try:
+        return CONNECTION_PROFILES[name]
+    except KeyError:
+        raise SystemExit(f"unknown connection profile {name!r}: "
+                         f"choose from {', '.join(CONNECTION_PROFILES)}")
+
+
+def oledb_conn_string(profile=DEFAULT_PROFILE):
+    """The workbook connections' OLE DB connection string for a profile."""
+    spec = connection_profile(profile)
+    return (f"Provider={spec['oledb']};Data Source={SERVER_NAME};"
+            f"Initial Catalog={DATABASE_NAME};Integrated Security=SSPI;"
+            + ("ApplicationIntent=ReadOnly;" if spec.get("read_only") else ""))
+
+
+def odbc_conn_template(profile=DEFAULT_PROFILE):
+    """ODBC_CONN_TEMPLATE with a profile's driver and application intent."""
+    spec = connection_profile(profile)
+    return (ODBC_CONN_TEMPLATE.replace("ODBC Driver 18 for SQL Server", spec["odbc"])
+            + ("ApplicationIntent=ReadOnly;" if spec.get("read_only") else ""))
+
+
+def odbc_conn_string(conn_str, profile=DEFAULT_PROFILE):
+    """An explicit --conn-str with a profile's intent added, or the profile's own string."""
+    if conn_str is None:
+        return odbc_conn_template(profile).format(server=SERVER_NAME, database=DATABASE_NAME)
+    if connection_profile(profile).get("read_only") and \
+            "applicationintent" not in conn_str.lower().replace(" ", ""):
+        conn_str = conn_str.rstrip(";") + ";ApplicationIntent=ReadOnly;"
+    return conn_str
+
+
+def session_sql(profile=DEFAULT_PROFILE):
+    """The statement setting a profile's isolation level on a session, or None."""
+    isolation = connection_profile(profile).get("isolation")
+    return f"SET TRANSACTION ISOLATION LEVEL {isolation}" if isolation else None
+
+
+def effective_profile(info, profile=DEFAULT_PROFILE):
+    """
+    A query's connection profile: its header's profile when the run's profile
+    is not the default, else the run's. A default run keeps every connection
+    on the baseline strings, so readers need no MSOLEDBSQL and the database
+    no snapshot isolation.
+    """
+    if profile == DEFAULT_PROFILE:
+        return profile
+    return info.get("profile") or profile
+
+
+def apply_profiles(catalog, default=DEFAULT_PROFILE):
+    """Copy of the catalog with every query's profile resolved and its timeout set."""
+    out = {}
+    for name, info in catalog.items():
+        profile = effective_profile(info, default)
+        out[name] = dict(info, profile=profile)
+        timeout = connection_profile(profile).get("timeout")
+        if timeout:
+            out[name]["timeout"] = timeout
+    return out
+
+
+def add_connection_args(parser):
+    """--standin, --conn-str and --conn-profile for the export and snapshot tools."""
+    parser.add_argument("--standin", metavar="PATH", help="use a SQLite stand-in database")
+    parser.add_argument("--conn-str", help="ODBC connection string for SQL Server "
+                                           "(default: built from --conn-profile)")
+    parser.add_argument("--conn-profile", default=DEFAULT_PROFILE,
+                        choices=list(CONNECTION_PROFILES),
+                        help=f"connection profile (default: {DEFAULT_PROFILE})")
+
+
+def open_connection(args):
+    """One connection from add_connection_args options, with the profile's session settings."""
+    from query_executor import connect_mssql, connect_standin
+
+    if args.standin:
+        return connect_standin(args.standin)()
+    return connect_mssql(odbc_conn_string(args.conn_str, args.conn_profile),
+                         init=session_sql(args.conn_profile))()
+
+
+def connection_target(args):
+    """The database open_connection reaches: the stand-in path, else server/database."""
+    from query_executor import conn_target
+
+    if args.standin:
+        return f"stand-in {os.path.abspath(args.standin)}"
+    return conn_target(odbc_conn_string(args.conn_str, args.conn_profile))
+
+
+def profile_pools(args, size):
+    """
+    Connection pools for every profile, defaulting to --conn-profile. Pools open
+    connections on first use, so unused profiles cost nothing.
+    """
+    from query_executor import ProfilePools
+
+    return ProfilePools(lambda profile: live_target(args, profile)[0], CONNECTION_PROFILES,
+                        args.conn_profile, size=size)
+
+
+# ── Live Data ────────────────────────────────────────────────────────────────
+def live_rows(live, query_name, headers, sample):
+    """
+    Rows for a dashboard table: the live result projected onto the table's
+    headers when running with --live, otherwise the built-in sample data.
+    """
+    if live is None:
+        return sample
+    if hasattr(live, "used"):
+        # Multi-site: remember the table so its per-site rows can follow
+        live.used.append((query_name, headers))
+    res = live.get(query_name)
+    if res is None or res["error"]:
+        return []
+    idx = [res["columns"].index(h) for h in headers]
+    return [tuple(row[i] for i in idx) for row in res["rows"]]
+
+
+def top_n_limit(name, top_n=None):
+    """Rows kept for a chart-backed query: --top-n, else its CHART_TOP_N default (0 = all)."""
+    if name not in CHART_TOP_N:
+        return 0
+    return CHART_TOP_N[name]["n"] if top_n is None else top_n
+
+
+def top_n_sql(name, sql, n):
+    """
+    Wrap a chart query so the server returns its top n rows by CHART_TOP_N
+    rank plus one "Other" row for the rest: n + 1 rows at most, in one pass.
+    """
+    spec, totals = CHART_TOP_N[name], SITE_TOTALS[name]
+    keys = totals["keys"]
+    rank = ", ".join([f"q.[{spec['rank']}] DESC"] + [f"q.[{k}]" for k in keys])
+    other = f"b.[Top N] > {n}"
+    select = []
+    for col in spec["columns"]:
+        if col in keys:
+            folded = "'Other'"
+        elif col in totals.get("ratio", {}):
+            num, den = totals["ratio"][col]
+            folded = f"ROUND(SUM(b.[{num}]) * 100.0 / NULLIF(SUM(b.[{den}]), 0), 1)"
+        elif col in totals.get("weighted", {}):
+            weight = totals["weighted"][col]
+            folded = (f"ROUND(SUM(b.[{col}] * b.[{weight}]) / NULLIF(SUM(CASE WHEN b.[{col}] "
+                      f"IS NOT NULL THEN b.[{weight}] END), 0), 1)")
+        else:
+            folded = f"SUM(b.[{col}])"
+        select.append(f"    CASE WHEN {other} THEN {folded} ELSE MIN(b.[{col}]) END AS [{col}]")
+    order = [f"CASE WHEN {other} THEN 1 ELSE 0 END"]
+    if spec.get("order"):
+        order += [f"MIN(b.[{c}])" + (" DESC" if desc else "") for c, desc in spec["order"]]
+    else:
+        order.append("b.[Top N]")
+    body = strip_order_by(sql.rstrip().rstrip(";"))
+    return ("SELECT\n" + ",\n".join(select) + "\nFROM (\n"
+            f"    SELECT q.*, CASE WHEN ROW_NUMBER() OVER (ORDER BY {rank}) <= {n}\n"
+            f"        THEN ROW_NUMBER() OVER (ORDER BY {rank}) ELSE {n + 1} END AS [Top N]\n"
+            f"    FROM (\n{body}\n    ) q\n) b\nGROUP BY b.[Top N]\nORDER BY " + ", ".join(order))
+
+
+def top_n_catalog(catalog, top_n=None):
+    """Copy of the live catalog with each chart query's command wrapped by top_n_sql."""
+    catalog = dict(catalog)
+    for name, info in catalog.items():
+        n = top_n_limit(name, top_n)
+        if n:
+            catalog[name] = dict(info, command=top_n_sql(name, info.get("command") or info["sql"],
+                                                          n))
+    return catalog
+
+
+def top_n_rows(name, columns, rows, n):
+    """top_n_sql applied to rows already fetched (results combined or computed locally)."""
+    from multi_site import site_totals
+
+    spec, totals = CHART_TOP_N[name], SITE_TOTALS[name]
+    keys = [columns.index(k) for k in totals["keys"]]
+
+    def ordered(rows, order):
+        rows = list(rows)
+        # NULLs sort first ascending and last descending, as on SQL Server
+        for col, desc in reversed(order):
+            i = columns.index(col)
+            rows.sort(key=lambda row: (row[i] is not None, row[i]), reverse=desc)
+        return rows
+
+    ranked = ordered(rows, [(spec["rank"], True)] + [(k, False) for k in totals["keys"]])
+    kept, rest = ranked[:n], ranked[n:]
+    if spec.get("order"):
+        kept = ordered(kept, spec["order"])
+    if rest:
+        folded = [tuple("Other" if i in keys else v for i, v in enumerate(row)) for row in rest]
+        kept += site_totals(totals, [(None, {"columns": columns, "rows": folded})])
+    return kept
+
+
+def apply_top_n(live, top_n=None, names=None):
+    """Fold the chart queries' results in live to their top rows, in place."""
+    for name in names or CHART_TOP_N:
+        n = top_n_limit(name, top_n)
+        res = live.get(name)
+        if n and res is not None and not res["error"]:
+            res["rows"] = top_n_rows(name, res["columns"], res["rows"], n)
+
+
+def live_target(args, profile=DEFAULT_PROFILE):
+    """
+    Return (connect, target) for SQL Server with a connection profile, or the
+    SQLite stand-in (which has no replicas or isolation levels to choose).
+    """
+    from query_executor import connect_mssql, connect_standin, conn_target
+
+    if args.standin:
+        if not os.path.exists(args.standin):
+            from standin_db import create_standin
+            create_standin(args.standin)
+            print(f"Created stand-in database: {args.standin}")
+        return connect_standin(args.standin), f"stand-in {os.path.abspath(args.standin)}"
+    conn_str = odbc_conn_string(args.conn_str, profile)
+    # The target keys the result cache: another server, database or profile
+    # must not be served this one's results
+    return (connect_mssql(conn_str, init=session_sql(profile)),
+            f"{conn_target(conn_str)} [{profile}]")
+
+
+def live_batches(args):
+    """QUERY_BATCHES as used by this run (None with --no-batch)."""
+    if args.no_batch:
+        return None
+    if args.summary_tables:
+        from reporting_schema import summary_batches
+        return summary_batches(QUERY_BATCHES)
+    return QUERY_BATCHES
+
+
+def check_summary_tables(connect, target, timeout):
+    """Stop before any query runs when the target's summary tables were never refreshed."""
+    from reporting_schema import unrefreshed_summaries
+
+    conn = connect()
+    try:
+        missing = unrefreshed_summaries(conn, timeout)
+    finally:
+        conn.close()
+    if missing:
+        raise SystemExit(f"--summary-tables: {len(missing)} summary tables on {target} have "
+                         f"not been refreshed ({', '.join(missing)}); create and fill them "
+                         "with reporting_schema.py --refresh")
+
+
+def run_live_queries(catalog, args):
+    """Run the catalog against SQL Server or the SQLite stand-in."""
+    from query_executor import run_queries
+
+    if args.sites:
+        return run_site_queries(catalog, args)
+    if args.device_facts:
+        from device_facts import fact_catalog
+        catalog = fact_catalog(catalog)
+    catalog = apply_profiles(top_n_catalog(catalog, args.top_n), args.conn_profile)
+    connect, target = live_target(args, args.conn_profile)
+    if args.summary_tables:
+        check_summary_tables(connect, target, args.query_timeout)
+
+    cache = None
+    if not args.no_cache:
+        from query_cache import ResultCache
+        cache = ResultCache(args.cache_path, target=target,
+                            max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    profiles = sorted({info["profile"] for info in catalog.values()})
+    print(f"Running {len(catalog)} queries against {target} "
+          f"({args.workers} workers, pool {args.pool_size or args.workers}, "
+          f"timeout {args.query_timeout}s, cache {'off' if cache is None else 'on'}, "
+          f"profile{'s' if len(profiles) > 1 else ''} {', '.join(profiles)})")
+    try:
+        with profile_pools(args, args.pool_size or args.workers) as pool:
+            live = run_queries(pool, catalog, workers=args.workers,
+                               timeout=args.query_timeout, cache=cache,
+                               refresh=set(args.refresh), batches=live_batches(args))
+    finally:
+        if cache is not None:
+            cache.close()
+    failed = [name for name, res in live.items() if res["error"]]
+    if failed:
+        print(f"Warning: {len(failed)} queries failed; their tables are left empty: "
+              + ", ".join(failed))
+    return live
+
+
+def run_site_queries(catalog, args):
+    """
+    Run the catalog against every site in --sites and consolidate the results.
+    Sites connect with the --conn-profile settings; per-query profiles do not apply.
+    """
+    from multi_site import load_sites, run_sites
+
+    sites, max_connections, server_connections = load_sites(
+        args.sites, odbc_conn_template(args.conn_profile), init=session_sql(args.conn_profile),
+        profile=args.conn_profile)
+    timeout = connection_profile(args.conn_profile).get("timeout") or args.query_timeout
+    return run_sites(sites, catalog, args.max_connections or max_connections,
+                     args.server_connections or server_connections, timeout,
+                     site_timeout=args.site_timeout,
+                     cache_path=None if args.no_cache else args.cache_path,
+                     cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+                     refresh=set(args.refresh), batches=live_batches(args),
+                     totals_spec=SITE_TOTALS)
+
+
+# ── Streaming (Write-Only) Engine ────────────────────────────────────────────
+class StreamingWorksheet(WriteOnlyWorksheet):
+    """
+    openpyxl write-only worksheet with a row cursor, so add_title, add_section
+    and write_table can address rows by number as they do on normal sheets.
+    Rows must be written top to bottom. Column widths have to be written before
+    the first row, so rows are held back until the first table fixes them.
+    """
+
+    def __init__(self, parent, title):
+        super().__init__(parent, title)
+        self.next_row = 1
+        self._held = []
+        self._widths_fixed = False
+
+    def put_row(self, row, cells, height=None):
+        """Write cells (a list of values/WriteOnlyCells from column 1) at row."""
+        if row < self.next_row:
+            raise ValueError(f"'{self.title}' is write-only: row {row} already written")
+        while self.next_row < row:
+            self._emit([])
+        if height:
+            self.row_dimensions[row].height = height
+        self._emit(cells)
+
+    def _emit(self, cells):
+        if self._widths_fixed:
+            self.append(cells)
+        else:
+            self._held.append(cells)
+        self.next_row += 1
+
+    def fix_widths(self, widths):
+        """Set column widths ({column index: width}) and release held rows."""
+        if self._widths_fixed:
+            return
+        for ci, width in widths.items():
+            self.column_dimensions[get_column_letter(ci)].width = width
+        self._widths_fixed = True
+        for cells in self._held:
+            self.append(cells)
+        self._held = []
+
+    def close(self):
+        self.fix_widths({})
+        super().close()
+
+
+class _MixedExcelWriter(ExcelWriter):
+    """ExcelWriter that accepts normal and write-only sheets in one workbook."""
+
+    def write_worksheet(self, ws):
+        self.workbook._DashboardWorkbook__streaming_save = isinstance(ws, WriteOnlyWorksheet)
+        try:
+            super().write_worksheet(ws)
+        finally:
+            self.workbook._DashboardWorkbook__streaming_save = False
+
+
+class DashboardWorkbook(openpyxl.Workbook):
+    """
+    Workbook whose dashboard sheets can be streamed. With streaming=True,
+    create_sheet() returns StreamingWorksheets (pass streaming=False for
+    sheets that need random access); the dashboard named styles are
+    registered up front either way.
+    """
+
+    __streaming_save = False
+
+    def __init__(self, streaming=False, size_policy="all", size_rows=SIZING_ROWS):
+        super().__init__()
+        self.streaming = streaming
+        self.size_policy = size_policy
+        self.size_rows = size_rows
+        self.named_xf = {}
+        for name, attrs in NAMED_STYLES.items():
+            style = NamedStyle(name=name, **attrs)
+            self.add_named_style(style)
+            self.named_xf[name] = style.as_tuple()
+
+    @property
+    def write_only(self):
+        # Consulted by ExcelWriter per sheet; see _MixedExcelWriter
+        return self.__streaming_save
+
+    def create_sheet(self, title=None, index=None, streaming=None):
+        if not (self.streaming if streaming is None else streaming):
+            return super().create_sheet(title, index)
+        ws = StreamingWorksheet(parent=self, title=title)
+        self._add_sheet(sheet=ws, index=index)
+        return ws
+
+    def save(self, filename, connections=None):
+        """
+        Save the workbook. With connections (see inject_connections), the
+        connections part is emitted in the same pass, so no rewrite of the
+        saved file is needed.
+        """
+        rewrites = CONNECTION_PATCHES if connections else {}
+        with _RewritingZipFile(filename, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                               rewrites=rewrites) as archive:
+            _MixedExcelWriter(self, archive).write_data()
+            if connections:
+                archive.writestr(CONNECTIONS_PART, connections_xml(connections))
+
+
+class _RewritingZipFile(zipfile.ZipFile):
+    """ZipFile that passes selected members through a patch function as they are written."""
+
+    def __init__(self, *args, rewrites=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rewrites = rewrites or {}
+
+    def writestr(self, zinfo_or_arcname, data, *args, **kwargs):
+        name = getattr(zinfo_or_arcname, "filename", zinfo_or_arcname)
+        if name in self.rewrites:
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            data = self.rewrites[name](data)
+        super().writestr(zinfo_or_arcname, data, *args, **kwargs)
+
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    # Same as cell.style = style, minus the per-cell name lookup
+    cell._style = copy(ws.parent.named_xf[style])
+    return cell
+
+
+def write_table_stream(ws, headers, rows, start_row, start_col=1, name=None,
+                       size_rows=None):
+    """
+    write_table for StreamingWorksheets. rows may be any iterable (a cursor,
+    a generator); only the first size_rows rows are buffered to size
+    columns, so memory stays flat regardless of the row count.
+    Returns the row after the last data row.
+    """
+    size_rows = size_rows or getattr(ws.parent, "size_rows", SIZING_ROWS)
+    rows = iter(rows)
+    head = list(itertools.islice(rows, size_rows))
+
+    sizer = ColumnSizer(headers, "all")
+    for rd in head:
+        sizer.add(rd)
+    ws.fix_widths(dict(enumerate(sizer.widths(), start=start_col)))
+
+    pad = [None] * (start_col - 1)
+    ws.put_row(start_row, pad + [_styled(ws, h, "MECM Header") for h in headers])
+
+    ri = start_row
+    for ri, row_data in enumerate(itertools.chain(head, rows), start=start_row + 1):
+        style = "MECM Data Alt" if ri % 2 == 0 else "MECM Data"
+        ws.put_row(ri, pad + [_styled(ws, val, style) for val in row_data])
+    end_row = ri
+
+    if name and end_row > start_row:
+        end_col = get_column_letter(start_col + len(headers) - 1)
+        ref = f"{get_column_letter(start_col)}{start_row}:{end_col}{end_row}"
+        tbl = Table(displayName=name, ref=ref)
+        tbl.tableStyleInfo = TableStyleInfo(
+            name="TableStyleMedium2",
+            showFirstColumn=False,
+            showLastColumn=False,
+            showRowStripes=True,
+            showColumnStripes=False,
+        )
+        # Write-only sheets cannot read the header cells back at save time
+        tbl._initialise_columns()
+        for col, h in zip(tbl.tableColumns, headers):
+            col.name = str(h)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", "In write-only mode")
+            ws.add_table(tbl)
+
+    return end_row + 1
+
 
 # ── Helper Functions ─────────────────────────────────────────────────────────
 def add_title(ws, title, subtitle=None, row=1):
     """Add sheet title and optional subtitle. Returns next available row."""
+    if isinstance(ws, StreamingWorksheet):
+        ws.merged_cells.add(f"A{row}:J{row}")
+        ws.put_row(row, [_styled(ws, title, "MECM Title")], height=35)
+        row += 1
+        if subtitle:
+            ws.merged_cells.add(f"A{row}:J{row}")
+            ws.put_row(row, [_styled(ws, subtitle, "MECM Subtitle")], height=22)
+            row += 1
+        return row + 1
     ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=10)
     cell = ws.cell(row=row, column=1, value=title)
     cell.font = TITLE_FONT
@@ -168,12 +953,72 @@ def add_title(ws, title, subtitle=None, row=1):
 
 def add_section(ws, label, row):
     """Add a section label. Returns next row."""
+    if isinstance(ws, StreamingWorksheet):
+        ws.put_row(row, [_styled(ws, label, "MECM Section")])
+        return row + 1
     ws.cell(row=row, column=1, value=label).font = SUBTITLE_FONT
     return row + 1
 
 
-def write_table(ws, headers, data, start_row, start_col=1, name=None):
-    """Write a formatted data table. Returns the row after the last data row."""
+class ColumnSizer:
+    """
+    Tracks column widths while a table's rows are written, so data is
+    traversed once and never needs to be a materialised list.
+    policy "all" measures every row; "head" measures the first `rows` rows;
+    "reservoir" keeps a uniform random sample of `rows` rows (Algorithm R),
+    sizing generator-fed tables without buffering them.
+    """
+
+    def __init__(self, headers, policy="all", rows=SIZING_ROWS):
+        if policy not in SIZING_POLICIES:
+            raise ValueError(f"unknown sizing policy: {policy}")
+        self.max_len = [len(str(h)) for h in headers]
+        self.policy = policy
+        self.rows = rows
+        self.seen = 0
+        self._sample = []
+        self._rng = random.Random(0)
+
+    def _lengths(self, row):
+        return [len(str(v)) for v in row[:len(self.max_len)]]
+
+    def add(self, row):
+        self.seen += 1
+        if self.policy == "all" or (self.policy == "head" and self.seen <= self.rows):
+            for hi, n in enumerate(self._lengths(row)):
+                if n > self.max_len[hi]:
+                    self.max_len[hi] = n
+        elif self.policy == "reservoir":
+            if len(self._sample) < self.rows:
+                self._sample.append(self._lengths(row))
+            else:
+                j = self._rng.randrange(self.seen)
+                if j < self.rows:
+                    self._sample[j] = self._lengths(row)
+
+    def widths(self):
+        """Column widths in header order."""
+        max_len = list(self.max_len)
+        for lengths in self._sample:
+            for hi, n in enumerate(lengths):
+                max_len[hi] = max(max_len[hi], n)
+        return [min(n + 4, 40) for n in max_len]
+
+
+def write_table(ws, headers, data, start_row, start_col=1, name=None,
+                size_policy=None, size_rows=None):
+    """
+    Write a formatted data table. Returns the row after the last data row.
+    data may be any iterable of rows. Column widths follow size_policy (see
+    ColumnSizer), defaulting to the workbook's setting or "all".
+    """
+    if isinstance(ws, StreamingWorksheet):
+        return write_table_stream(ws, headers, data, start_row, start_col, name, size_rows)
+
+    sizer = ColumnSizer(headers,
+                        size_policy or getattr(ws.parent, "size_policy", "all"),
+                        size_rows or getattr(ws.parent, "size_rows", SIZING_ROWS))
+
     for ci, h in enumerate(headers, start=start_col):
         cell = ws.cell(row=start_row, column=ci, value=h)
         cell.font = HEADER_FONT
@@ -181,26 +1026,21 @@ def write_table(ws, headers, data, start_row, start_col=1, name=None):
         cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
         cell.border = THIN_BORDER
 
-    for ri, row_data in enumerate(data, start=start_row + 1):
+    end_row = start_row
+    for end_row, row_data in enumerate(data, start=start_row + 1):
+        sizer.add(row_data)
         for ci, val in enumerate(row_data, start=start_col):
-            cell = ws.cell(row=ri, column=ci, value=val)
+            cell = ws.cell(row=end_row, column=ci, value=val)
             cell.font = DATA_FONT
             cell.alignment = Alignment(horizontal="center", vertical="center")
-            if ri % 2 == 0:
+            if end_row % 2 == 0:
                 cell.fill = ALT_FILL
 
     # Auto-width columns
-    for ci in range(start_col, start_col + len(headers)):
-        hi = ci - start_col
-        max_len = len(str(headers[hi]))
-        for rd in data:
-            if hi < len(rd):
-                max_len = max(max_len, len(str(rd[hi])))
-        ws.column_dimensions[get_column_letter(ci)].width = min(max_len + 4, 40)
-
-    end_row = start_row + len(data)
+    for ci, width in enumerate(sizer.widths(), start=start_col):
+        ws.column_dimensions[get_column_letter(ci)].width = width
 
-    if name and data:
+    if name and end_row > start_row:
         end_col = get_column_letter(start_col + len(headers) - 1)
         ref = f"{get_column_letter(start_col)}{start_row}:{end_col}{end_row}"
         tbl = Table(displayName=name, ref=ref)
@@ -236,10 +1076,11 @@ def make_pie(ws, title, cats_col, data_col, min_row, max_row, anchor, w=13, h=10
     chart.dataLabels.showSerName = False
 
     if chart.series:
+        # One colour override per category row, not one per palette entry
         s = chart.series[0]
-        for i, color in enumerate(PIE_COLORS):
+        for i in range(max_row - min_row):
             pt = DataPoint(idx=i)
-            pt.graphicalProperties.solidFill = color
+            pt.graphicalProperties.solidFill = PIE_COLORS[i % len(PIE_COLORS)]
             s.data_points.append(pt)
 
     ws.add_chart(chart, anchor)
@@ -274,7 +1115,7 @@ def make_bar(ws, title, cats_col, data_cols, min_row, max_row, anchor,
 
 
 # ── Sheet Builders ───────────────────────────────────────────────────────────
-def build_os_dashboard(wb):
+def build_os_dashboard(wb, live=None):
     ws = wb.create_sheet("OS Dashboard")
     ws.sheet_properties.tabColor = C["blue"]
 
@@ -284,14 +1125,14 @@ def build_os_dashboard(wb):
     # ── OS Count Summary ──
     r = add_section(ws, "OS Distribution", r)
     headers = ["Operating System", "Device Count"]
-    data = [
+    data = live_rows(live, "OS Count Summary", headers, [
         ("Microsoft Windows 11 Enterprise", 450),
         ("Microsoft Windows 10 Enterprise", 320),
         ("Microsoft Windows 11 Pro", 150),
         ("Microsoft Windows 10 Pro", 80),
         ("Microsoft Windows Server 2022 Standard", 45),
         ("Microsoft Windows Server 2019 Standard", 30),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="OSCount")
     make_pie(ws, "OS Distribution", 1, 2, t_start, t_start + len(data), f"E{t_start}")
@@ -301,21 +1142,21 @@ def build_os_dashboard(wb):
     # ── Feature Update Counts ──
     r = add_section(ws, "Feature Update Distribution", r)
     headers2 = ["Operating System", "Feature Update", "Build Number", "Device Count"]
-    data2 = [
+    data2 = live_rows(live, "OS Feature Update Counts", headers2, [
         ("Microsoft Windows 11 Enterprise", "24H2", "26100", 280),
         ("Microsoft Windows 11 Enterprise", "23H2", "22631", 170),
         ("Microsoft Windows 10 Enterprise", "22H2", "19045", 320),
         ("Microsoft Windows 11 Pro", "24H2", "26100", 100),
         ("Microsoft Windows 11 Pro", "23H2", "22631", 50),
         ("Microsoft Windows 10 Pro", "22H2", "19045", 80),
-    ]
+    ])
     t2_start = r
     r = write_table(ws, headers2, data2, r, name="FeatureUpdates")
     make_bar(ws, "Feature Update Distribution", 2, 4, t2_start, t2_start + len(data2),
              f"F{t2_start}", y_title="Device Count")
 
 
-def build_hardware_dashboard(wb):
+def build_hardware_dashboard(wb, live=None):
     ws = wb.create_sheet("Hardware Dashboard")
     ws.sheet_properties.tabColor = C["green"]
 
@@ -325,13 +1166,13 @@ def build_hardware_dashboard(wb):
     # ── Memory Summary ──
     r = add_section(ws, "Memory Distribution", r)
     headers = ["RAM (GB)", "Device Count"]
-    data = [
+    data = live_rows(live, "Memory Summary", headers, [
         (4, 25),
         (8, 180),
         (16, 450),
         (32, 280),
         (64, 65),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="MemoryDist")
     make_pie(ws, "RAM Distribution", 1, 2, t_start, t_start + len(data), f"E{t_start}")
@@ -341,7 +1182,7 @@ def build_hardware_dashboard(wb):
     # ── Device Models ──
     r = add_section(ws, "Top Device Models", r)
     headers2 = ["Manufacturer", "Model", "Chassis Type", "Device Count"]
-    data2 = [
+    data2 = live_rows(live, "Device Models", headers2, [
         ("Dell Inc.", "Latitude 5540", "Laptop", 145),
         ("Dell Inc.", "OptiPlex 7090", "Desktop", 130),
         ("Lenovo", "ThinkPad T14 Gen 4", "Notebook", 115),
@@ -350,14 +1191,14 @@ def build_hardware_dashboard(wb):
         ("Lenovo", "ThinkCentre M90q", "Desktop", 70),
         ("Microsoft Corporation", "Virtual Machine", "Other", 60),
         ("HP", "ProDesk 400 G7", "Small Form Factor", 55),
-    ]
+    ])
     t2_start = r
     r = write_table(ws, headers2, data2, r, name="DeviceModels")
     make_bar(ws, "Top Device Models", 2, 4, t2_start, t2_start + len(data2),
              f"F{t2_start}", y_title="Count")
 
 
-def build_client_health(wb):
+def build_client_health(wb, live=None):
     ws = wb.create_sheet("Client Health")
     ws.sheet_properties.tabColor = C["orange"]
 
@@ -367,19 +1208,19 @@ def build_client_health(wb):
     # ── Client Version ──
     r = add_section(ws, "Client Version Distribution", r)
     headers = ["Client Version", "Device Count"]
-    data = [
+    data = live_rows(live, "Client Version", headers, [
         ("5.00.9128.1007", 520),
         ("5.00.9122.1009", 280),
         ("5.00.9114.1012", 120),
         ("5.00.9106.1000", 45),
         ("No Client", 35),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="ClientVersion")
     make_pie(ws, "MECM Client Versions", 1, 2, t_start, t_start + len(data), f"E{t_start}")
 
 
-def build_update_compliance(wb):
+def build_update_compliance(wb, live=None):
     ws = wb.create_sheet("Update Compliance")
     ws.sheet_properties.tabColor = C["gold"]
 
@@ -389,13 +1230,13 @@ def build_update_compliance(wb):
     # ── Compliance Summary ──
     r = add_section(ws, "Compliance by Classification", r)
     headers = ["Classification", "Total Devices", "Required", "Installed", "Compliance %"]
-    data = [
+    data = live_rows(live, "Update Compliance Summary", headers, [
         ("Security Updates", 1000, 150, 850, 85.0),
         ("Critical Updates", 1000, 50, 950, 95.0),
         ("Definition Updates", 1000, 200, 800, 80.0),
         ("Update Rollups", 1000, 100, 900, 90.0),
         ("Feature Packs", 800, 40, 760, 95.0),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="ComplianceSummary")
     make_bar(ws, "Compliance % by Classification", 1, 5, t_start, t_start + len(data),
@@ -407,19 +1248,19 @@ def build_update_compliance(wb):
     r = add_section(ws, "Update Group Deployment Status", r)
     headers2 = ["Update Group", "Targeted Devices", "Compliant", "Required",
                 "Not Required", "Compliance %"]
-    data2 = [
+    data2 = live_rows(live, "Update Deployment Status", headers2, [
         ("2026-01 Security Updates", 1000, 920, 50, 30, 92.0),
         ("2026-02 Security Updates", 1000, 750, 200, 50, 75.0),
         (".NET Framework Updates", 800, 780, 10, 10, 97.5),
         ("Microsoft 365 Updates", 900, 810, 60, 30, 90.0),
-    ]
+    ])
     t2_start = r
     r = write_table(ws, headers2, data2, r, name="DeploymentStatus")
     make_bar(ws, "Deployment Compliance by Update Group", 1, 6, t2_start,
              t2_start + len(data2), f"H{t2_start}", y_title="Compliance %")
 
 
-def build_security_dashboard(wb):
+def build_security_dashboard(wb, live=None):
     ws = wb.create_sheet("Security Dashboard")
     ws.sheet_properties.tabColor = C["red"]
 
@@ -429,11 +1270,11 @@ def build_security_dashboard(wb):
     # ── BitLocker ──
     r = add_section(ws, "BitLocker Protection Status", r)
     headers = ["Protection Status", "Device Count"]
-    data = [
+    data = live_rows(live, "BitLocker Protection Summary", headers, [
         ("Protection On", 820),
         ("Protection Off", 130),
         ("Unknown", 50),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="BitLockerStatus")
     make_pie(ws, "BitLocker Protection", 1, 2, t_start, t_start + len(data), f"E{t_start}")
@@ -443,11 +1284,11 @@ def build_security_dashboard(wb):
     # ── Secure Boot ──
     r = add_section(ws, "Secure Boot Status", r)
     headers2 = ["Secure Boot Status", "Device Count"]
-    data2 = [
+    data2 = live_rows(live, "Secure Boot Summary", headers2, [
         ("Enabled", 850),
         ("Disabled", 100),
         ("Unknown", 50),
-    ]
+    ])
     t2_start = r
     r = write_table(ws, headers2, data2, r, name="SecureBootStatus")
     make_pie(ws, "Secure Boot", 1, 2, t2_start, t2_start + len(data2), f"E{t2_start}")
@@ -457,11 +1298,11 @@ def build_security_dashboard(wb):
     # ── Defender Real-Time Protection ──
     r = add_section(ws, "Defender Real-Time Protection", r)
     headers3 = ["Real-Time Protection", "Device Count"]
-    data3 = [
+    data3 = live_rows(live, "Defender Real-Time Protection Summary", headers3, [
         ("Enabled", 940),
         ("Disabled", 35),
         ("Unknown", 25),
-    ]
+    ])
     t3_start = r
     r = write_table(ws, headers3, data3, r, name="DefenderRTP")
     make_pie(ws, "Defender Real-Time Protection", 1, 2, t3_start, t3_start + len(data3),
@@ -472,17 +1313,17 @@ def build_security_dashboard(wb):
     # ── TPM ──
     r = add_section(ws, "TPM Activation Status", r)
     headers4 = ["TPM Status", "Device Count"]
-    data4 = [
+    data4 = live_rows(live, "TPM Status Summary", headers4, [
         ("Activated", 900),
         ("Not Activated", 60),
         ("Unknown", 40),
-    ]
+    ])
     t4_start = r
     r = write_table(ws, headers4, data4, r, name="TPMStatus")
     make_pie(ws, "TPM Activation", 1, 2, t4_start, t4_start + len(data4), f"E{t4_start}")
 
 
-def build_applications_dashboard(wb):
+def build_applications_dashboard(wb, live=None):
     ws = wb.create_sheet("Applications")
     ws.sheet_properties.tabColor = "9B57A1"
 
@@ -492,11 +1333,12 @@ def build_applications_dashboard(wb):
     # ── Deployment Summary (single row → pie chart of success/fail/progress) ──
     r = add_section(ws, "Overall Deployment Summary", r)
     headers = ["Metric", "Count"]
-    data = [
-        ("Successful", 8500),
-        ("Failed", 320),
-        ("In Progress", 180),
-    ]
+    data = live_rows(live, "Deployment Summary",
+                     ["Total Successful", "Total Failed", "Total In Progress"], [
+        (8500, 320, 180),
+    ])
+    # Pivot the single summary row into Metric/Count rows for the pie chart
+    data = list(zip(["Successful", "Failed", "In Progress"], data[0])) if data else []
     t_start = r
     r = write_table(ws, headers, data, r, name="DeploySummary")
     make_pie(ws, "Deployment Outcome Distribution", 1, 2,
@@ -508,21 +1350,21 @@ def build_applications_dashboard(wb):
     r = add_section(ws, "Application Deployment Status", r)
     headers2 = ["Application Name", "Manufacturer", "Target Collection",
                 "Total Targeted", "Success", "In Progress", "Errors", "Success Rate %"]
-    data2 = [
+    data2 = live_rows(live, "Application Deployment Status", headers2, [
         ("Microsoft 365 Apps", "Microsoft", "All Workstations", 1000, 950, 20, 30, 95.0),
         ("Google Chrome", "Google", "All Workstations", 1000, 980, 10, 10, 98.0),
         ("Adobe Acrobat Reader", "Adobe", "All Workstations", 800, 750, 25, 25, 93.8),
         ("Zoom Workplace", "Zoom", "All Workstations", 900, 860, 15, 25, 95.6),
         ("7-Zip", "Igor Pavlov", "All Workstations", 700, 695, 0, 5, 99.3),
         ("Notepad++", "Don Ho", "Developer PCs", 200, 195, 3, 2, 97.5),
-    ]
+    ])
     t2_start = r
     r = write_table(ws, headers2, data2, r, name="AppDeployStatus")
     make_bar(ws, "Success Rate by Application", 1, 8, t2_start, t2_start + len(data2),
              f"J{t2_start}", y_title="Success Rate %")
 
 
-def build_server_dashboard(wb):
+def build_server_dashboard(wb, live=None):
     ws = wb.create_sheet("Server Dashboard")
     ws.sheet_properties.tabColor = "44546A"
 
@@ -532,14 +1374,14 @@ def build_server_dashboard(wb):
     # ── Server OS Versions ──
     r = add_section(ws, "Server OS Distribution", r)
     headers = ["Operating System", "Server Version", "Build Number", "Server Count"]
-    data = [
+    data = live_rows(live, "Server OS Versions", headers, [
         ("Microsoft Windows Server 2022 Standard", "Server 2022", "20348", 35),
         ("Microsoft Windows Server 2019 Standard", "Server 2019", "17763", 28),
         ("Microsoft Windows Server 2022 Datacenter", "Server 2022", "20348", 12),
         ("Microsoft Windows Server 2016 Standard", "Server 2016", "14393", 10),
         ("Microsoft Windows Server 2019 Datacenter", "Server 2019", "17763", 8),
         ("Microsoft Windows Server 2012 R2 Standard", "Server 2012 R2", "9600", 5),
-    ]
+    ])
     t_start = r
     r = write_table(ws, headers, data, r, name="ServerOS")
     make_pie(ws, "Server OS Distribution", 2, 4, t_start, t_start + len(data), f"F{t_start}")
@@ -549,9 +1391,166 @@ def build_server_dashboard(wb):
              f"F{t_start + 16}", y_title="Server Count")
 
 
+SHEET_BUILDERS = (build_os_dashboard, build_hardware_dashboard, build_client_health,
+                  build_update_compliance, build_security_dashboard,
+                  build_applications_dashboard, build_server_dashboard)
+
+
+def build_detail_sheet(wb, name, args, metrics=None):
+    """
+    Stream a large detail query into its own write-only sheet, fetched in
+    keyset-paginated pages so neither the client nor the server holds the
+    whole result. The query's connection profile (effective_profile) sets the
+    connection and timeout. With metrics, the query's rows, bytes
+    and round trips are recorded under "detail <name>".
+    """
+    from query_executor import paged_query
+
+    entry = get_catalog().get(name)
+    query = prepare_query(entry)
+    profile = effective_profile(entry, args.conn_profile)
+    connect, _ = live_target(args, profile)
+    timeout = connection_profile(profile).get("timeout") or args.query_timeout
+    ws = wb.create_sheet(entry["title"][:31], streaming=True)
+    ws.sheet_properties.tabColor = C["gray"]
+    r = add_title(ws, entry["title"], entry["description"])
+
+    stats = {"round_trips": 0}
+    start = time.perf_counter()
+    conn = connect()
+    try:
+        headers, rows = paged_query(conn, query["command"], query["params"],
+                                    order=DETAIL_QUERIES[name], page_size=args.page_size,
+                                    fetch_size=args.fetch_size, timeout=timeout,
+                                    input_sizes=query["input_sizes"], stats=stats)
+        counted = [0, 0]
+
+        def capped():
+            for row in rows:
+                if counted[0] == EXCEL_MAX_ROWS - r:
+                    print(f"  [detail] {name}: truncated at Excel's {EXCEL_MAX_ROWS} row limit")
+                    return
+                counted[0] += 1
+                if metrics is not None:
+                    counted[1] += result_bytes((row,))
+                yield row
+
+        write_table(ws, headers, capped(), r, name=entry["name"].replace("-", "_"))
+    finally:
+        conn.close()
+    if metrics is not None:
+        # Wall time includes writing the rows, which is interleaved with the fetch
+        metrics.add_query(f"detail {name}", time.perf_counter() - start, counted[0],
+                          counted[1], stats["round_trips"])
+    print(f"  [detail] {name}: {counted[0]} rows")
+
+
+def write_changes_sheet(wb, diff):
+    """
+    Write a snapshot_diff result as its own sheet: one row per added, removed
+    (with its old values) or changed row, the changed columns' old and new
+    values in the last column.
+    """
+    from snapshot_diff import change_rows, summary
+
+    ws = wb.create_sheet(f"Changes - {diff['title']}"[:31], streaming=True)
+    ws.sheet_properties.tabColor = C["orange"]
+    r = add_title(ws, f"Changes: {diff['title']}", summary(diff))
+    index = {c: i for i, c in enumerate(diff["columns"])}
+    old_rows = iter(old for old, _, _ in diff["changed"])
+
+    def text(value):
+        return "(blank)" if value is None else str(value)
+
+    def rows():
+        for written, (change, row, changed) in enumerate(change_rows(diff)):
+            if written == EXCEL_MAX_ROWS - r:
+                print(f"  [changes] {diff['name']}: truncated at Excel's {EXCEL_MAX_ROWS} "
+                      f"row limit")
+                return
+            detail = ""
+            if change == "changed":
+                old = next(old_rows)
+                detail = "; ".join(f"{c}: {text(old[index[c]])} -> {text(row[index[c]])}"
+                                   for c in changed)
+            yield (change.capitalize(), *row, detail)
+
+    write_table(ws, ["Change", *diff["columns"], "Changed Columns"], rows(), r,
+                name=f"Changes_{diff['name']}")
+
+
+def build_changes_sheet(wb, name, args):
+    """Sheet of what changed between the two latest snapshots of a query."""
+    from snapshot_diff import diff_snapshots, summary
+
+    try:
+        diff = diff_snapshots(args.history_dir, name)
+    except (FileNotFoundError, ValueError) as exc:
+        raise SystemExit(f"--changes {name}: {exc}")
+    write_changes_sheet(wb, diff)
+    print(f"  [changes] {name}: {summary(diff)}")
+
+
+def build_sites_sheet(wb, live):
+    """Multi-site status: which sites answered, failed or timed out."""
+    ws = wb.create_sheet("Sites", streaming=False)
+    ws.sheet_properties.tabColor = C["navy"]
+    r = add_title(ws, "Sites", "Sites included in this workbook's cross-site totals")
+    headers = ["Site", "Server", "Database", "Status", "Queries OK", "Queries Failed",
+               "Seconds", "Detail"]
+    rows = [(s["site"], s["server"], s["database"], s["status"], s["queries"], s["failed"],
+             round(s["seconds"], 1) if s["seconds"] is not None else None, s["error"])
+            for s in live.sites]
+    write_table(ws, headers, rows, r, name="SiteStatus")
+
+
+def sheet_bottom(ws):
+    """First free row below a sheet's cells and charts."""
+    if isinstance(ws, StreamingWorksheet):
+        bottom = ws.next_row
+    else:
+        bottom = ws.max_row + 1
+    for chart in ws._charts:
+        anchor = chart.anchor if isinstance(chart.anchor, str) else None
+        if anchor:
+            row = int("".join(ch for ch in anchor if ch.isdigit()))
+            # Charts are sized in cm; a default row is about 0.5 cm
+            bottom = max(bottom, row + int(chart.height * 2) + 1)
+    return bottom
+
+
+def add_site_breakdown(ws, live):
+    """Below a dashboard's cross-site totals, list each table's rows per site."""
+    if not live.used:
+        return
+    widths = {k: d.width for k, d in ws.column_dimensions.items()}
+    r = add_section(ws, "By Site", sheet_bottom(ws) + 1)
+    for query, headers in live.used:
+        rows = []
+        for site, res in live.by_site.get(query, []):
+            idx = [res["columns"].index(h) for h in headers]
+            rows.extend((site,) + tuple(row[i] for i in idx) for row in res["rows"])
+        r = add_section(ws, query, r)
+        name = "".join(ch for ch in query.title() if ch.isalnum()) + "BySite"
+        r = write_table(ws, ["Site"] + headers, rows, r, name=name) + 1
+    # Keep the dashboard's own column widths where they were wider
+    for key, width in widths.items():
+        if width and (ws.column_dimensions[key].width or 0) < width:
+            ws.column_dimensions[key].width = width
+
+
+def run_builder(builder, wb, live):
+    """Run a sheet builder; with --sites, add its per-site breakdown."""
+    if hasattr(live, "used"):
+        live.used = []
+    builder(wb, live)
+    if hasattr(live, "used"):
+        add_site_breakdown(wb.worksheets[-1], live)
+
+
 def build_queries_sheet(wb, query_map):
     """Reference sheet listing all SQL queries used in the workbook."""
-    ws = wb.create_sheet("SQL Queries")
+    ws = wb.create_sheet("SQL Queries", streaming=False)
     ws.sheet_properties.tabColor = C["gray"]
 
     r = add_title(ws, "SQL Queries Reference",
@@ -581,24 +1580,35 @@ def build_queries_sheet(wb, query_map):
         r += 1
 
 
-def build_connection_sheet(wb):
-    """Setup instructions for the data source connection."""
-    ws = wb.create_sheet("Connection Setup")
+def build_connection_sheet(wb, data_url=None, profile=DEFAULT_PROFILE):
+    """Setup instructions for the data source connection (or the data service)."""
+    ws = wb.create_sheet("Connection Setup", streaming=False)
     ws.sheet_properties.tabColor = C["navy"]
 
     r = add_title(ws, "Data Source Connection Setup",
+                  "Refresh from the dashboard data service" if data_url else
                   "Configure the SQL Server connection to your MECM database")
 
     ws.column_dimensions["A"].width = 30
     ws.column_dimensions["B"].width = 60
 
+    if data_url:
+        build_data_service_steps(ws, r, data_url)
+        return
+
+    spec = connection_profile(profile)
     params = [
         ("Server Name", SERVER_NAME),
         ("Database Name", DATABASE_NAME),
         ("Authentication", "Windows Authentication (Integrated Security)"),
-        ("Provider", "SQLOLEDB.1"),
-        ("Connection String", CONN_STRING),
+        ("Connection Profile", profile),
+        ("Provider", spec["oledb"]),
+        ("Connection String", oledb_conn_string(profile)),
     ]
+    if spec.get("read_only"):
+        params.append(("Application Intent", "ReadOnly (routed to a readable AG secondary)"))
+    if spec.get("isolation"):
+        params.append(("Isolation Level", spec["isolation"]))
 
     r = add_section(ws, "Connection Parameters", r)
     for label, value in params:
@@ -623,6 +1633,8 @@ def build_connection_sheet(wb):
         "Note: You must have read access to the MECM site database.",
         "The connection uses Windows Authentication (your logged-in credentials).",
         "If using a named instance, set server to: ServerName\\InstanceName",
+        "With a non-default connection profile, queries whose .sql header names one (e.g.",
+        "the Software Updates summaries: 'Profile: reporting') use that profile's string.",
         "",
         "Alternative: Use Power Query (Get & Transform Data) for more control.",
         "Copy the SQL from the 'SQL Queries' sheet into Power Query's native query editor.",
@@ -633,171 +1645,445 @@ def build_connection_sheet(wb):
         r += 1
 
 
+def build_data_service_steps(ws, r, data_url):
+    """Connection Setup contents when the connections point at data_service.py."""
+    data_url = data_url.rstrip("/")
+    params = [
+        ("Data Service", data_url),
+        ("Tables", f"{data_url}/tables/<table>.html  (.json and .csv also served)"),
+        ("Index", f"{data_url}/"),
+        ("Database", f"{SERVER_NAME}/{DATABASE_NAME} (queried by the service only)"),
+    ]
+    r = add_section(ws, "Connection Parameters", r)
+    for label, value in params:
+        ws.cell(row=r, column=1, value=label).font = Font(
+            name="Segoe UI", bold=True, size=10, color=C["dark"])
+        cell = ws.cell(row=r, column=2, value=value)
+        cell.font = Font(name="Consolas", size=10, color=C["blue"])
+        cell.alignment = Alignment(wrap_text=True)
+        r += 1
+
+    r += 1
+    r = add_section(ws, "How to Refresh Data", r)
+    steps = [
+        "1. Open this workbook in Excel (desktop version).",
+        "2. Go to Data > Connections: each connection is a web query on the data service.",
+        "3. Click Data > Refresh All to load the service's latest results.",
+        "",
+        "The service runs the catalog once per interval and answers every reader from",
+        "memory, so refreshing does not query the MECM database. No SQL Server access",
+        "is needed; the service must be reachable at the address above.",
+    ]
+    for step in steps:
+        ws.cell(row=r, column=1, value=step).font = DATA_FONT
+        ws.merge_cells(start_row=r, start_column=1, end_row=r, end_column=2)
+        r += 1
+
+
 # ── OOXML Connection Injection ───────────────────────────────────────────────
+NS_SS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+NS_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONNECTIONS_PART = "xl/connections.xml"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+WORKBOOK_RELS_PART = "xl/_rels/workbook.xml.rels"
+CONNECTIONS_CONTENT_TYPE = \
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.connections+xml"
+CONNECTIONS_REL_TYPE = \
+    "http://schemas.openxmlformats.org/officeDocument/2006/relationships/connections"
+
+
+def _xml_bytes(root):
+    return ET.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+
+def connections_xml(connections):
+    """
+    Build xl/connections.xml for a list of dicts with 'id', 'name', 'sql' keys
+    and an optional OLE DB 'connection' string (default CONN_STRING). A
+    connection with a 'url' key is written as a web query on that URL.
+    """
+    ET.register_namespace("", NS_SS)
+    root = ET.Element(f"{{{NS_SS}}}connections")
+    for c in connections:
+        elem = ET.SubElement(root, f"{{{NS_SS}}}connection")
+        elem.set("id", str(c["id"]))
+        elem.set("name", c["name"])
+        elem.set("type", "4" if c.get("url") else "1")
+        elem.set("refreshedVersion", "0")
+        elem.set("background", "1")
+        elem.set("saveData", "1")
+
+        if c.get("url"):
+            webpr = ET.SubElement(elem, f"{{{NS_SS}}}webPr")
+            webpr.set("url", c["url"])
+            webpr.set("htmlTables", "1")
+            webpr.set("htmlFormat", "none")
+            tables = ET.SubElement(webpr, f"{{{NS_SS}}}tables")
+            tables.set("count", "1")
+            ET.SubElement(tables, f"{{{NS_SS}}}s").set("v", "data")
+            continue
+        dbpr = ET.SubElement(elem, f"{{{NS_SS}}}dbPr")
+        dbpr.set("connection", c.get("connection", CONN_STRING))
+        dbpr.set("command", c["sql"])
+        dbpr.set("commandType", "2")
+    return _xml_bytes(root)
+
+
+def patch_content_types(data):
+    """Add the connections part override to [Content_Types].xml (once)."""
+    ET.register_namespace("", NS_CT)
+    root = ET.fromstring(data)
+    for override in root.iter(f"{{{NS_CT}}}Override"):
+        if override.get("PartName") == "/" + CONNECTIONS_PART:
+            return data
+    override = ET.SubElement(root, f"{{{NS_CT}}}Override")
+    override.set("PartName", "/" + CONNECTIONS_PART)
+    override.set("ContentType", CONNECTIONS_CONTENT_TYPE)
+    return _xml_bytes(root)
+
+
+def patch_workbook_rels(data):
+    """Add the connections relationship to workbook.xml.rels (once)."""
+    ET.register_namespace("", NS_REL)
+    root = ET.fromstring(data)
+
+    existing_ids = []
+    for rel in root:
+        if rel.get("Type") == CONNECTIONS_REL_TYPE:
+            return data
+        rid = rel.get("Id", "")
+        if rid.startswith("rId"):
+            try:
+                existing_ids.append(int(rid[3:]))
+            except ValueError:
+                pass
+    next_id = max(existing_ids) + 1 if existing_ids else 1
+
+    rel_elem = ET.SubElement(root, f"{{{NS_REL}}}Relationship")
+    rel_elem.set("Id", f"rId{next_id}")
+    rel_elem.set("Type", CONNECTIONS_REL_TYPE)
+    rel_elem.set("Target", "connections.xml")
+    return _xml_bytes(root)
+
+
+CONNECTION_PATCHES = {
+    CONTENT_TYPES_PART: patch_content_types,
+    WORKBOOK_RELS_PART: patch_workbook_rels,
+}
+
+
+def _copy_member_raw(src, dst, zinfo):
+    """Copy one member's compressed bytes from src to dst without inflating them."""
+    src.fp.seek(zinfo.header_offset)
+    header = src.fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", header[26:30])
+    src.fp.seek(zinfo.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+    raw = src.fp.read(zinfo.compress_size)
+
+    info = copy(zinfo)
+    # CRC and sizes are known, so they go in the local header (no data descriptor)
+    info.flag_bits &= ~0x08
+    info.header_offset = dst.fp.tell()
+    dst.fp.write(info.FileHeader())
+    dst.fp.write(raw)
+    dst.start_dir = dst.fp.tell()
+    dst.filelist.append(info)
+    dst.NameToInfo[info.filename] = info
+    dst._didModify = True
+
+
+def replace_file(tmp_path, path):
+    """
+    Move a finished temp file over path. mkstemp creates files 0600, so the
+    temp file first takes path's mode, or the umask default for a new file,
+    and other readers of a shared drive can still open the workbook.
+    """
+    if os.path.exists(path):
+        shutil.copymode(path, tmp_path)
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+    os.replace(tmp_path, path)
+
+
 def inject_connections(xlsx_path, connections):
     """
-    Inject ODBC connection definitions into the .xlsx zip structure.
+    Inject ODBC connection definitions into an existing .xlsx.
     connections: list of dicts with 'id', 'name', 'sql' keys.
+
+    Single zip-to-zip pass: unchanged members are copied compressed, only
+    [Content_Types].xml and workbook.xml.rels are rewritten, and
+    xl/connections.xml is added (or replaced). Workbooks built by
+    DashboardWorkbook can skip this pass with save(..., connections=...).
     """
-    tmp = tempfile.mkdtemp()
+    out_dir = os.path.dirname(os.path.abspath(xlsx_path))
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=out_dir)
+    os.close(fd)
     try:
-        with zipfile.ZipFile(xlsx_path, "r") as z:
-            z.extractall(tmp)
-
-        ns_ss = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
-        ns_ct = "http://schemas.openxmlformats.org/package/2006/content-types"
-        ns_rel = "http://schemas.openxmlformats.org/package/2006/relationships"
-
-        ET.register_namespace("", ns_ss)
-
-        # 1. Create xl/connections.xml
-        root = ET.Element(f"{{{ns_ss}}}connections")
-        for c in connections:
-            elem = ET.SubElement(root, f"{{{ns_ss}}}connection")
-            elem.set("id", str(c["id"]))
-            elem.set("name", c["name"])
-            elem.set("type", "1")
-            elem.set("refreshedVersion", "0")
-            elem.set("background", "1")
-            elem.set("saveData", "1")
-
-            dbpr = ET.SubElement(elem, f"{{{ns_ss}}}dbPr")
-            dbpr.set("connection", CONN_STRING)
-            dbpr.set("command", c["sql"])
-            dbpr.set("commandType", "2")
-
-        conn_path = os.path.join(tmp, "xl", "connections.xml")
-        ET.ElementTree(root).write(conn_path, xml_declaration=True, encoding="UTF-8")
-
-        # 2. Update [Content_Types].xml
-        ct_path = os.path.join(tmp, "[Content_Types].xml")
-        ET.register_namespace("", ns_ct)
-        ct_tree = ET.parse(ct_path)
-        ct_root = ct_tree.getroot()
-
-        override = ET.SubElement(ct_root, f"{{{ns_ct}}}Override")
-        override.set("PartName", "/xl/connections.xml")
-        override.set(
-            "ContentType",
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.connections+xml",
-        )
-        ct_tree.write(ct_path, xml_declaration=True, encoding="UTF-8")
-
-        # 3. Update xl/_rels/workbook.xml.rels
-        rels_path = os.path.join(tmp, "xl", "_rels", "workbook.xml.rels")
-        ET.register_namespace("", ns_rel)
-        rels_tree = ET.parse(rels_path)
-        rels_root = rels_tree.getroot()
-
-        existing_ids = []
-        for rel in rels_root:
-            rid = rel.get("Id", "")
-            if rid.startswith("rId"):
-                try:
-                    existing_ids.append(int(rid[3:]))
-                except ValueError:
-                    pass
-        next_id = max(existing_ids) + 1 if existing_ids else 1
-
-        rel_elem = ET.SubElement(rels_root, f"{{{ns_rel}}}Relationship")
-        rel_elem.set("Id", f"rId{next_id}")
-        rel_elem.set(
-            "Type",
-            "http://schemas.openxmlformats.org/officeDocument/2006/relationships/connections",
-        )
-        rel_elem.set("Target", "connections.xml")
-        rels_tree.write(rels_path, xml_declaration=True, encoding="UTF-8")
-
-        # Repackage
-        os.remove(xlsx_path)
-        with zipfile.ZipFile(xlsx_path, "w", zipfile.ZIP_DEFLATED) as z:
-            for dirpath, dirnames, filenames in os.walk(tmp):
-                for fn in filenames:
-                    full = os.path.join(dirpath, fn)
-                    arc = os.path.relpath(full, tmp)
-                    z.write(full, arc)
-    finally:
-        shutil.rmtree(tmp)
+        with zipfile.ZipFile(xlsx_path) as src, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as dst:
+            for zinfo in src.infolist():
+                if zinfo.filename == CONNECTIONS_PART:
+                    continue
+                patch = CONNECTION_PATCHES.get(zinfo.filename)
+                if patch:
+                    dst.writestr(zinfo.filename, patch(src.read(zinfo)))
+                else:
+                    _copy_member_raw(src, dst, zinfo)
+            dst.writestr(CONNECTIONS_PART, connections_xml(connections))
+        replace_file(tmp_path, xlsx_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
 
 
 # ── Main ─────────────────────────────────────────────────────────────────────
-def main():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    wb = openpyxl.Workbook()
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the MECM dashboard workbook.")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="workbook path to write")
+    parser.add_argument("--streaming", action="store_true",
+                        help="write dashboard sheets through openpyxl write-only worksheets "
+                             "(flat memory for very large tables)")
+    parser.add_argument("--column-sizing", choices=SIZING_POLICIES, default="all",
+                        help="rows measured for column widths: all, the first "
+                             "--sizing-rows (head) or a random sample of them (reservoir)")
+    parser.add_argument("--sizing-rows", type=int, default=SIZING_ROWS,
+                        help=f"rows measured by the head/reservoir policies and by "
+                             f"streaming sheets (default: {SIZING_ROWS})")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="build the sheets in this many worker processes and assemble "
+                             "the workbook from their parts (0: one per CPU; default: 1)")
+    parser.add_argument("--data-url", metavar="URL",
+                        help="point the workbook's connections at a data_service.py endpoint "
+                             "(e.g. http://reports01:8765) instead of the SQL Server")
+    parser.add_argument("--changes", metavar="QUERY", action="append", default=[],
+                        help="add a sheet with the rows added, removed and changed between "
+                             "the two latest snapshots of a query (see snapshot_diff.py; "
+                             "repeatable)")
+    parser.add_argument("--history-dir", default=os.path.join(OUTPUT_DIR, "history"),
+                        help="snapshot directory for --changes (snapshot_export.py --out)")
+    live = parser.add_argument_group("live data")
+    live.add_argument("--live", action="store_true",
+                      help="run the query catalog and write real rows instead of sample data")
+    live.add_argument("--standin", metavar="PATH",
+                      help="use a SQLite stand-in database (created if missing) "
+                           "instead of SQL Server")
+    live.add_argument("--conn-str", default=None,
+                      help="ODBC connection string for SQL Server (default: built from "
+                           "--conn-profile)")
+    live.add_argument("--conn-profile", default=DEFAULT_PROFILE,
+                      choices=list(CONNECTION_PROFILES),
+                      help="connection profile for live mode and the workbook's connections; "
+                           "unless it is the default, queries naming a profile in their "
+                           f"header keep theirs (default: {DEFAULT_PROFILE})")
+    live.add_argument("--workers", type=int, default=4,
+                      help="queries run in parallel (default: 4)")
+    live.add_argument("--pool-size", type=int, default=0,
+                      help="maximum open connections (default: --workers)")
+    live.add_argument("--query-timeout", type=int, default=120,
+                      help="per-query timeout in seconds (default: 120)")
+    live.add_argument("--detail", metavar="QUERY", action="append", default=[],
+                      choices=list(DETAIL_QUERIES),
+                      help="add a streamed sheet with a large per-device detail query "
+                           f"(repeatable): {', '.join(DETAIL_QUERIES)}")
+    live.add_argument("--page-size", type=int, default=50000,
+                      help="rows per keyset-paginated statement for --detail sheets "
+                           "(default: 50000)")
+    live.add_argument("--fetch-size", type=int, default=5000,
+                      help="rows per fetchmany() call for --detail sheets (default: 5000)")
+    live.add_argument("--sites", metavar="PATH",
+                      help="JSON sites file: run the catalog against every site "
+                           "concurrently and write cross-site totals plus per-site rows")
+    live.add_argument("--max-connections", type=int, default=0,
+                      help="with --sites: queries running at once across all sites "
+                           "(default: from the sites file, else 8)")
+    live.add_argument("--server-connections", type=int, default=0,
+                      help="with --sites: queries running at once per server "
+                           "(default: from the sites file, else 2)")
+    live.add_argument("--site-timeout", type=float, default=None,
+                      help="with --sites: seconds after which a site still running is "
+                           "reported as timed out and left out of the workbook")
+    live.add_argument("--device-facts", action="store_true",
+                      help="fetch one row per device in a single query and compute the OS, "
+                           "hardware, client and security summaries locally (needs pandas)")
+    live.add_argument("--top-n", type=int, default=None, metavar="N",
+                      help="rows kept per chart-backed table before the rest are folded into "
+                           "an \"Other\" row (default: per table, see CHART_TOP_N; 0 = all)")
+    live.add_argument("--summary-tables", action="store_true",
+                      help="read the dashboard queries from the pre-aggregated rpt summary "
+                           "tables (see reporting_schema.py), in live mode and in the "
+                           "workbook's connections")
+    live.add_argument("--no-batch", action="store_true",
+                      help="run every query on its own instead of in QUERY_BATCHES groups")
+    live.add_argument("--no-cache", action="store_true",
+                      help="always query the database; do not read or write the result cache")
+    live.add_argument("--refresh", metavar="QUERY", action="append", default=[],
+                      help="re-run this query even if its cached result is fresh "
+                           "(repeatable; 'all' for every query)")
+    live.add_argument("--cache-path", default=os.path.join(OUTPUT_DIR, ".query_cache.sqlite"),
+                      help="result cache file")
+    live.add_argument("--cache-max-mb", type=int, default=256,
+                      help="result cache size limit; least recently used entries are "
+                           "evicted (default: 256)")
+    watch = parser.add_argument_group("watch mode")
+    watch.add_argument("--watch", action="store_true",
+                       help="keep running: re-run each sheet's queries on its schedule and "
+                            "rewrite the workbook only when a result changed")
+    watch.add_argument("--watch-interval", type=float, default=None, metavar="SECONDS",
+                       help="refresh every sheet at this interval (default: per sheet, the "
+                            "shortest cache TTL of its queries)")
+    watch.add_argument("--watch-cycles", type=int, default=0, metavar="N",
+                       help="stop after N refresh cycles (default: run until stopped)")
+    diag = parser.add_argument_group("diagnostics")
+    diag.add_argument("--metrics", action="store_true",
+                      help="print per-stage and per-query timings at the end of the run")
+    diag.add_argument("--metrics-json", metavar="PATH",
+                      help="write the run metrics as JSON (implies --metrics)")
+    diag.add_argument("--metrics-prom", metavar="PATH",
+                      help="write the run metrics as a Prometheus textfile-collector file "
+                           "(implies --metrics)")
+    diag.add_argument("--profile", metavar="PATH",
+                      help="run under cProfile, dump the stats to PATH and print the top "
+                           "functions by cumulative time")
+    return parser.parse_args(argv)
+
+
+def connection_list(sql_files, data_url=None, profile=DEFAULT_PROFILE):
+    """
+    The workbook's connections: one per catalog query, ODBC by default or a
+    web query on the data_service.py table when data_url is given. Each
+    query's connection profile (effective_profile) sets the connection
+    string and prefixes the command with its isolation level.
+    """
+    conns = []
+    for i, (name, info) in enumerate(sql_files.items(), start=1):
+        query_profile = effective_profile(info, profile)
+        isolation = session_sql(query_profile)
+        conns.append({"id": i, "name": f"MECM - {name}",
+                      "sql": f"{isolation};\n{info['sql']}" if isolation else info["sql"],
+                      "connection": oledb_conn_string(query_profile)})
+    if data_url:
+        from data_service import table_slug
+        base = data_url.rstrip("/")
+        for c, name in zip(conns, sql_files):
+            c["url"] = f"{base}/tables/{table_slug(name)}.html"
+    return conns
+
+
+def generate(args, metrics):
+    """Build and save the workbook, timing each stage into metrics."""
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    # Read project SQL files and the security aggregation queries
+    with metrics.stage("sql catalog"):
+        sql_files = build_query_catalog()
+    if args.summary_tables:
+        # The workbook's connections read the summary tables too
+        from reporting_schema import summary_catalog
+        sql_files = summary_catalog(sql_files)
+
+    if args.device_facts and args.sites:
+        raise SystemExit("--device-facts is not supported with --sites")
+    if args.device_facts and args.summary_tables:
+        raise SystemExit("--device-facts and --summary-tables cannot be combined")
+    if args.device_facts and not (args.live or args.standin):
+        raise SystemExit("--device-facts needs --live or --standin")
+    live = None
+    if args.live or args.standin or args.sites:
+        with metrics.stage("live queries"):
+            live = run_live_queries(sql_files, args)
+        if args.device_facts:
+            from device_facts import FACT_QUERY, FACT_SUMMARIES, summarize_results
+            with metrics.stage("device facts (local aggregation)"):
+                live = summarize_results(live)
+                apply_top_n(live, args.top_n, FACT_SUMMARIES)
+        if args.sites:
+            # Top-N is applied to the cross-site totals, not to each site
+            apply_top_n(live, args.top_n)
+            for site, results in live.site_results.items():
+                metrics.add_results({f"{site}: {name}": res for name, res in results.items()})
+        else:
+            metrics.add_results(live)
+        if args.device_facts:
+            # The per-device rows are not read by any sheet builder
+            del live[FACT_QUERY]
+    if args.detail and live is None:
+        raise SystemExit("--detail needs --live or --standin")
+    if args.detail and args.sites:
+        raise SystemExit("--detail is not supported with --sites")
+    if args.changes:
+        # Fail before any sheet is built if pyarrow or pandas is missing
+        from snapshot_diff import _libraries
+        _libraries()
+    builders = SHEET_BUILDERS + ((build_sites_sheet,) if args.sites else ())
+
+    # ODBC connections are written into the xlsx zip as part of the save
+    conn_list = connection_list(sql_files, args.data_url, args.conn_profile)
+
+    processes = args.processes or os.cpu_count() or 1
+    if processes > 1:
+        from parallel_build import build_parallel
+        build_parallel(args, builders, sql_files, live, conn_list, metrics, processes)
+        print(f"Workbook saved: {args.output} (sheets built in {processes} processes)")
+        print(f"Injected {len(conn_list)} data connections")
+        return
+
+    wb = DashboardWorkbook(streaming=args.streaming, size_policy=args.column_sizing,
+                           size_rows=args.sizing_rows)
     # Remove default sheet
     wb.remove(wb.active)
 
-    # Read project SQL files
-    sql_files = {
-        "OS Count Summary": {
-            "source": "Operating-Systems/OS_Count_Summary.sql",
-            "sql": read_sql("Operating-Systems/OS_Count_Summary.sql"),
-        },
-        "OS Feature Update Counts": {
-            "source": "Operating-Systems/OS_FeatureUpdate_Counts.sql",
-            "sql": read_sql("Operating-Systems/OS_FeatureUpdate_Counts.sql"),
-        },
-        "Memory Summary": {
-            "source": "Hardware-Inventory/Memory_Summary.sql",
-            "sql": read_sql("Hardware-Inventory/Memory_Summary.sql"),
-        },
-        "Device Models": {
-            "source": "Hardware-Inventory/Device_Models.sql",
-            "sql": read_sql("Hardware-Inventory/Device_Models.sql"),
-        },
-        "Client Version": {
-            "source": "Client-Health/Client_Version.sql",
-            "sql": read_sql("Client-Health/Client_Version.sql"),
-        },
-        "Update Compliance Summary": {
-            "source": "Software-Updates/Update_Compliance_Summary.sql",
-            "sql": read_sql("Software-Updates/Update_Compliance_Summary.sql"),
-        },
-        "Update Deployment Status": {
-            "source": "Software-Updates/Update_Deployment_Status.sql",
-            "sql": read_sql("Software-Updates/Update_Deployment_Status.sql"),
-        },
-        "Deployment Summary": {
-            "source": "Applications/Deployment_Summary.sql",
-            "sql": read_sql("Applications/Deployment_Summary.sql"),
-        },
-        "Application Deployment Status": {
-            "source": "Applications/Application_Deployment_Status.sql",
-            "sql": read_sql("Applications/Application_Deployment_Status.sql"),
-        },
-        "Server OS Versions": {
-            "source": "Server/Server_OS_Versions.sql",
-            "sql": read_sql("Server/Server_OS_Versions.sql"),
-        },
-    }
-
-    # Add security aggregation queries
-    for name, sql in SECURITY_QUERIES.items():
-        sql_files[name] = {"source": "Dashboard (aggregation)", "sql": sql}
-
     # Build all sheets
-    build_os_dashboard(wb)
-    build_hardware_dashboard(wb)
-    build_client_health(wb)
-    build_update_compliance(wb)
-    build_security_dashboard(wb)
-    build_applications_dashboard(wb)
-    build_server_dashboard(wb)
-    build_queries_sheet(wb, sql_files)
-    build_connection_sheet(wb)
+    for builder in builders:
+        with metrics.stage(builder.__name__):
+            run_builder(builder, wb, live)
+    for name in args.detail:
+        with metrics.stage(f"build_detail_sheet {name}"):
+            build_detail_sheet(wb, name, args, metrics)
+    for name in args.changes:
+        with metrics.stage(f"build_changes_sheet {name}"):
+            build_changes_sheet(wb, name, args)
+    with metrics.stage("reference sheets"):
+        build_queries_sheet(wb, sql_files)
+        build_connection_sheet(wb, args.data_url, args.conn_profile)
 
     # Save workbook
-    wb.save(OUTPUT_FILE)
-    print(f"Workbook saved: {OUTPUT_FILE}")
+    with metrics.stage("save (with connections)"):
+        wb.save(args.output, connections=conn_list)
+    print(f"Workbook saved: {args.output}")
+    print(f"Injected {len(conn_list)} data connections")
 
-    # Inject ODBC connections into xlsx zip
-    conn_list = []
-    for i, (name, info) in enumerate(sql_files.items(), start=1):
-        conn_list.append({"id": i, "name": f"MECM - {name}", "sql": info["sql"]})
 
-    inject_connections(OUTPUT_FILE, conn_list)
-    print(f"Injected {len(conn_list)} data connections")
+def main(argv=None):
+    args = parse_args(argv)
+    if args.watch:
+        from watch_mode import watch
+        watch(args)
+        return
+    metrics = RunMetrics()
+    if args.profile:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        profiler.runcall(generate, args, metrics)
+        profiler.dump_stats(args.profile)
+        print(f"Profile written: {args.profile}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+    else:
+        generate(args, metrics)
+    metrics.finish()
+
+    if args.metrics or args.metrics_json or args.metrics_prom:
+        metrics.summary()
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"Metrics written: {args.metrics_json}")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+        print(f"Metrics written: {args.metrics_prom}")
     print("Done.")
 
 
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+SSRS Report (RDL) Generator
+
+Builds RDL/<Category>/<Name>.rdl from each .sql file: the CommandText is the
+SQL with its comment header and DECLARE lines stripped, the DECLAREs become
+ReportParameters bound through QueryParameters, and the Fields and tablix
+columns follow the query's [Column] aliases.
+
+A manifest (RDL/manifest.json) records the hash of each report's source and
+output, so later runs only regenerate reports whose .sql file changed (or
+whose .rdl is missing or was edited). Full rebuilds fan out over a process
+pool.
+
+    python3 generate_rdl.py            # regenerate changed reports
+    python3 generate_rdl.py --force    # regenerate everything
+    python3 generate_rdl.py --check    # report drift, write nothing
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from sql_catalog import BASE_DIR, get_catalog
+
+RDL_DIR = os.path.join(BASE_DIR, "RDL")
+MANIFEST_FILE = os.path.join(RDL_DIR, "manifest.json")
+# Bump when the template changes so every report is rebuilt
+GENERATOR_VERSION = 1
+
+BODY_WIDTH = 10.0  # inches of printable width on the 11in landscape page
+PARAM_TYPES = {"INT": "Integer", "BIGINT": "Integer", "SMALLINT": "Integer",
+               "TINYINT": "Integer", "BIT": "Boolean", "FLOAT": "Float",
+               "DECIMAL": "Float", "NUMERIC": "Float", "DATETIME": "DateTime",
+               "DATE": "DateTime"}
+HEADER_COLOR = "#4472C4"
+
+_ALIAS = re.compile(r"\bAS\s+\[([^\]]+)\]\s*$", re.IGNORECASE)
+_SELECT_TOKEN = re.compile(r"'(?:[^']|'')*'|--[^\n]*|\(|\)|,|\bSELECT\b|\bFROM\b",
+                           re.IGNORECASE)
+
+
+# ── SQL ──────────────────────────────────────────────────────────────────────
+def select_columns(sql):
+    """Return the [alias] names of the outermost SELECT list, in order."""
+    depth, start, items = 0, None, []
+    for m in _SELECT_TOKEN.finditer(sql):
+        token = m.group(0).upper()
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token == "SELECT" and start is None:
+            start = m.end()
+        elif depth == 0 and token == "," and start is not None:
+            items.append(sql[start:m.start()])
+            start = m.end()
+        elif depth == 0 and token == "FROM" and start is not None:
+            items.append(sql[start:m.start()])
+            break
+    columns = []
+    for item in items:
+        m = _ALIAS.search(item.strip())
+        if m:
+            columns.append(m.group(1))
+    return columns
+
+
+def field_name(column):
+    """RDL names must be CLS identifiers: 'RAM (GB)' -> RAM_GB, 'Compliance %' -> Compliance_Pct."""
+    name = re.sub(r"[()]", "", column.replace("%", "Pct")).strip()
+    name = re.sub(r"\W", "_", name)
+    return name if name[:1].isalpha() else "F_" + name
+
+
+# ── RDL Template ─────────────────────────────────────────────────────────────
+def _indent(lines, n):
+    return [" " * n + line for line in lines]
+
+
+def _report_parameters(params):
+    if not params:
+        return []
+    lines = ["<ReportParameters>"]
+    for p in params:
+        lines += [
+            f'  <ReportParameter Name="{p["name"]}">',
+            f'    <DataType>{PARAM_TYPES.get(p["type"].split("(")[0], "String")}</DataType>',
+            f'    <Prompt>{p["name"]}</Prompt>',
+        ]
+        if p["default"] is not None:
+            lines += [
+                "    <DefaultValue>",
+                "      <Values>",
+                f'        <Value>{escape(str(p["default"]))}</Value>',
+                "      </Values>",
+                "    </DefaultValue>",
+            ]
+        lines.append("  </ReportParameter>")
+    lines.append("</ReportParameters>")
+    return lines
+
+
+def _dataset(command, params, columns):
+    lines = [
+        '<DataSet Name="MainQuery">',
+        "  <Query>",
+        "    <DataSourceName>CMDatabase</DataSourceName>",
+        f"    <CommandText>{escape(command)}</CommandText>",
+    ]
+    if params:
+        lines.append("    <QueryParameters>")
+        for p in params:
+            lines += [
+                f'      <QueryParameter Name="@{p["name"]}">',
+                f'        <Value>=Parameters!{p["name"]}.Value</Value>',
+                "      </QueryParameter>",
+            ]
+        lines.append("    </QueryParameters>")
+    lines += ["  </Query>", "  <Fields>"]
+    for col in columns:
+        lines += [
+            f'    <Field Name="{field_name(col)}">',
+            f"      <DataField>{escape(col)}</DataField>",
+            "      <rd:TypeName>System.String</rd:TypeName>",
+            "    </Field>",
+        ]
+    lines += ["  </Fields>", "</DataSet>"]
+    return lines
+
+
+def _textbox(name, value, header):
+    run = ["<TextRun>", f"  <Value>{escape(value)}</Value>"]
+    if header:
+        run += ["  <Style>", "    <FontWeight>Bold</FontWeight>", "  </Style>"]
+    run.append("</TextRun>")
+    style = ["<Style>"]
+    if header:
+        style += [f"  <BackgroundColor>{HEADER_COLOR}</BackgroundColor>", "  <Color>White</Color>"]
+    style += [
+        "  <Border>",
+        "    <Style>Solid</Style>",
+        "    <Width>1pt</Width>",
+        "  </Border>",
+        "  <PaddingLeft>2pt</PaddingLeft>",
+        "  <PaddingRight>2pt</PaddingRight>",
+        "</Style>",
+    ]
+    return [
+        "<TablixCell>",
+        "  <CellContents>",
+        f'    <Textbox Name="{name}">',
+        "      <Paragraphs>",
+        "        <Paragraph>",
+        "          <TextRuns>",
+        *_indent(run, 12),
+        "          </TextRuns>",
+        "        </Paragraph>",
+        "      </Paragraphs>",
+        *_indent(style, 6),
+        "    </Textbox>",
+        "  </CellContents>",
+        "</TablixCell>",
+    ]
+
+
+def _tablix(columns):
+    width = f"{round(BODY_WIDTH / len(columns), 4)}in"
+    widths = []
+    for _ in columns:
+        widths += ["<TablixColumn>", f"  <Width>{width}</Width>", "</TablixColumn>"]
+    header, detail = [], []
+    for col in columns:
+        header += _textbox(f"Header_{field_name(col)}", col, True)
+        detail += _textbox(f"Detail_{field_name(col)}", f"=Fields!{field_name(col)}.Value",
+                           False)
+    rows = []
+    for cells in (header, detail):
+        rows += [
+            "<TablixRow>",
+            "  <Height>0.25in</Height>",
+            "  <TablixCells>",
+            *_indent(cells, 4),
+            "  </TablixCells>",
+            "</TablixRow>",
+        ]
+    return [
+        '<Tablix Name="MainTable">',
+        "  <DataSetName>MainQuery</DataSetName>",
+        "  <Top>0in</Top>",
+        "  <Left>0in</Left>",
+        "  <TablixColumns>",
+        *_indent(widths, 4),
+        "  </TablixColumns>",
+        "  <TablixBody>",
+        "    <TablixColumns>",
+        *_indent(widths, 6),
+        "    </TablixColumns>",
+        "    <TablixRows>",
+        *_indent(rows, 6),
+        "    </TablixRows>",
+        "  </TablixBody>",
+        "  <TablixColumnHierarchy>",
+        "    <TablixMembers>",
+        *["      <TablixMember/>" for _ in columns],
+        "    </TablixMembers>",
+        "  </TablixColumnHierarchy>",
+        "  <TablixRowHierarchy>",
+        "    <TablixMembers>",
+        "      <TablixMember>",
+        "        <KeepWithGroup>After</KeepWithGroup>",
+        "      </TablixMember>",
+        "      <TablixMember>",
+        '        <Group Name="Details"/>',
+        "      </TablixMember>",
+        "    </TablixMembers>",
+        "  </TablixRowHierarchy>",
+        "</Tablix>",
+    ]
+
+
+def render_rdl(entry):
+    """Return the RDL document for one catalog entry."""
+    columns = select_columns(entry["body"])
+    if not columns:
+        raise ValueError(f"{entry['path']}: no [Column] aliases in the SELECT list")
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<Report xmlns="http://schemas.microsoft.com/sqlserver/reporting/2016/01/reportdefinition" '
+        'xmlns:rd="http://schemas.microsoft.com/SQLServer/reporting/reportdesigner">',
+        "  <AutoRefresh>0</AutoRefresh>",
+        "  <DataSources>",
+        '    <DataSource Name="CMDatabase">',
+        "      <DataSourceReference>CMDatabase</DataSourceReference>",
+        "      <rd:SecurityType>None</rd:SecurityType>",
+        "    </DataSource>",
+        "  </DataSources>",
+        *_indent(_report_parameters(entry["params"]), 2),
+        "  <DataSets>",
+        *_indent(_dataset(entry["body"], entry["params"], columns), 4),
+        "  </DataSets>",
+        "  <ReportSections>",
+        "    <ReportSection>",
+        "      <Body>",
+        "        <Height>2in</Height>",
+        "        <ReportItems>",
+        *_indent(_tablix(columns), 10),
+        "        </ReportItems>",
+        "      </Body>",
+        "      <Page>",
+        "        <PageHeight>8.5in</PageHeight>",
+        "        <PageWidth>11in</PageWidth>",
+        "        <LeftMargin>0.5in</LeftMargin>",
+        "        <RightMargin>0.5in</RightMargin>",
+        "        <TopMargin>0.5in</TopMargin>",
+        "        <BottomMargin>0.5in</BottomMargin>",
+        "      </Page>",
+        "    </ReportSection>",
+        "  </ReportSections>",
+        "</Report>",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+# ── Build ────────────────────────────────────────────────────────────────────
+def rdl_path(entry):
+    return os.path.join(RDL_DIR, os.path.splitext(entry["path"])[0] + ".rdl")
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path):
+    try:
+        with open(path, "rb") as f:
+            return sha256(f.read())
+    except OSError:
+        return None
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get("reports", {}) if manifest.get("generator") == GENERATOR_VERSION else {}
+
+
+def save_manifest(reports):
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump({"generator": GENERATOR_VERSION, "reports": reports}, f, indent=2,
+                  sort_keys=True)
+        f.write("\n")
+
+
+def build(entry):
+    """Render one report; returns (relative sql path, rdl bytes). Runs in worker processes."""
+    return entry["path"], render_rdl(entry).encode("utf-8")
+
+
+def render_all(entries, workers):
+    """Render entries, over a process pool when there are enough of them."""
+    if workers > 1 and len(entries) > workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(build, entries, chunksize=4))
+    return dict(build(e) for e in entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate SSRS RDL reports from the .sql files.")
+    parser.add_argument("--check", action="store_true",
+                        help="report reports that differ from their .sql source; write nothing")
+    parser.add_argument("--force", action="store_true", help="regenerate every report")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used for rebuilds (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    entries = {e["path"]: e for e in catalog}
+
+    if args.check:
+        rendered = render_all(list(entries.values()), args.workers)
+        drift = []
+        for path, data in sorted(rendered.items()):
+            on_disk = file_hash(rdl_path(entries[path]))
+            if on_disk != sha256(data):
+                drift.append(path)
+                print(f"  {'missing' if on_disk is None else 'out of date'}: "
+                      f"{os.path.relpath(rdl_path(entries[path]), BASE_DIR)}")
+        print(f"{len(drift)} of {len(rendered)} reports differ from their .sql source")
+        sys.exit(1 if drift else 0)
+
+    manifest = {} if args.force else load_manifest()
+    stale = [e for path, e in entries.items()
+             if path not in manifest
+             or manifest[path]["source"] != e["sha256"]
+             or manifest[path]["rdl"] != file_hash(rdl_path(e))]
+
+    rendered = render_all(stale, args.workers)
+    written = 0
+    for path, data in rendered.items():
+        out = rdl_path(entries[path])
+        digest = sha256(data)
+        if file_hash(out) != digest:
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with open(out, "wb") as f:
+                f.write(data)
+            written += 1
+            print(f"  wrote {os.path.relpath(out, BASE_DIR)}")
+        manifest[path] = {"source": entries[path]["sha256"], "rdl": digest}
+
+    save_manifest({path: manifest[path] for path in sorted(entries) if path in manifest})
+    print(f"{len(rendered)} of {len(entries)} reports regenerated, {written} changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Multi-Site Fan-Out
+
+Runs the dashboard query catalog against several MECM sites at once and
+consolidates the results for one workbook.
+
+The sites file is JSON:
+
+    {
+      "max_connections": 8,
+      "server_connections": 2,
+      "sites": [
+        {"name": "PS1", "server": "MECMServer", "database": "CM_PS1"},
+        {"name": "PS2", "server": "MECMServer2", "database": "CM_PS2"},
+        {"name": "LAB", "conn_str": "Driver={ODBC Driver 18 for SQL Server};..."},
+        {"name": "OFFLINE", "standin": "standin.db"}
+      ]
+    }
+
+Every site runs on its own thread with its own connection pool. No more
+than max_connections queries run at once overall, nor more than
+server_connections against any one server (sites sharing a server share
+that limit). A conn_str site's server is read from its Server= or Data
+Source= keyword; a string naming neither counts as a server of its own. A
+site that fails or is still running at the site deadline is reported and
+left out of the consolidated results; the other sites are not held up by
+it.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from query_executor import (ConnectionPool, conn_string_keys, conn_server, conn_target,
+                            connect_mssql, connect_standin, run_queries)
+
+DEFAULT_MAX_CONNECTIONS = 8
+DEFAULT_SERVER_CONNECTIONS = 2
+
+
+class SiteResults(dict):
+    """
+    Consolidated live results: query name -> cross-site total result, in the
+    shape run_queries returns. by_site holds query -> [(site, result)] for
+    every site that answered, sites the per-site status, site_results each
+    finished site's raw run_queries results, and used collects the
+    (query, headers) pairs read by the sheet builder being run.
+    """
+
+    def __init__(self, totals, by_site, sites, site_results):
+        super().__init__(totals)
+        self.by_site = by_site
+        self.sites = sites
+        self.site_results = site_results
+        self.used = []
+
+
+# ── Config ───────────────────────────────────────────────────────────────────
+def load_sites(path, conn_template, init=None, profile=None):
+    """
+    Read a sites file; returns (sites, max_connections, server_connections).
+    init: session statement run on each new SQL Server connection; profile:
+    the connection profile's name, part of each site's cache target. A site
+    given as conn_str gets its server and database from the string.
+    """
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    sites = []
+    for site in config["sites"]:
+        site = dict(site)
+        if site.get("standin"):
+            site["standin"] = os.path.join(base, site["standin"])
+            site.setdefault("server", "stand-in")
+            site.setdefault("database", os.path.basename(site["standin"]))
+        elif not site.get("conn_str"):
+            site["conn_str"] = conn_template.format(server=site["server"],
+                                                    database=site["database"])
+        else:
+            keys = conn_string_keys(site["conn_str"])
+            server = conn_server(site["conn_str"])
+            if server:
+                site.setdefault("server", server)
+            database = keys.get("database") or keys.get("initial catalog")
+            if database:
+                site.setdefault("database", database)
+        site.setdefault("name", f"{site.get('server')}/{site.get('database')}")
+        site["init"] = init
+        site["profile"] = profile
+        sites.append(site)
+    names = [s["name"] for s in sites]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate site names in {path}: {names}")
+    return (sites, config.get("max_connections", DEFAULT_MAX_CONNECTIONS),
+            config.get("server_connections", DEFAULT_SERVER_CONNECTIONS))
+
+
+def site_target(site):
+    """Return (connect, target) for one site, as live_target does for one server."""
+    if site.get("standin"):
+        if not os.path.exists(site["standin"]):
+            raise FileNotFoundError(f"stand-in database not found: {site['standin']}")
+        return connect_standin(site["standin"]), f"stand-in {site['standin']}"
+    # The target keys the site's result cache, so it comes from the connection string
+    target = conn_target(site["conn_str"])
+    if site.get("profile"):
+        target += f" [{site['profile']}]"
+    return connect_mssql(site["conn_str"], init=site.get("init")), target
+
+
+# ── Totals ───────────────────────────────────────────────────────────────────
+def site_totals(spec, results):
+    """
+    Combine one query's per-site results into cross-site totals (see
+    SITE_TOTALS). results: [(site, result)] without errors.
+    """
+    columns = results[0][1]["columns"]
+    keys = [columns.index(c) for c in spec["keys"]]
+    ratio = spec.get("ratio", {})
+    weighted = spec.get("weighted", {})
+    summed = [i for i, c in enumerate(columns)
+              if i not in keys and c not in ratio and c not in weighted]
+
+    groups = {}
+    for _, res in results:
+        idx = [res["columns"].index(c) for c in columns]
+        for raw in res["rows"]:
+            row = [raw[i] for i in idx]
+            key = tuple(row[i] for i in keys)
+            acc = groups.setdefault(key, {"sums": {i: 0 for i in summed},
+                                          "weighted": {c: [0, 0] for c in weighted}})
+            for i in summed:
+                acc["sums"][i] += row[i] or 0
+            for col, weight_col in weighted.items():
+                value, weight = row[columns.index(col)], row[columns.index(weight_col)] or 0
+                if value is not None:
+                    acc["weighted"][col][0] += value * weight
+                    acc["weighted"][col][1] += weight
+
+    rows = []
+    for key, acc in groups.items():
+        row = [None] * len(columns)
+        for i, value in zip(keys, key):
+            row[i] = value
+        for i in summed:
+            row[i] = acc["sums"][i]
+        for col, (num, den) in ratio.items():
+            n, d = acc["sums"][columns.index(num)], acc["sums"][columns.index(den)]
+            row[columns.index(col)] = round(n * 100.0 / d, 1) if d else None
+        for col, (total, weight) in acc["weighted"].items():
+            row[columns.index(col)] = round(total / weight, 1) if weight else None
+        rows.append(tuple(row))
+    return rows
+
+
+def consolidate(site_results, sites, totals_spec):
+    """Build SiteResults from {site name: run_queries results} for the finished sites."""
+    by_site, totals = {}, {}
+    queries = {name for results in site_results.values() for name in results}
+    for name in queries:
+        answered = [(site["name"], site_results[site["name"]][name]) for site in sites
+                    if site["name"] in site_results
+                    and not site_results[site["name"]][name]["error"]]
+        by_site[name] = answered
+        if not answered:
+            totals[name] = {"columns": [], "rows": [], "elapsed": 0.0,
+                            "error": "no site returned a result", "cached": None}
+            continue
+        spec = totals_spec.get(name)
+        rows = (site_totals(spec, answered) if spec
+                else [row for _, res in answered for row in res["rows"]])
+        totals[name] = {"columns": answered[0][1]["columns"], "rows": rows,
+                        "elapsed": max(res["elapsed"] for _, res in answered),
+                        "error": None, "cached": None}
+    return totals, by_site
+
+
+# ── Fan-Out ──────────────────────────────────────────────────────────────────
+def run_sites(sites, catalog, max_connections, server_connections, timeout, site_timeout=None,
+              cache_path=None, cache_max_bytes=None, refresh=(), batches=None,
+              totals_spec=None):
+    """
+    Run the catalog against every site concurrently and return SiteResults.
+    A site still running after site_timeout seconds is reported as timed out
+    and left out; its queries are bounded by the per-query timeout.
+    """
+    global_limit = threading.BoundedSemaphore(max_connections)
+    server_limits = {}
+    for site in sites:
+        server_limits.setdefault(site.get("server", site["name"]).lower(),
+                                 threading.BoundedSemaphore(server_connections))
+
+    def run_site(site):
+        start = time.perf_counter()
+        connect, target = site_target(site)
+        cache = None
+        if cache_path:
+            from query_cache import ResultCache
+            cache = ResultCache(cache_path, target=target, max_bytes=cache_max_bytes)
+        limits = (global_limit, server_limits[site.get("server", site["name"]).lower()])
+        tag = f"[live {site['name']}]"
+        try:
+            with ConnectionPool(connect, size=server_connections, limits=limits) as pool:
+                results = run_queries(pool, catalog, workers=server_connections,
+                                      timeout=timeout, cache=cache, refresh=refresh,
+                                      batches=batches,
+                                      log=lambda msg: print(msg.replace("[live]", tag, 1)))
+        finally:
+            if cache is not None:
+                cache.close()
+        return results, time.perf_counter() - start
+
+    print(f"Running {len(catalog)} queries against {len(sites)} sites "
+          f"({max_connections} connections in total, {server_connections} per server, "
+          f"query timeout {timeout}s"
+          + (f", site timeout {site_timeout}s)" if site_timeout else ")"))
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(sites), thread_name_prefix="site")
+    futures = {executor.submit(run_site, site): site for site in sites}
+    done, _ = wait(futures, timeout=site_timeout)
+    # Stragglers keep running in the background until their queries time out
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    site_results, status = {}, []
+    for future, site in futures.items():
+        entry = {"site": site["name"], "server": site.get("server", ""),
+                 "database": site.get("database", ""), "queries": 0, "failed": 0}
+        if future not in done:
+            entry.update(status="timed out", seconds=time.perf_counter() - start,
+                         error=f"still running after {site_timeout}s")
+        elif future.exception() is not None:
+            exc = future.exception()
+            entry.update(status="failed", seconds=None, error=str(exc) or repr(exc))
+        else:
+            results, seconds = future.result()
+            failed = [name for name, res in results.items() if res["error"]]
+            entry.update(status="ok" if not failed else "partial", seconds=seconds,
+                         queries=len(results) - len(failed), failed=len(failed),
+                         error="; ".join(failed))
+            if len(failed) < len(results):
+                site_results[site["name"]] = results
+            else:
+                entry["status"] = "failed"
+        status.append(entry)
+        if entry["status"] != "ok":
+            print(f"Warning: site {site['name']} {entry['status']}: {entry['error']}")
+
+    totals, by_site = consolidate(site_results, sites, totals_spec or {})
+    return SiteResults(totals, by_site, status, site_results)
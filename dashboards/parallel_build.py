@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Multi-Process Sheet Construction
+
+Runs each dashboard sheet builder (and each --detail and --changes sheet) in
+its own worker process. A worker builds its sheet in a one-sheet
+DashboardWorkbook and saves it, so the worksheet, drawing, chart and table parts are
+serialised and compressed in parallel. The parent then assembles one
+workbook:
+
+1. The workers' style tables are merged into the parent workbook, giving
+   each part a map from its cell style ids to the merged ones.
+2. The parent builds the reference sheets, adds an empty placeholder for
+   every worker sheet and saves this skeleton with the ODBC connections.
+3. The parts are renumbered after the skeleton's own (sheetN, drawingN,
+   chartN, tableN), relationship targets and table ids are rewritten, and
+   [Content_Types].xml gets an override per new part.
+4. One zip-to-zip pass copies the skeleton and every part's compressed
+   members into the output, replacing the placeholders.
+
+Parts are merged largest first, so the big detail sheets normally keep their
+style ids and are copied without being inflated; sheets whose ids do change
+are rewritten in the worker pool.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+
+from openpyxl.styles.builtins import styles as BUILTIN_STYLES
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
+
+import generate_dashboard as gd
+
+_PART = re.compile(r"^(xl/(?:worksheets|drawings|charts|tables)/(?:_rels/)?)"
+                   r"(sheet|drawing|chart|table)(\d+)(\.xml(?:\.rels)?)$")
+_TARGET = re.compile(rb'(Target="[^"]*?)(sheet|drawing|chart|table)(\d+)(\.xml")')
+_TABLE_ID = re.compile(rb'(<table\b[^>]*?\bid=")(\d+)(")')
+_STYLED_TAG = re.compile(rb"<(?:c|row|col)\b[^>]*>")
+_STYLE_ATTR = re.compile(rb'( (?:s|style)=")(\d+)(")')
+
+
+# ── Workers ──────────────────────────────────────────────────────────────────
+def build_part(task, args, live, workdir):
+    """
+    Build one task's sheet(s) in a fresh workbook and save it under workdir.
+    task is ("builder", function name), ("detail", query name) or
+    ("changes", query name).
+    """
+    from run_metrics import RunMetrics
+
+    start = time.perf_counter()
+    kind, name = task
+    wb = gd.DashboardWorkbook(streaming=args.streaming, size_policy=args.column_sizing,
+                              size_rows=args.sizing_rows)
+    wb.remove(wb.active)
+    metrics = RunMetrics()
+    if kind == "builder":
+        gd.run_builder(getattr(gd, name), wb, live)
+    elif kind == "changes":
+        gd.build_changes_sheet(wb, name, args)
+    else:
+        gd.build_detail_sheet(wb, name, args, metrics)
+    path = os.path.join(workdir, f"{kind}_{name}.xlsx")
+    wb.save(path)
+    return {
+        "task": task,
+        "path": path,
+        "titles": wb.sheetnames,
+        "styles": {
+            "fonts": list(wb._fonts),
+            "fills": list(wb._fills),
+            "borders": list(wb._borders),
+            "alignments": list(wb._alignments),
+            "protections": list(wb._protections),
+            "number_formats": list(wb._number_formats),
+            "cell_styles": list(wb._cell_styles),
+            "named_styles": wb.named_styles,
+        },
+        "queries": metrics.queries,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def remap_styles(data, xf_map):
+    """Rewrite the s= / style= attributes of a worksheet's c, row and col tags."""
+    def attr(m):
+        return m.group(1) + str(xf_map[int(m.group(2))]).encode() + m.group(3)
+
+    return _STYLED_TAG.sub(lambda m: _STYLE_ATTR.sub(attr, m.group(0)), data)
+
+
+def remap_sheets(path, members, xf_map, out_path):
+    """Write members of a part with remapped style ids to a new zip at out_path."""
+    with zipfile.ZipFile(path) as src, \
+            zipfile.ZipFile(out_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as dst:
+        for member in members:
+            dst.writestr(member, remap_styles(src.read(member), xf_map))
+    return out_path
+
+
+# ── Assembly ─────────────────────────────────────────────────────────────────
+def merge_styles(wb, styles):
+    """Add a part's cell styles to wb; returns the part's xf id -> wb xf id map."""
+    xf_map = []
+    for xf in styles["cell_styles"]:
+        new = copy(xf)
+        new.fontId = wb._fonts.add(styles["fonts"][xf.fontId])
+        new.fillId = wb._fills.add(styles["fills"][xf.fillId])
+        new.borderId = wb._borders.add(styles["borders"][xf.borderId])
+        new.alignmentId = wb._alignments.add(styles["alignments"][xf.alignmentId])
+        new.protectionId = wb._protections.add(styles["protections"][xf.protectionId])
+        if xf.numFmtId >= BUILTIN_FORMATS_MAX_SIZE:
+            code = styles["number_formats"][xf.numFmtId - BUILTIN_FORMATS_MAX_SIZE]
+            new.numFmtId = wb._number_formats.add(code) + BUILTIN_FORMATS_MAX_SIZE
+        named = styles["named_styles"][xf.xfId]
+        if named not in wb.named_styles:
+            wb.add_named_style(copy(BUILTIN_STYLES[named]))
+        new.xfId = wb.named_styles.index(named)
+        xf_map.append(wb._cell_styles.add(new))
+    return xf_map
+
+
+def part_numbers(names):
+    """Highest part number of each kind (sheet, drawing, chart, table) in names."""
+    highest = {"sheet": 0, "drawing": 0, "chart": 0, "table": 0}
+    for name in names:
+        m = _PART.match(name)
+        if m:
+            highest[m.group(2)] = max(highest[m.group(2)], int(m.group(3)))
+    return highest
+
+
+def content_type_overrides(data):
+    """PartName -> ContentType from a [Content_Types].xml."""
+    root = ET.fromstring(data)
+    return {o.get("PartName"): o.get("ContentType")
+            for o in root.iter(f"{{{gd.NS_CT}}}Override")}
+
+
+def add_overrides(data, overrides):
+    """Add Override elements for new parts to [Content_Types].xml."""
+    ET.register_namespace("", gd.NS_CT)
+    root = ET.fromstring(data)
+    for part_name, content_type in overrides:
+        override = ET.SubElement(root, f"{{{gd.NS_CT}}}Override")
+        override.set("PartName", part_name)
+        override.set("ContentType", content_type)
+    return gd._xml_bytes(root)
+
+
+def build_parallel(args, builders, sql_files, live, conn_list, metrics, processes):
+    """Build the workbook with sheet builders in worker processes and assemble it."""
+    tasks = [("builder", builder.__name__) for builder in builders]
+    tasks += [("detail", name) for name in args.detail]
+    tasks += [("changes", name) for name in args.changes]
+    workdir = tempfile.mkdtemp(prefix="mecm_parts_",
+                               dir=os.path.dirname(os.path.abspath(args.output)))
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            # Detail sheets are the slowest, so they start first
+            order = sorted(tasks, key=lambda t: t[0] != "detail")
+            with metrics.stage(f"sheet builders ({processes} processes)"):
+                futures = {task: pool.submit(build_part, task, args, live, workdir)
+                           for task in order}
+                parts = [futures[task].result() for task in tasks]
+            for part in parts:
+                metrics.add_stage(f"{part['task'][1]} [worker]", part["seconds"])
+                metrics.queries.update(part["queries"])
+
+            with metrics.stage("assemble"):
+                assemble_workbook(args, parts, sql_files, conn_list, pool, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def assemble_workbook(args, parts, sql_files, conn_list, pool, workdir):
+    """Merge the parts' styles, save the skeleton with the reference sheets and assemble."""
+    wb = gd.DashboardWorkbook(streaming=args.streaming, size_policy=args.column_sizing,
+                              size_rows=args.sizing_rows)
+    wb.remove(wb.active)
+    # Largest parts first: their style ids are the likeliest to survive
+    by_size = sorted(parts, key=lambda p: -os.path.getsize(p["path"]))
+    xf_maps = {id(p): merge_styles(wb, p["styles"]) for p in by_size}
+    for part in parts:
+        for title in part["titles"]:
+            wb.create_sheet(title, streaming=False)
+    gd.build_queries_sheet(wb, sql_files)
+    gd.build_connection_sheet(wb, args.data_url, args.conn_profile)
+    skeleton = os.path.join(workdir, "skeleton.xlsx")
+    wb.save(skeleton, connections=conn_list)
+    assemble(skeleton, parts, xf_maps, args.output, pool, workdir)
+
+
+def assemble(skeleton, parts, xf_maps, output, pool, workdir):
+    """Stitch the worker parts into the skeleton workbook and write output."""
+    with zipfile.ZipFile(skeleton) as skel:
+        next_no = part_numbers(skel.namelist())
+    # Placeholders are the skeleton's first sheets, in part order
+    sheet_no = 0
+    plans = []
+    for part in parts:
+        renames, overrides = {}, []
+        with zipfile.ZipFile(part["path"]) as src:
+            types = content_type_overrides(src.read(gd.CONTENT_TYPES_PART))
+            names = src.namelist()
+        local = part_numbers(names)
+        offsets = {kind: next_no[kind] for kind in ("drawing", "chart", "table")}
+        offsets["sheet"] = sheet_no
+        for kind in ("drawing", "chart", "table"):
+            next_no[kind] += local[kind]
+        sheet_no += local["sheet"]
+
+        for name in names:
+            m = _PART.match(name)
+            if m:
+                number = int(m.group(3)) + offsets[m.group(2)]
+                renames[name] = f"{m.group(1)}{m.group(2)}{number}{m.group(4)}"
+                if "/" + name in types and m.group(2) != "sheet":
+                    overrides.append(("/" + renames[name], types["/" + name]))
+
+        sheets = [n for n in names if _PART.match(n) and _PART.match(n).group(1)
+                  == "xl/worksheets/" and n.endswith(".xml")]
+        xf_map = xf_maps[id(part)]
+        remapped = None
+        if xf_map != list(range(len(xf_map))):
+            remapped = pool.submit(remap_sheets, part["path"], sheets, xf_map,
+                                   os.path.join(workdir, f"remap_{len(plans)}.zip"))
+        plans.append((part, renames, overrides, sheets, offsets, remapped))
+
+    overrides = [o for plan in plans for o in plan[2]]
+    placeholder_names = {f"xl/worksheets/sheet{n}.xml" for n in range(1, sheet_no + 1)}
+    out_dir = os.path.dirname(os.path.abspath(output))
+    fd, tmp_path = tempfile.mkstemp(suffix=".xlsx", dir=out_dir)
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(skeleton) as skel, \
+                zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as dst:
+            for zinfo in skel.infolist():
+                if zinfo.filename in placeholder_names:
+                    continue
+                if zinfo.filename == gd.CONTENT_TYPES_PART:
+                    dst.writestr(zinfo.filename, add_overrides(skel.read(zinfo), overrides))
+                else:
+                    gd._copy_member_raw(skel, dst, zinfo)
+            for part, renames, _, sheets, offsets, remapped in plans:
+                copy_part(part["path"], renames, sheets, offsets,
+                          remapped.result() if remapped else None, dst)
+        gd.replace_file(tmp_path, output)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def copy_part(path, renames, sheets, offsets, remapped, dst):
+    """Copy one part's sheet, drawing, chart and table members under their new names."""
+    def copy_renamed(src, zinfo, name):
+        info = copy(zinfo)
+        info.filename = info.orig_filename = name
+        gd._copy_member_raw(src, dst, info)
+
+    with zipfile.ZipFile(path) as src:
+        for zinfo in src.infolist():
+            name = renames.get(zinfo.filename)
+            if name is None:
+                continue
+            if zinfo.filename.endswith(".rels"):
+                data = _TARGET.sub(lambda m: m.group(1) + m.group(2) + str(
+                    int(m.group(3)) + offsets[m.group(2).decode()]).encode() + m.group(4),
+                                   src.read(zinfo))
+                dst.writestr(name, data)
+            elif zinfo.filename.startswith("xl/tables/"):
+                number = str(int(_PART.match(name).group(3))).encode()
+                dst.writestr(name, _TABLE_ID.sub(lambda m: m.group(1) + number + m.group(3),
+                                                 src.read(zinfo), count=1))
+            elif zinfo.filename in sheets and remapped:
+                with zipfile.ZipFile(remapped) as rsrc:
+                    copy_renamed(rsrc, rsrc.getinfo(zinfo.filename), name)
+            else:
+                copy_renamed(src, zinfo, name)
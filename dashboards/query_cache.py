@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Persistent Query Result Cache
+
+On-disk cache for live dashboard query results, so regenerating the workbook
+many times a day does not re-run every query against the site database.
+
+- Entries are keyed by a hash of the normalised SQL text, the bound
+  parameter values and the target: the server and database named by the
+  effective connection string, plus the connection profile.
+- Each lookup passes the query's TTL; stale entries are treated as misses.
+- The cache is bounded by total payload size with least-recently-used
+  eviction.
+
+Storage is a single SQLite file; the cache is safe to share between the
+executor's worker threads.
+"""
+
+import hashlib
+import json
+import pickle
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalise_sql(sql):
+    """Drop line comments and collapse whitespace so formatting changes keep the key."""
+    return _WHITESPACE.sub(" ", _LINE_COMMENT.sub("", sql)).strip()
+
+
+def cache_key(sql, params=(), target="", part=None):
+    """Stable key for one query execution; part numbers one result set of a batch."""
+    key = [normalise_sql(sql), [repr(p) for p in params], target]
+    payload = json.dumps(key if part is None else key + [part])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Size-bounded LRU cache of query results with per-lookup TTLs."""
+
+    def __init__(self, path, target="", max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.target = target
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, query TEXT, created REAL, accessed REAL,"
+            " size INTEGER, payload BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_results_accessed ON results (accessed)")
+        self._db.commit()
+
+    def key(self, sql, params=(), part=None):
+        return cache_key(sql, params, self.target, part)
+
+    def get(self, key, ttl):
+        """Return (columns, rows, age_seconds) for a fresh entry, else None."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT created, payload FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            created, payload = row
+            if ttl is not None and now - created > ttl:
+                return None
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        columns, rows = pickle.loads(payload)
+        return columns, rows, now - created
+
+    def put(self, key, query, columns, rows):
+        """Store a result, then evict least-recently-used entries over max_bytes."""
+        payload = pickle.dumps((columns, rows), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (key, query, now, now, len(payload), payload))
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+                "SELECT key, size FROM results ORDER BY accessed").fetchall():
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, query=None):
+        """Drop cached results for one query name, or everything."""
+        with self._lock:
+            if query is None:
+                self._db.execute("DELETE FROM results")
+            else:
+                self._db.execute("DELETE FROM results WHERE query = ?", (query,))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Concurrent Query Executor
+
+Runs the dashboard query catalog once from Python so the generated workbook
+can ship real data instead of every analyst's "Refresh All" hitting the site
+database. Queries run on a thread pool and borrow connections from a bounded
+pool; each query is subject to a driver-level timeout.
+
+Backends:
+- SQL Server via pyodbc (connect_mssql)
+- The SQLite stand-in from standin_db.py (connect_standin)
+"""
+
+import hashlib
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from sql_catalog import strip_order_by
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+# ── Connection Pool ──────────────────────────────────────────────────────────
+class ConnectionPool:
+    """Bounded pool of DB-API connections shared by worker threads.
+
+    At most ``size`` connections are open at once. Connections are created
+    lazily, reused LIFO, and discarded if a query using them raises.
+    ``limits`` are semaphores shared with other pools (e.g. a global and a
+    per-server limit); one slot of each is held while a connection is in use.
+    """
+
+    def __init__(self, connect, size=4, limits=()):
+        self._connect = connect
+        self._limits = list(limits)
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = []
+        self.size = size
+
+    @contextmanager
+    def connection(self, timeout=None):
+        held = []
+        try:
+            for limit in self._limits:
+                if not limit.acquire(timeout=timeout):
+                    raise PoolTimeout(f"connection limit still reached after {timeout}s")
+                held.append(limit)
+            with self._checkout(timeout) as conn:
+                yield conn
+        finally:
+            for limit in reversed(held):
+                limit.release()
+
+    @contextmanager
+    def _checkout(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeout(f"no connection available within {timeout}s")
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+                with self._lock:
+                    self._open.append(conn)
+            try:
+                yield conn
+            except Exception:
+                self._discard(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._open:
+                self._open.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close every connection the pool has opened."""
+        with self._lock:
+            conns, self._open = self._open, []
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def for_profile(self, profile):
+        """The pool for a connection profile: a plain pool serves every profile."""
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ProfilePools:
+    """One ConnectionPool per connection profile.
+
+    A profile can change how a session is routed or isolated
+    (ApplicationIntent, isolation level), so its connections are not shared
+    with other profiles. ``connect_for(profile)`` returns a profile's connect
+    factory. The pools share one ``size`` cap on connections in use, and a
+    query with no profile uses ``default``'s pool.
+    """
+
+    def __init__(self, connect_for, profiles, default, size=4, limits=()):
+        shared = threading.BoundedSemaphore(size)
+        self.default = default
+        self.pools = {p: ConnectionPool(connect_for(p), size=size, limits=[shared, *limits])
+                      for p in dict.fromkeys([default, *profiles])}
+        self.size = size
+
+    def for_profile(self, profile):
+        return self.pools[profile or self.default]
+
+    def connection(self, timeout=None):
+        return self.pools[self.default].connection(timeout)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ── Backends ─────────────────────────────────────────────────────────────────
+def connect_mssql(conn_str, login_timeout=15, init=None):
+    """
+    Return a factory opening autocommit pyodbc connections to SQL Server.
+    init: optional session statement run on each new connection (e.g. SET
+    TRANSACTION ISOLATION LEVEL ...).
+    """
+    try:
+        import pyodbc
+    except ImportError:
+        raise SystemExit("Live mode against SQL Server requires pyodbc: pip install pyodbc")
+
+    def connect():
+        conn = pyodbc.connect(conn_str, autocommit=True, timeout=login_timeout)
+        if init:
+            conn.execute(init)
+        return conn
+    return connect
+
+
+def connect_standin(path):
+    """Return a factory opening connections to a SQLite stand-in database."""
+    from standin_db import connect_standin as _connect
+    return lambda: _connect(path)
+
+
+SERVER_KEYS = ("server", "data source", "address", "addr", "network address")
+DATABASE_KEYS = ("database", "initial catalog")
+
+
+def conn_string_keys(conn_str):
+    """Lower-cased keyword -> value pairs of an ODBC or OLE DB connection string."""
+    return {k.strip().lower(): v.strip().strip("{}")
+            for k, v in re.findall(r"([^;=]+)=(\{[^}]*\}|[^;]*)", conn_str)}
+
+
+def conn_server(conn_str):
+    """The server a connection string names, or None."""
+    keys = conn_string_keys(conn_str)
+    return next((keys[k] for k in SERVER_KEYS if keys.get(k)), None)
+
+
+def conn_target(conn_str):
+    """
+    'server/database' for a connection string, as cache keys and log lines
+    name a target. A string naming no server is identified by its hash.
+    """
+    server = conn_server(conn_str)
+    if server is None:
+        return "conn " + hashlib.sha256(conn_str.encode("utf-8")).hexdigest()[:12]
+    keys = conn_string_keys(conn_str)
+    database = next((keys[k] for k in DATABASE_KEYS if keys.get(k)), "default")
+    return f"{server}/{database}"
+
+
+# ── Parameter Binding ────────────────────────────────────────────────────────
+# ODBC SQL type codes (pyodbc.SQL_*) for the types used in DECLARE lines
+ODBC_TYPES = {
+    "NVARCHAR": -9,     # SQL_WVARCHAR
+    "NCHAR": -8,        # SQL_WCHAR
+    "VARCHAR": 12,      # SQL_VARCHAR
+    "CHAR": 1,          # SQL_CHAR
+    "INT": 4,           # SQL_INTEGER
+    "BIGINT": -5,       # SQL_BIGINT
+    "SMALLINT": 5,      # SQL_SMALLINT
+    "TINYINT": -6,      # SQL_TINYINT
+    "BIT": -7,          # SQL_BIT
+    "DECIMAL": 3,       # SQL_DECIMAL
+    "NUMERIC": 2,       # SQL_NUMERIC
+    "FLOAT": 6,         # SQL_FLOAT
+    "DATETIME": 93,     # SQL_TYPE_TIMESTAMP
+    "DATE": 91,         # SQL_TYPE_DATE
+}
+
+
+def input_size(sql_type):
+    """Map a T-SQL type like 'NVARCHAR(255)' to a pyodbc setinputsizes tuple."""
+    m = re.match(r"(\w+)\s*(?:\(\s*(\w+)\s*(?:,\s*(\d+))?\s*\))?", sql_type)
+    base, size, scale = m.group(1).upper(), m.group(2), m.group(3)
+    if base not in ODBC_TYPES:
+        return None
+    if size and size.upper() == "MAX":
+        size = 0
+    return (ODBC_TYPES[base], int(size or 0), int(scale or 0))
+
+
+def prepare_query(entry, values=None):
+    """
+    Turn a SQL catalog entry into an executor query.
+    DECLARE defaults (overridden by values, a dict of parameter name -> value)
+    are bound to the entry's ``?`` markers with their declared types, so the
+    command text is identical for every value and SQL Server caches one plan
+    - the same split the RDL files make between CommandText and
+    QueryParameters. Returns {'sql', 'command', 'params', 'input_sizes'}.
+    """
+    values = values or {}
+    declared = {p["name"]: p for p in entry["params"]}
+    unknown = set(values) - set(declared)
+    if unknown:
+        raise KeyError(f"{entry['path']} does not declare {', '.join(sorted(unknown))}")
+    if not declared:
+        return {"sql": entry["sql"], "command": entry["sql"], "params": (), "input_sizes": None}
+    return {
+        "sql": entry["sql"],
+        "command": entry["command"],
+        "params": tuple(values.get(n, declared[n]["default"]) for n in entry["markers"]),
+        "input_sizes": [input_size(declared[n]["type"]) for n in entry["markers"]],
+    }
+
+
+# ── Execution ────────────────────────────────────────────────────────────────
+def execute_query(conn, sql, params=(), timeout=None, input_sizes=None):
+    """Run one query and return (columns, rows)."""
+    # pyodbc and the stand-in both honour connection.timeout (seconds, 0 = none)
+    conn.timeout = int(timeout or 0)
+    cur = conn.cursor()
+    try:
+        if input_sizes and params:
+            # Declared types, not ones inferred from each value, keep one plan
+            cur.setinputsizes(input_sizes)
+        cur.execute(sql, params)
+        columns = [d[0] for d in cur.description] if cur.description else []
+        rows = [tuple(r) for r in cur.fetchall()] if columns else []
+    finally:
+        cur.close()
+    return columns, rows
+
+
+def execute_batch(conn, sql, params=(), timeout=None, input_sizes=None):
+    """Run a multi-statement batch and return [(columns, rows), ...] per result set."""
+    conn.timeout = int(timeout or 0)
+    cur = conn.cursor()
+    results = []
+    try:
+        if input_sizes and params:
+            cur.setinputsizes(input_sizes)
+        cur.execute(sql, params)
+        while True:
+            if cur.description:
+                results.append(([d[0] for d in cur.description],
+                                [tuple(r) for r in cur.fetchall()]))
+            if not cur.nextset():
+                break
+    finally:
+        cur.close()
+    return results
+
+
+def paged_query(conn, sql, params=(), key="ResourceID", order=(), page_size=50000,
+                fetch_size=5000, timeout=None, input_sizes=None, stats=None):
+    """
+    Stream a large per-device query in keyset-paginated pages.
+    sql is wrapped as a derived table (its ORDER BY dropped) and read in
+    statements of at most page_size rows, ordered by key and then by the
+    output columns in order. Each page starts after the last device that the
+    previous page returned completely; rows are pulled with fetchmany() and
+    the statement is finished before any row is yielded, so no server
+    statement stays open while the caller writes. Returns (columns, rows)
+    where rows is a generator; memory is bounded by one page. A device with
+    more than page_size rows is read on its own. stats, if given, is a dict
+    whose 'round_trips' count is incremented per statement and whose
+    'description' is set to the first page's cursor.description.
+    """
+    body = strip_order_by(sql)
+    keys = ", ".join(f"q.[{c}]" for c in (key,) + tuple(order))
+    page_sql = (f"SELECT q.* FROM (\n{body}\n) q\nWHERE q.[{key}] > ?\n"
+                f"ORDER BY {keys}\nOFFSET 0 ROWS FETCH NEXT ? ROWS ONLY")
+    device_sql = f"SELECT q.* FROM (\n{body}\n) q\nWHERE q.[{key}] = ?\nORDER BY {keys}"
+    conn.timeout = int(timeout or 0)
+
+    def fetch(statement, extra):
+        if stats is not None:
+            stats["round_trips"] = stats.get("round_trips", 0) + 1
+        cur = conn.cursor()
+        try:
+            if input_sizes and params:
+                cur.setinputsizes(list(input_sizes) + [None] * len(extra))
+            cur.execute(statement, tuple(params) + extra)
+            columns = [d[0] for d in cur.description]
+            if stats is not None:
+                stats.setdefault("description", cur.description)
+            page = []
+            for chunk in iter(lambda: cur.fetchmany(fetch_size), []):
+                page.extend(tuple(r) for r in chunk)
+        finally:
+            cur.close()
+        return columns, page
+
+    columns, first = fetch(page_sql, (-2 ** 63, page_size))
+    k = columns.index(key)
+
+    def rows():
+        page = first
+        while True:
+            if len(page) < page_size:
+                yield from page
+                return
+            last = page[-1][k]
+            if page[0][k] == last:
+                # One device filled the whole page: read it on its own
+                yield from fetch(device_sql, (last,))[1]
+                after = last
+            else:
+                # The last device may be cut off: re-read it with the next page
+                cut = len(page) - 1
+                while page[cut - 1][k] == last:
+                    cut -= 1
+                after = page[cut - 1][k]
+                yield from page[:cut]
+            page = fetch(page_sql, (after, page_size))[1]
+
+    return columns, rows()
+
+
+def batch_query(queries, names):
+    """
+    Concatenate catalog queries into one ;-separated batch. Returns
+    {'command', 'params', 'input_sizes'}; result sets come back in names order.
+    """
+    commands, params, sizes = [], [], []
+    for name in names:
+        info = queries[name]
+        commands.append((info.get("command") or info["sql"]).rstrip().rstrip(";"))
+        params.extend(info.get("params", ()))
+        sizes.extend(info.get("input_sizes") or [None] * len(info.get("params", ())))
+    # Separators go on their own line so a query ending in a -- comment
+    # does not swallow the ; that follows it
+    return {"command": "SET NOCOUNT ON;\n" + "\n;\n".join(commands), "params": tuple(params),
+            "input_sizes": sizes if any(sizes) else None}
+
+
+def run_queries(pool, queries, workers=4, timeout=120, log=print, cache=None, refresh=(),
+                batches=None):
+    """
+    Run a catalog of queries concurrently.
+    queries: dict of name -> {'sql': ..., 'command': ..., 'params': (...),
+    'input_sizes': [...], 'ttl': seconds, 'profile': ..., 'timeout': seconds}
+    (the generator's query catalog; all but 'sql' are optional, and 'command'
+    is what runs when present - see prepare_query). A query runs on
+    pool.for_profile(its 'profile') and with its own 'timeout' if it has one.
+    cache: optional query_cache.ResultCache; fresh entries are served without
+    touching the database. Names in refresh (or "all") bypass the cache lookup
+    but still store their new result.
+    Returns dict of name -> {'columns', 'rows', 'elapsed', 'error', 'cached',
+    'round_trips'}, where 'cached' is the age in seconds of a cached result,
+    else None. A batch's round trip is counted on its first result set.
+    A failed or timed-out query is reported in 'error' and does not stop the run.
+    batches: optional dict of group -> {'queries': [names], 'command': ...}.
+    Each group is sent as one batch on one connection and its result sets are
+    read back with nextset(), in 'queries' order. 'command' (with optional
+    'params'/'input_sizes') is a merged batch producing those result sets;
+    without it the members' own queries are concatenated (batch_query). A
+    batch uses the profile and timeout of its first query.
+    A group is skipped when every member has a fresh cached result. A merged
+    batch's result sets are cached under the batch command and their position,
+    since they need not match what the members' own queries return.
+    """
+    def result_key(info, batch=None, index=0):
+        if batch is not None:
+            return cache.key(batch["command"], batch.get("params", ()), part=index)
+        return cache.key(info.get("command") or info["sql"], info.get("params", ()))
+
+    def lookup(name, info, batch=None, index=0):
+        """Return a cached result for name, or None."""
+        if not cache or name in refresh or "all" in refresh:
+            return None
+        hit = cache.get(result_key(info, batch, index), info.get("ttl"))
+        if hit:
+            columns, rows, age = hit
+            return {"columns": columns, "rows": rows, "elapsed": 0.0, "error": None,
+                    "cached": age, "round_trips": 0}
+        return None
+
+    def store(name, info, columns, rows, batch=None, index=0):
+        if cache:
+            cache.put(result_key(info, batch, index), name, columns, rows)
+
+    def run(name, info):
+        hit = lookup(name, info)
+        if hit:
+            return {name: hit}
+        start = time.perf_counter()
+        sql = info.get("command") or info["sql"]
+        limit = info.get("timeout") or timeout
+        try:
+            with pool.for_profile(info.get("profile")).connection(timeout=limit) as conn:
+                columns, rows = execute_query(conn, sql, info.get("params", ()), timeout=limit,
+                                              input_sizes=info.get("input_sizes"))
+        except Exception as exc:
+            return {name: {"columns": [], "rows": [], "elapsed": time.perf_counter() - start,
+                           "error": str(exc) or repr(exc), "cached": None, "round_trips": 1}}
+        store(name, info, columns, rows)
+        return {name: {"columns": columns, "rows": rows,
+                       "elapsed": time.perf_counter() - start, "error": None, "cached": None,
+                       "round_trips": 1}}
+
+    def run_batch(group, spec):
+        names = spec["queries"]
+        merged = spec if spec.get("command") else None
+        hits = {name: lookup(name, queries[name], merged, i) for i, name in enumerate(names)}
+        if all(hits.values()):
+            return hits
+        batch = merged or batch_query(queries, names)
+        first = queries[names[0]]
+        limit = first.get("timeout") or timeout
+        start = time.perf_counter()
+        try:
+            with pool.for_profile(first.get("profile")).connection(timeout=limit) as conn:
+                sets = execute_batch(conn, batch["command"], batch.get("params", ()),
+                                     timeout=limit, input_sizes=batch.get("input_sizes"))
+            if len(sets) != len(names):
+                raise RuntimeError(f"batch {group!r} returned {len(sets)} result sets, "
+                                   f"expected {len(names)}")
+        except Exception as exc:
+            elapsed = time.perf_counter() - start
+            return {name: {"columns": [], "rows": [], "elapsed": elapsed,
+                           "error": str(exc) or repr(exc), "cached": None,
+                           "round_trips": int(i == 0)} for i, name in enumerate(names)}
+        elapsed = time.perf_counter() - start
+        log(f"  [live] batch {group}: {len(names)} result sets in one round trip, "
+            f"{elapsed:.2f}s")
+        out = {}
+        for i, (name, (columns, rows)) in enumerate(zip(names, sets)):
+            store(name, queries[name], columns, rows, merged, i)
+            out[name] = {"columns": columns, "rows": rows, "elapsed": elapsed, "error": None,
+                         "cached": None, "batch": group, "round_trips": int(i == 0)}
+        return out
+
+    batches = {group: spec for group, spec in (batches or {}).items()
+               if all(name in queries for name in spec["queries"])}
+    batched = {name for spec in batches.values() for name in spec["queries"]}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query") as executor:
+        futures = [executor.submit(run_batch, group, spec) for group, spec in batches.items()]
+        futures += [executor.submit(run, name, info) for name, info in queries.items()
+                    if name not in batched]
+        for future in as_completed(futures):
+            for name, res in future.result().items():
+                results[name] = res
+                if res["error"]:
+                    log(f"  [live] {name}: FAILED after {res['elapsed']:.2f}s - {res['error']}")
+                elif res["cached"] is not None:
+                    log(f"  [live] {name}: {len(res['rows'])} rows from cache "
+                        f"({res['cached'] / 60:.0f} min old)")
+                elif res.get("batch"):
+                    log(f"  [live] {name}: {len(res['rows'])} rows (batch {res['batch']})")
+                else:
+                    log(f"  [live] {name}: {len(res['rows'])} rows in {res['elapsed']:.2f}s")
+    # Preserve catalog order for callers that iterate the results
+    return {name: results[name] for name in queries}
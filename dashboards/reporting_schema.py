@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Pre-Aggregated Reporting Schema
+
+Generates a small reporting schema (rpt) with one summary table per
+dashboard query, the DDL to create it, a refresh procedure that fills the
+tables from the dashboard queries, and a variant of each dashboard query
+that reads its summary table. A dashboard refresh then reads a few hundred
+pre-aggregated rows instead of re-aggregating v_UpdateComplianceStatus and
+the inventory views every time; the aggregation runs once per refresh of
+the schema, on the DBA's schedule.
+
+    python3 reporting_schema.py --ddl --out rpt_schema.sql
+    python3 reporting_schema.py --procedure --out rpt_refresh.sql
+    python3 reporting_schema.py --refresh --verify --standin standin.db
+    python3 generate_dashboard.py --live --summary-tables
+
+Each table is refreshed by running the dashboard query into a temp table
+and replacing the table's rows from it in one short transaction, so readers
+never see a half-refreshed table and are not blocked while the query runs.
+rpt.SummaryRefresh records when each table was last refreshed and its row
+count. --refresh does the same from Python against SQL Server or the SQLite
+stand-in (created if missing), creating missing tables first; --verify then
+compares every summary query with its source query.
+"""
+
+import argparse
+import re
+import time
+from collections import Counter
+
+from sql_catalog import strip_order_by
+
+REPORTING_SCHEMA = "rpt"
+REFRESH_TABLE = "SummaryRefresh"
+REFRESH_PROCEDURE = "RefreshDashboardSummaries"
+
+# Summary table per dashboard query: its output 'columns' and their types,
+# the dashboard's display 'order' (its ORDER BY over the output columns) and
+# the clustered 'index', which defaults to the display order so the
+# dashboard reads the table without a sort. Key widths keep each clustered
+# index under SQL Server's 900-byte limit.
+SUMMARY_TABLES = {
+    "OS Count Summary": {
+        "columns": {"Operating System": "NVARCHAR(255)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+    "OS Feature Update Counts": {
+        "columns": {"Operating System": "NVARCHAR(255)", "Feature Update": "NVARCHAR(32)",
+                    "Build Number": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Operating System]", "[Build Number] DESC"],
+    },
+    "Memory Summary": {
+        "columns": {"RAM (GB)": "INT", "Device Count": "INT"},
+        "order": ["[RAM (GB)] DESC"],
+    },
+    "Device Models": {
+        "columns": {"Manufacturer": "NVARCHAR(255)", "Model": "NVARCHAR(255)",
+                    "Chassis Type": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC", "[Manufacturer]", "[Model]"],
+        "index": ["[Device Count] DESC", "[Manufacturer]"],
+    },
+    "Client Version": {
+        "columns": {"Client Version": "NVARCHAR(64)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+    "Update Compliance Summary": {
+        "columns": {"Classification": "NVARCHAR(255)", "Total Devices": "INT",
+                    "Required": "INT", "Installed": "INT", "Compliance %": "DECIMAL(5,1)"},
+        "order": ["[Classification]"],
+    },
+    "Update Deployment Status": {
+        "columns": {"Update Group": "NVARCHAR(255)", "Targeted Devices": "INT",
+                    "Compliant": "INT", "Required": "INT", "Not Required": "INT",
+                    "Compliance %": "DECIMAL(5,1)"},
+        "order": ["[Update Group]"],
+    },
+    "Deployment Summary": {
+        "columns": {"Total Applications": "INT", "Total Deployments": "INT",
+                    "Total Targeted Devices": "INT", "Total Successful": "INT",
+                    "Total Failed": "INT", "Total In Progress": "INT",
+                    "Overall Success Rate %": "DECIMAL(5,1)"},
+        "order": [],
+    },
+    "Application Deployment Status": {
+        "columns": {"Application Name": "NVARCHAR(255)", "Manufacturer": "NVARCHAR(255)",
+                    "Target Collection": "NVARCHAR(255)", "Total Targeted": "INT",
+                    "Success": "INT", "In Progress": "INT", "Errors": "INT", "Unknown": "INT",
+                    "Success Rate %": "DECIMAL(5,1)"},
+        "order": ["[Application Name]", "[Target Collection]"],
+        "index": ["[Application Name]"],
+    },
+    "Server OS Versions": {
+        "columns": {"Operating System": "NVARCHAR(255)", "Server Version": "NVARCHAR(32)",
+                    "Build Number": "NVARCHAR(32)", "Server Count": "INT"},
+        "order": ["[Server Count] DESC", "[Operating System]"],
+    },
+    "BitLocker Protection Summary": {
+        "columns": {"Protection Status": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+    "Secure Boot Summary": {
+        "columns": {"Secure Boot Status": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+    "Defender Real-Time Protection Summary": {
+        "columns": {"Real-Time Protection": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+    "TPM Status Summary": {
+        "columns": {"TPM Status": "NVARCHAR(32)", "Device Count": "INT"},
+        "order": ["[Device Count] DESC"],
+    },
+}
+
+
+def summary_table(name):
+    """Summary table of a dashboard query: 'OS Count Summary' -> 'rpt.OSCountSummary'."""
+    words = re.findall(r"[A-Za-z0-9]+", name)
+    return f"{REPORTING_SCHEMA}." + "".join(w[0].upper() + w[1:] for w in words)
+
+
+def _column_list(name):
+    return ", ".join(f"[{c}]" for c in SUMMARY_TABLES[name]["columns"])
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+def summary_sql(name):
+    """The dashboard query reading its summary table instead of the MECM views."""
+    order = SUMMARY_TABLES[name]["order"]
+    sql = f"SELECT {_column_list(name)}\nFROM {summary_table(name)}"
+    return sql + (f"\nORDER BY {', '.join(order)}" if order else "")
+
+
+def summary_catalog(catalog):
+    """Copy of the query catalog with each summarised query reading its summary table."""
+    out = dict(catalog)
+    for name, info in catalog.items():
+        if name in SUMMARY_TABLES:
+            out[name] = {"source": summary_table(name), "sql": summary_sql(name),
+                         "ttl": info.get("ttl")}
+    return out
+
+
+def summary_batches(batches):
+    """QUERY_BATCHES without merged batch commands, which read the MECM views."""
+    if batches is None:
+        return None
+    return {group: {"queries": spec["queries"]} for group, spec in batches.items()}
+
+
+# ── DDL ──────────────────────────────────────────────────────────────────────
+def schema_ddl(dialect="mssql"):
+    """
+    Statements creating the schema, the summary tables, their clustered
+    indexes and the refresh log. Every statement is skipped when its object
+    exists, so the DDL can be re-run. dialect 'standin' emits the SQLite
+    equivalents (the stand-in maps rpt.X to a table named rpt_X).
+    """
+    mssql = dialect == "mssql"
+    refresh_log = f"{REPORTING_SCHEMA}.{REFRESH_TABLE}"
+    statements = []
+    if mssql:
+        statements.append(f"IF SCHEMA_ID('{REPORTING_SCHEMA}') IS NULL\n"
+                          f"    EXEC('CREATE SCHEMA {REPORTING_SCHEMA}')")
+
+    def create_table(table, columns):
+        body = ",\n".join(f"    {column}" for column in columns)
+        if mssql:
+            return (f"IF OBJECT_ID('{table}', 'U') IS NULL\n"
+                    f"CREATE TABLE {table} (\n{body}\n)")
+        return f"CREATE TABLE IF NOT EXISTS {table} (\n{body}\n)"
+
+    for name, spec in SUMMARY_TABLES.items():
+        table = summary_table(name)
+        statements.append(create_table(table, [f"[{c}] {t} NULL"
+                                               for c, t in spec["columns"].items()]))
+        index = spec.get("index", spec["order"])
+        if not index:
+            continue
+        index_name = "CIX_" + table.split(".", 1)[1]
+        if mssql:
+            statements.append(
+                f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = "
+                f"OBJECT_ID('{table}') AND name = '{index_name}')\n"
+                f"CREATE CLUSTERED INDEX {index_name} ON {table} ({', '.join(index)})")
+        else:
+            statements.append(f"CREATE INDEX IF NOT EXISTS {index_name} "
+                              f"ON {table} ({', '.join(index)})")
+    statements.append(create_table(refresh_log, [
+        "[Summary Table] NVARCHAR(128) NOT NULL PRIMARY KEY",
+        "[Query Name] NVARCHAR(128) NOT NULL",
+        "[Refreshed At] DATETIME NOT NULL",
+        "[Row Count] INT NOT NULL",
+    ]))
+    return statements
+
+
+# ── Refresh ──────────────────────────────────────────────────────────────────
+def refresh_steps(name, source_sql):
+    """
+    (stage, swap, cleanup) statements refreshing one summary table: the
+    source query runs into a temp table, then the swap statements replace the
+    table's rows and its refresh log entry in one transaction.
+    """
+    table = summary_table(name)
+    short = table.split(".", 1)[1]
+    stage = "#stage_" + short
+    columns = _column_list(name)
+    return (
+        f"SELECT * INTO {stage} FROM (\n{strip_order_by(source_sql)}\n) q",
+        [
+            # DELETE, not TRUNCATE: a few hundred rows, and it needs no ALTER permission
+            f"DELETE FROM {table}",
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage}",
+            f"DELETE FROM {REPORTING_SCHEMA}.{REFRESH_TABLE} WHERE [Summary Table] = '{short}'",
+            f"INSERT INTO {REPORTING_SCHEMA}.{REFRESH_TABLE} "
+            f"([Summary Table], [Query Name], [Refreshed At], [Row Count]) "
+            f"SELECT '{short}', '{name}', GETDATE(), COUNT(*) FROM {stage}",
+        ],
+        f"DROP TABLE {stage}",
+    )
+
+
+def refresh_procedure(catalog):
+    """T-SQL stored procedure refreshing every summary table (for a SQL Agent job)."""
+    def indent(sql, depth):
+        return "\n".join(" " * depth + line if line.strip() else "" for line in sql.splitlines())
+
+    blocks = []
+    for name in SUMMARY_TABLES:
+        stage, swap, cleanup = refresh_steps(name, catalog[name]["sql"])
+        blocks.append(f"    -- {name}\n{indent(stage, 4)};\n"
+                      "    BEGIN TRANSACTION;\n"
+                      + "".join(f"{indent(s, 4)};\n" for s in swap)
+                      + f"    COMMIT TRANSACTION;\n    {cleanup};\n")
+    return (f"CREATE OR ALTER PROCEDURE {REPORTING_SCHEMA}.{REFRESH_PROCEDURE}\nAS\nBEGIN\n"
+            "    SET NOCOUNT ON;\n    SET XACT_ABORT ON;\n\n"
+            + "\n".join(blocks) + "END")
+
+
+def create_schema(conn, dialect):
+    cur = conn.cursor()
+    try:
+        for statement in schema_ddl(dialect):
+            cur.execute(statement)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def refresh_summaries(conn, catalog, names=None, timeout=None):
+    """
+    Refresh summary tables from Python, as the stored procedure does.
+    Returns name -> {'rows', 'elapsed'}.
+    """
+    conn.timeout = int(timeout or 0)
+    stats = {}
+    for name in names or SUMMARY_TABLES:
+        info = catalog[name]
+        stage, swap, cleanup = refresh_steps(name, info.get("command") or info["sql"])
+        start = time.perf_counter()
+        cur = conn.cursor()
+        staged = False
+        # connect_mssql opens autocommit connections: the swap needs a transaction
+        autocommit = getattr(conn, "autocommit", None)
+        try:
+            cur.execute(stage, info.get("params", ()))
+            staged = True
+            if autocommit is True:
+                conn.autocommit = False
+            for statement in swap:
+                cur.execute(statement)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if autocommit is True:
+                conn.autocommit = True
+            if staged:
+                cur.execute(cleanup)
+            cur.close()
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT COUNT(*) FROM {summary_table(name)}")
+            stats[name] = {"rows": cur.fetchone()[0], "elapsed": time.perf_counter() - start}
+        finally:
+            cur.close()
+    return stats
+
+
+def verify_summaries(conn, catalog, names=None, timeout=None):
+    """
+    Run each summary query and its source query; returns name -> (matches,
+    source seconds, summary seconds). Rows are compared as multisets, since
+    ties in the display order may come back in either order.
+    """
+    from query_executor import execute_query
+
+    results = {}
+    for name in names or SUMMARY_TABLES:
+        info = catalog[name]
+        start = time.perf_counter()
+        columns, rows = execute_query(conn, info.get("command") or info["sql"],
+                                      info.get("params", ()), timeout=timeout)
+        source_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        summary_columns, summary_rows = execute_query(conn, summary_sql(name), timeout=timeout)
+        results[name] = (columns == summary_columns and Counter(rows) == Counter(summary_rows),
+                         source_seconds, time.perf_counter() - start)
+    return results
+
+
+def unrefreshed_summaries(conn, timeout=None):
+    """
+    Dashboard queries whose summary table has no refresh log entry: all of
+    them when the schema or the refresh log does not exist.
+    """
+    from query_executor import execute_query
+
+    try:
+        _, rows = execute_query(conn, f"SELECT [Summary Table] FROM "
+                                      f"{REPORTING_SCHEMA}.{REFRESH_TABLE}", timeout=timeout)
+    except Exception:
+        return list(SUMMARY_TABLES)
+    refreshed = {row[0] for row in rows}
+    return [name for name in SUMMARY_TABLES
+            if summary_table(name).split(".", 1)[1] not in refreshed]
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    import generate_dashboard as gd
+
+    parser = argparse.ArgumentParser(description="Generate and refresh the dashboard "
+                                                 "summary tables.")
+    parser.add_argument("--ddl", action="store_true", help="print the schema DDL (T-SQL)")
+    parser.add_argument("--procedure", action="store_true",
+                        help="print the refresh stored procedure (T-SQL)")
+    parser.add_argument("--queries", action="store_true",
+                        help="print the dashboard queries that read the summary tables")
+    parser.add_argument("--out", metavar="PATH", help="write the printed script to a file")
+    parser.add_argument("--refresh", action="store_true",
+                        help="create missing tables and refresh them on the target database")
+    parser.add_argument("--verify", action="store_true",
+                        help="compare each summary query with its source query")
+    parser.add_argument("--only", metavar="QUERY", action="append", default=[],
+                        choices=list(SUMMARY_TABLES), help="limit --refresh/--verify (repeatable)")
+    parser.add_argument("--standin", metavar="PATH", help="use a SQLite stand-in database")
+    parser.add_argument("--conn-str", default=gd.ODBC_CONN_STRING,
+                        help="ODBC connection string for SQL Server")
+    parser.add_argument("--query-timeout", type=int, default=600)
+    args = parser.parse_args(argv)
+    if not (args.ddl or args.procedure or args.queries or args.refresh or args.verify):
+        parser.error("choose --ddl, --procedure, --queries, --refresh or --verify")
+
+    catalog = gd.build_query_catalog()
+    scripts = []
+    if args.ddl:
+        scripts.append("\nGO\n".join(schema_ddl()) + "\nGO\n")
+    if args.procedure:
+        scripts.append(refresh_procedure(catalog) + "\nGO\n")
+    if args.queries:
+        scripts += [f"-- {name}\n{summary_sql(name)};\n" for name in SUMMARY_TABLES]
+    if scripts:
+        text = "\n".join(scripts)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                f.write(text)
+            print(f"Wrote {args.out}")
+        else:
+            print(text, end="")
+    if not (args.refresh or args.verify):
+        return
+
+    connect, target = gd.live_target(args)
+    conn = connect()
+    try:
+        if args.refresh:
+            create_schema(conn, "standin" if args.standin else "mssql")
+            start = time.perf_counter()
+            stats = refresh_summaries(conn, catalog, args.only, timeout=args.query_timeout)
+            for name, s in stats.items():
+                print(f"  {summary_table(name)}: {s['rows']} rows in {s['elapsed']:.2f}s")
+            print(f"Refreshed {len(stats)} summary tables on {target} in "
+                  f"{time.perf_counter() - start:.2f}s")
+        if args.verify:
+            results = verify_summaries(conn, catalog, args.only, timeout=args.query_timeout)
+            for name, (ok, source_seconds, summary_seconds) in results.items():
+                print(f"  {name}: {'OK' if ok else 'MISMATCH'} (source {source_seconds:.3f}s, "
+                      f"summary {summary_seconds:.3f}s)")
+            failed = [name for name, (ok, _, _) in results.items() if not ok]
+            if failed:
+                raise SystemExit(f"{len(failed)} summary tables differ from their source "
+                                 f"queries: {', '.join(failed)}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Generation Run Metrics
+
+Times the stages of a dashboard generation run (SQL catalog, live queries,
+each sheet builder, save) and, in live mode, every query: wall time, rows
+fetched, estimated bytes, server round trips, and whether the result came
+from the cache or a batch.
+
+A run prints a summary table and can export the numbers as JSON or as a
+Prometheus textfile-collector file (node_exporter --collector.textfile),
+so per-query timings can be tracked across runs on a real site.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+PROM_PREFIX = "mecm_dashboard"
+
+
+def result_bytes(rows):
+    """
+    Estimate the wire size of a result: strings as UTF-16 (NVARCHAR),
+    numbers and dates as 8 bytes, NULLs as nothing.
+    """
+    total = 0
+    for row in rows:
+        for value in row:
+            if value is None:
+                continue
+            if isinstance(value, str):
+                total += 2 * len(value)
+            elif isinstance(value, (bytes, bytearray)):
+                total += len(value)
+            else:
+                total += 8
+    return total
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RunMetrics:
+    """Stage and per-query timings for one generation run."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = []
+        self.queries = {}
+        self.elapsed = None
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block of the run as one stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({"stage": name, "seconds": time.perf_counter() - start})
+
+    def add_stage(self, name, seconds):
+        """Record a stage timed elsewhere (e.g. in a worker process)."""
+        self.stages.append({"stage": name, "seconds": seconds})
+
+    def add_query(self, name, seconds, rows, nbytes, round_trips, cached=False, batch=None,
+                  error=None):
+        self.queries[name] = {"seconds": seconds, "rows": rows, "bytes": nbytes,
+                              "round_trips": round_trips, "cached": cached, "batch": batch,
+                              "error": error}
+
+    def add_results(self, results):
+        """Record the results returned by query_executor.run_queries."""
+        for name, res in results.items():
+            self.add_query(name, res["elapsed"], len(res["rows"]), result_bytes(res["rows"]),
+                           res.get("round_trips", 0), cached=res["cached"] is not None,
+                           batch=res.get("batch"), error=res["error"])
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._start
+
+    # ── Output ───────────────────────────────────────────────────────────────
+    def summary(self, log=print):
+        """Print the stage and query tables."""
+        total = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start
+        log(f"\n{'Stage':<40} {'Seconds':>9} {'Share':>7}")
+        for s in self.stages:
+            share = s["seconds"] / total if total else 0
+            log(f"{s['stage']:<40} {s['seconds']:>9.3f} {share:>7.1%}")
+        log(f"{'Total':<40} {total:>9.3f}")
+        if not self.queries:
+            return
+        log(f"\n{'Query':<40} {'Seconds':>9} {'Rows':>9} {'KiB':>9} {'Trips':>6}  Source")
+        for name, q in sorted(self.queries.items(), key=lambda kv: -kv[1]["seconds"]):
+            source = ("FAILED" if q["error"] else "cache" if q["cached"]
+                      else f"batch {q['batch']}" if q["batch"] else "query")
+            log(f"{name:<40} {q['seconds']:>9.3f} {q['rows']:>9} {q['bytes'] / 1024:>9.1f} "
+                f"{q['round_trips']:>6}  {source}")
+        log(f"{'Total':<40} {'':>9} {sum(q['rows'] for q in self.queries.values()):>9} "
+            f"{sum(q['bytes'] for q in self.queries.values()) / 1024:>9.1f} "
+            f"{sum(q['round_trips'] for q in self.queries.values()):>6}")
+
+    def to_dict(self):
+        return {"started": self.started, "seconds": self.elapsed, "stages": self.stages,
+                "queries": self.queries}
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {PROM_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PROM_PREFIX}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{PROM_PREFIX}_{name}{{{label_text}}} {float(value)!r}"
+                             if label_text else f"{PROM_PREFIX}_{name} {float(value)!r}")
+
+        metric("last_run_timestamp_seconds", "Start time of the last generation run.",
+               [({}, self.started)])
+        metric("run_seconds", "Wall time of the last generation run.",
+               [({}, self.elapsed or 0)])
+        metric("stage_seconds", "Wall time of each generation stage.",
+               [({"stage": s["stage"]}, s["seconds"]) for s in self.stages])
+        for field, help_text in (("seconds", "Wall time of each live query."),
+                                 ("rows", "Rows fetched by each live query."),
+                                 ("bytes", "Estimated bytes fetched by each live query."),
+                                 ("round_trips", "Server round trips of each live query."),
+                                 ("cached", "1 if the query was served from the result cache."),
+                                 ("error", "1 if the query failed.")):
+            metric(f"query_{field}", help_text,
+                   [({"query": name}, float(bool(q[field])) if field in ("cached", "error")
+                     else q[field]) for name, q in self.queries.items()])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Written atomically so the textfile collector never reads a partial file
+        _write_atomic(path, self.prometheus())
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Snapshot Diff
+
+Compares two dated snapshots of a query (written by snapshot_export.py) and
+reports only what changed between them: rows added, rows removed and rows
+whose values changed. Devices that newly lost BitLocker protection show up as
+added rows of BitLocker_Not_Encrypted, devices with more missing updates as
+changed rows of Missing_Updates_By_Device, and each newly missing update as an
+added row of Missing_Updates_Detail.
+
+Rows are matched by key: ResourceID, plus the per-device ordering columns of
+DETAIL_QUERIES (Drive, Update Title, ...) for detail queries, or DIFF_KEYS.
+Each row is reduced to two 64-bit hashes, one of its key and one of its other
+columns, read batch by batch from the (memory-mapped) snapshot, so each side
+costs 16 bytes per row and the comparison is a hash join, linear in the rows.
+Only the added, removed and changed rows are read back in full. Rows sharing
+a key are matched in order. Columns computed against GETDATE()
+(CLOCK_COLUMNS, e.g. "Days Inactive") change every day and are left out of
+the comparison; the status columns derived from them are not.
+
+    python3 snapshot_diff.py BitLocker_Not_Encrypted Inactive_Clients --export --standin standin.db
+    python3 snapshot_diff.py Missing_Updates_By_Device --from 2026-10-17 --to 2026-10-18
+    python3 snapshot_diff.py --all-keyed --xlsx changes.xlsx
+
+Changes are written as JSON Lines (<out>/<query>_<from>_<to>.jsonl, one
+object per row with a "change" field) or, with --xlsx, as one sheet per
+query. generate_dashboard.py --changes QUERY adds the same sheet to the
+dashboard workbook.
+
+Requires pyarrow and pandas: pip install pyarrow pandas
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+
+from snapshot_export import HISTORY_DIR, export_name, load_snapshot, snapshot_dates
+
+DIFF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "diffs")
+DEFAULT_KEY = ["ResourceID"]
+
+# Key columns for queries not keyed by ResourceID alone (DETAIL_QUERIES are
+# keyed by ResourceID and their ordering columns)
+DIFF_KEYS = {
+    "Collection_Members": ["ResourceID", "Collection ID"],
+    "Find_Software": ["ResourceID", "Software Name", "Version"],
+    "Server_Features": ["ResourceID", "Feature ID"],
+    "Server_Roles": ["ResourceID", "Role ID"],
+}
+
+# Columns computed against GETDATE(): they move every day without any change
+# on the device, so they are not compared
+CLOCK_COLUMNS = {
+    "Days Inactive", "Days Since DDR", "Days Since HW Scan", "Days Since Scan",
+    "Uptime (Days)", "Signature Age (Days)",
+}
+BATCH_ROWS = 65536
+
+
+def _libraries():
+    try:
+        import numpy as np
+        import pandas as pd
+        import pyarrow as pa
+    except ImportError:
+        raise SystemExit("Snapshot diff requires pyarrow and pandas: pip install pyarrow pandas")
+    return np, pd, pa
+
+
+def diff_key(name):
+    """Key columns of a query's rows."""
+    from generate_dashboard import DETAIL_QUERIES
+
+    name = export_name(name)
+    if name in DIFF_KEYS:
+        return list(DIFF_KEYS[name])
+    if name in DETAIL_QUERIES:
+        return DEFAULT_KEY + DETAIL_QUERIES[name]
+    return list(DEFAULT_KEY)
+
+
+def keyed_queries():
+    """Catalog queries with a ResourceID column, the ones a diff can key."""
+    from sql_catalog import get_catalog
+
+    return [entry["name"] for entry in get_catalog()
+            if re.search(r"^\s*sys\.ResourceID\s*,", entry["sql"], re.M)]
+
+
+# ── Fingerprints ─────────────────────────────────────────────────────────────
+def _nullable(dtype):
+    """Nullable pandas dtypes, so a column hashes the same with or without NULLs."""
+    _, pd, pa = _libraries()
+    if pa.types.is_integer(dtype):
+        return pd.Int64Dtype()
+    if pa.types.is_boolean(dtype):
+        return pd.BooleanDtype()
+    return None
+
+
+def fingerprints(table, key, ignore=()):
+    """
+    Return (keys, rows): uint64 arrays with one hash per row of its key
+    columns and of its other columns (less ignore). The table is read in
+    BATCH_ROWS batches. A key repeated within the table is numbered by
+    occurrence, so every row has its own key and repeats match in order.
+    """
+    np, pd, _ = _libraries()
+    from pandas.util import hash_pandas_object
+
+    values = [c for c in table.column_names if c not in key and c not in ignore]
+    keys, rows = [], []
+    for batch in table.to_batches(max_chunksize=BATCH_ROWS):
+        frame = batch.to_pandas(types_mapper=_nullable)
+        keys.append(hash_pandas_object(frame[key], index=False).to_numpy())
+        if values:
+            rows.append(hash_pandas_object(frame[values], index=False).to_numpy())
+        else:
+            rows.append(np.zeros(len(frame), np.uint64))
+    keys = np.concatenate(keys) if keys else np.empty(0, np.uint64)
+    rows = np.concatenate(rows) if rows else np.empty(0, np.uint64)
+    if pd.Index(keys).has_duplicates:
+        occurrence = pd.Series(keys).groupby(keys, sort=False).cumcount().to_numpy()
+        repeated = occurrence > 0
+        numbered = hash_pandas_object(pd.DataFrame({"key": keys[repeated],
+                                                    "n": occurrence[repeated]}), index=False)
+        keys[repeated] = numbered.to_numpy()
+    return keys, rows
+
+
+def match(old, new):
+    """
+    Compare two (keys, rows) fingerprints; returns positions of the added rows
+    (in new), removed rows (in old) and changed rows (in new, and in old).
+    """
+    np, pd, _ = _libraries()
+    old_keys, old_rows = old
+    new_keys, new_rows = new
+    found = pd.Index(old_keys).get_indexer(new_keys)
+    matched = found >= 0
+    added = np.flatnonzero(~matched)
+    changed = np.flatnonzero(matched & (old_rows[found] != new_rows))
+    kept = np.ones(len(old_keys), bool)
+    kept[found[matched]] = False
+    return added, np.flatnonzero(kept), changed, found[changed]
+
+
+def _rows(table, positions):
+    _, _, pa = _libraries()
+    if not len(positions):
+        return []
+    taken = table.take(pa.array(positions))
+    return list(zip(*(column.to_pylist() for column in taken.columns)))
+
+
+# ── Diff ─────────────────────────────────────────────────────────────────────
+def diff_tables(old, new, key, ignore=()):
+    """
+    Diff two pyarrow Tables of the same query. Returns a dict with the
+    columns, key, compared columns, row counts and the 'added' and 'removed'
+    rows and 'changed' (old row, new row, changed columns) triples.
+    """
+    if old.column_names != new.column_names:
+        raise ValueError(f"the snapshots have different columns ({', '.join(old.column_names)} "
+                         f"vs {', '.join(new.column_names)}); was the query changed?")
+    missing = [c for c in key if c not in old.column_names]
+    if missing:
+        raise ValueError(f"key column(s) {', '.join(missing)} not in the query output; "
+                         f"use --key")
+    if old.schema.remove_metadata() != new.schema.remove_metadata():
+        # Types inferred on the stand-in, or a dictionary-encoded column
+        new = new.cast(old.schema.remove_metadata())
+    ignore = [c for c in ignore if c not in key]
+    added, removed, changed, changed_old = match(fingerprints(old, key, ignore),
+                                                 fingerprints(new, key, ignore))
+    compared = [i for i, c in enumerate(old.column_names) if c not in key and c not in ignore]
+    pairs = []
+    for old_row, new_row in zip(_rows(old, changed_old), _rows(new, changed)):
+        columns = [old.column_names[i] for i in compared if old_row[i] != new_row[i]]
+        if columns:
+            pairs.append((old_row, new_row, columns))
+    return {
+        "columns": old.column_names,
+        "key": key,
+        "compared": [old.column_names[i] for i in compared],
+        "old_rows": old.num_rows,
+        "new_rows": new.num_rows,
+        "added": _rows(new, added),
+        "removed": _rows(old, removed),
+        "changed": pairs,
+    }
+
+
+def diff_snapshots(history_dir, name, from_date=None, to_date=None, key=None, ignore=None):
+    """
+    Diff two snapshots of a query: to_date (default: the latest) against
+    from_date (default: the snapshot before it). Returns diff_tables' dict
+    with the query's name, title and both dates.
+    """
+    _libraries()
+    name = export_name(name)
+    dates = snapshot_dates(history_dir, name)
+    to_date = to_date or (dates[-1] if dates else None)
+    if from_date is None:
+        earlier = [d for d in dates if to_date and d < to_date]
+        if not earlier:
+            raise FileNotFoundError(f"{name} needs two snapshots to diff; found "
+                                    f"{', '.join(dates) or 'none'} in {history_dir}")
+        from_date = earlier[-1]
+    old = load_snapshot(history_dir, name, from_date)
+    new = load_snapshot(history_dir, name, to_date)
+    if ignore is None:
+        ignore = CLOCK_COLUMNS
+    start = time.perf_counter()
+    diff = diff_tables(old, new, key or diff_key(name), ignore)
+    metadata = new.schema.metadata or {}
+    diff.update({
+        "name": name,
+        "title": metadata.get(b"title", name.encode("utf-8")).decode("utf-8"),
+        "from": from_date,
+        "to": to_date,
+        "seconds": time.perf_counter() - start,
+    })
+    return diff
+
+
+def change_rows(diff):
+    """Yield (change, row, changed columns) in added, removed, changed order."""
+    for row in diff["added"]:
+        yield "added", row, []
+    for row in diff["removed"]:
+        yield "removed", row, []
+    for _, row, columns in diff["changed"]:
+        yield "changed", row, columns
+
+
+def summary(diff):
+    return (f"{diff['from']} -> {diff['to']}: {len(diff['added'])} added, "
+            f"{len(diff['removed'])} removed, {len(diff['changed'])} changed "
+            f"({diff['old_rows']} -> {diff['new_rows']} rows)")
+
+
+# ── Output ───────────────────────────────────────────────────────────────────
+def write_jsonl(diff, out_dir=DIFF_DIR, compression="none"):
+    """
+    Write a diff as JSON Lines: each row's columns plus "change", and for
+    changed rows "previous" with the old values of the changed columns.
+    Returns the path.
+    """
+    from bulk_export import COMPRESSION, json_value, open_output
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{diff['name']}_{diff['from']}_{diff['to']}.jsonl"
+                        + COMPRESSION[compression])
+    encode = json.JSONEncoder(default=json_value, ensure_ascii=False,
+                              separators=(",", ":")).encode
+    columns = diff["columns"]
+    tmp_path = path + ".tmp"
+    try:
+        with open_output(tmp_path, compression) as f:
+            for change in ("added", "removed"):
+                for row in diff[change]:
+                    f.write(encode({"change": change, **dict(zip(columns, row))}) + "\n")
+            for old_row, new_row, changed in diff["changed"]:
+                old = dict(zip(columns, old_row))
+                f.write(encode({"change": "changed", **dict(zip(columns, new_row)),
+                                "previous": {c: old[c] for c in changed}}) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+
+def write_workbook(path, diffs):
+    """Write diffs to a workbook: an overview sheet, then one sheet per query."""
+    import generate_dashboard as gd
+
+    wb = gd.DashboardWorkbook()
+    ws = wb.active
+    ws.title = "Snapshot Changes"
+    r = gd.add_title(ws, "Snapshot Changes",
+                     f"Generated {datetime.datetime.now():%Y-%m-%d %H:%M}")
+    gd.write_table(ws, ["Query", "From", "To", "Rows Before", "Rows After", "Added", "Removed",
+                        "Changed"],
+                   [(d["title"], d["from"], d["to"], d["old_rows"], d["new_rows"],
+                     len(d["added"]), len(d["removed"]), len(d["changed"])) for d in diffs],
+                   r, name="SnapshotChanges")
+    for diff in diffs:
+        gd.write_changes_sheet(wb, diff)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    wb.save(path)
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def export_today(names, args):
+    """Take the --to (default: today's) snapshot of each query, as snapshot_export.py does."""
+    from delta_refresh import parse_param
+    from generate_dashboard import open_connection
+    from snapshot_export import export_query
+    from sql_catalog import get_catalog
+
+    conn = open_connection(args)
+    values = dict(parse_param(p) for p in args.param)
+    try:
+        for name in names:
+            try:
+                declared = {p["name"] for p in get_catalog().get(name)["params"]}
+            except KeyError:
+                declared = set()
+            path, rows = export_query(conn, name, args.history_dir, snapshot_date=args.to_date,
+                                      values={k: v for k, v in values.items() if k in declared},
+                                      timeout=args.query_timeout)
+            print(f"  {name}: snapshot of {rows} rows -> {os.path.relpath(path)}")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    from generate_dashboard import add_connection_args
+
+    parser = argparse.ArgumentParser(description="Report what changed between two snapshots.")
+    parser.add_argument("queries", nargs="*", metavar="QUERY",
+                        help="queries with snapshots (file name or title)")
+    parser.add_argument("--all-keyed", action="store_true",
+                        help="every catalog query with a ResourceID column")
+    parser.add_argument("--from", dest="from_date",
+                        help="older snapshot date, YYYY-MM-DD (default: the one before --to)")
+    parser.add_argument("--to", dest="to_date",
+                        help="newer snapshot date, YYYY-MM-DD (default: the latest)")
+    parser.add_argument("--history-dir", default=HISTORY_DIR,
+                        help="snapshot directory (snapshot_export.py --out)")
+    parser.add_argument("--key", action="append", default=[], metavar="COLUMN",
+                        help="key column (repeatable; default: ResourceID, see DIFF_KEYS)")
+    parser.add_argument("--ignore", action="append", default=[], metavar="COLUMN",
+                        help="column left out of the comparison, in addition to CLOCK_COLUMNS")
+    parser.add_argument("--out", default=DIFF_DIR, help="directory for the JSONL files")
+    parser.add_argument("--compress", choices=["none", "gzip", "zstd"], default="none")
+    parser.add_argument("--xlsx", metavar="PATH",
+                        help="write the changes to a workbook instead of JSONL")
+    export = parser.add_argument_group("export", "take the --to (default: today's) "
+                                                 "snapshot first, as snapshot_export.py does")
+    export.add_argument("--export", action="store_true")
+    export.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a DECLARE default, e.g. InactiveDays=60")
+    add_connection_args(export)
+    export.add_argument("--query-timeout", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    names = keyed_queries() if args.all_keyed else args.queries
+    if not names:
+        parser.error("name at least one query, or use --all-keyed")
+    for option in ("from_date", "to_date"):
+        value = getattr(args, option)
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                parser.error(f"--{option[:-5]} must be YYYY-MM-DD, not {value}")
+
+    _libraries()
+    if args.export:
+        export_today(names, args)
+    diffs = []
+    for name in names:
+        try:
+            diff = diff_snapshots(args.history_dir, name, args.from_date, args.to_date,
+                                  args.key or None, CLOCK_COLUMNS | set(args.ignore))
+        except (FileNotFoundError, ValueError) as exc:
+            print(f"  {name}: skipped, {exc}")
+            continue
+        diffs.append(diff)
+        target = "" if args.xlsx else \
+            f" -> {os.path.relpath(write_jsonl(diff, args.out, args.compress))}"
+        print(f"  {diff['name']} {summary(diff)}, compared in {diff['seconds']:.2f}s{target}")
+    if args.xlsx and diffs:
+        write_workbook(args.xlsx, diffs)
+        print(f"Workbook saved: {args.xlsx}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Columnar Snapshot Export
+
+Writes catalog query results (any project .sql file, or one of the
+dashboard's SECURITY_QUERIES) to Parquet or Arrow IPC files for historical
+trending and fast reloads, outside Excel:
+
+    <out>/<query>/snapshot_date=YYYY-MM-DD/<query>.parquet   (or .arrow)
+
+The snapshot_date directories are Hive-style partitions, so a query's
+history reads back as one dataset with snapshot_date as a column. Column
+types come from the cursor's result metadata (cursor.description): strings,
+integers, floats, decimals with their precision and scale, dates, datetimes
+and bits. Backends that report no type (the SQLite stand-in) are typed
+from the first batch's values. Repetitive string columns (DICTIONARY_COLUMNS)
+are dictionary-encoded, with one dictionary per column grown across batches.
+
+Per-device detail queries (DETAIL_QUERIES in generate_dashboard.py) are read
+with keyset pagination and written batch by batch, so memory stays at one
+page. Arrow files are uncompressed and are memory-mapped on reload: a
+multi-million-row Installed_Software snapshot loads in milliseconds without
+touching the database. Parquet files are zstd-compressed and smaller, but
+decoded on reload.
+
+    python3 snapshot_export.py Installed_Software --standin standin.db --format arrow
+    python3 snapshot_export.py --all --out history
+    python3 snapshot_export.py --load Installed_Software
+
+Requires pyarrow: pip install pyarrow
+"""
+
+import argparse
+import datetime
+import decimal
+import hashlib
+import os
+import re
+import time
+
+from query_executor import paged_query, prepare_query
+from sql_catalog import get_catalog
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# String columns with few distinct values relative to their rows
+DICTIONARY_COLUMNS = {
+    "Computer Name", "User Name", "AD Site", "Operating System", "OS Version",
+    "Build Number", "Manufacturer", "Model", "Chassis Type", "Publisher",
+    "Software Name", "Version", "Application Name", "Collection Name", "Drive",
+    "Update Title", "Classification", "Status", "Install State", "Client Version",
+}
+BATCH_ROWS = 65536
+ROW_GROUP_ROWS = 1048576
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        raise SystemExit("Snapshot export requires pyarrow: pip install pyarrow")
+    return pa, pc
+
+
+# ── Queries ──────────────────────────────────────────────────────────────────
+def export_name(name):
+    """File-system name of a query: its catalog name, or the title with _ for spaces."""
+    return re.sub(r"\W+", "_", name).strip("_")
+
+
+def resolve_query(name, values=None):
+    """
+    Return (name, title, query) for a catalog query or one of the dashboard's
+    SECURITY_QUERIES; query is prepare_query's {'command', 'params', 'input_sizes'}.
+    """
+    from generate_dashboard import SECURITY_QUERIES
+
+    if name in SECURITY_QUERIES:
+        return (export_name(name), name,
+                {"command": SECURITY_QUERIES[name], "params": (), "input_sizes": None})
+    try:
+        entry = get_catalog().get(name)
+    except KeyError as exc:
+        raise SystemExit(exc.args[0])
+    return entry["name"], entry["title"], prepare_query(entry, values)
+
+
+def all_queries():
+    """Every exportable query: the catalog's .sql files, then SECURITY_QUERIES."""
+    from generate_dashboard import SECURITY_QUERIES
+
+    return [entry["name"] for entry in get_catalog()] + list(SECURITY_QUERIES)
+
+
+def fetch(conn, name, query, page_size=50000, fetch_size=5000, timeout=None):
+    """
+    Run a query and return (description, rows). DETAIL_QUERIES are read in
+    keyset-paginated pages and rows is a generator; others are read whole.
+    """
+    from generate_dashboard import DETAIL_QUERIES
+
+    if name in DETAIL_QUERIES:
+        stats = {}
+        _, rows = paged_query(conn, query["command"], query["params"],
+                              order=DETAIL_QUERIES[name], page_size=page_size,
+                              fetch_size=fetch_size, timeout=timeout,
+                              input_sizes=query["input_sizes"], stats=stats)
+        return stats["description"], rows
+    conn.timeout = int(timeout or 0)
+    cur = conn.cursor()
+    try:
+        if query["input_sizes"] and query["params"]:
+            cur.setinputsizes(query["input_sizes"])
+        cur.execute(query["command"], query["params"])
+        description = cur.description
+        rows = [tuple(r) for r in cur.fetchall()]
+    finally:
+        cur.close()
+    return description, rows
+
+
+# ── Types ────────────────────────────────────────────────────────────────────
+def arrow_type(python_type, precision=None, scale=None):
+    """Arrow type for a DB-API type code (pyodbc reports Python classes)."""
+    pa, _ = _pyarrow()
+    if python_type is decimal.Decimal:
+        return pa.decimal128(precision, scale or 0) if precision else pa.float64()
+    return {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        str: pa.string(),
+        datetime.datetime: pa.timestamp("us"),
+        datetime.date: pa.date32(),
+        datetime.time: pa.time64("us"),
+        bytes: pa.binary(),
+        bytearray: pa.binary(),
+    }.get(python_type, pa.string())
+
+
+def infer_type(values):
+    """Python type of a column from its values, for backends without type codes."""
+    found = {type(v) for v in values if v is not None}
+    if found <= {int, float} and float in found:
+        return float
+    if len(found) == 1:
+        return found.pop()
+    return str
+
+
+def build_schema(description, first_rows):
+    """Arrow schema from cursor.description, typing untyped columns from first_rows."""
+    pa, _ = _pyarrow()
+    fields = []
+    for i, d in enumerate(description):
+        name, code, precision, scale = d[0], d[1], d[4], d[5]
+        if code is None:
+            code = infer_type(row[i] for row in first_rows)
+        dtype = arrow_type(code, precision, scale)
+        if name in DICTIONARY_COLUMNS and dtype == pa.string():
+            dtype = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(name, dtype))
+    return pa.schema(fields)
+
+
+class DictionaryColumn:
+    """
+    One dictionary for a column across all batches. Each batch's values are
+    encoded against it and new values are appended, so successive batches
+    share a dictionary that only grows (written as Arrow dictionary deltas).
+    """
+
+    def __init__(self):
+        pa, _ = _pyarrow()
+        self.codes = {}
+        self.dictionary = pa.array([], pa.string())
+
+    def encode(self, values):
+        pa, pc = _pyarrow()
+        local = pa.array(values, pa.string()).dictionary_encode()
+        distinct = local.dictionary.to_pylist()
+        new = [v for v in distinct if v not in self.codes]
+        if new:
+            for v in new:
+                self.codes[v] = len(self.codes)
+            self.dictionary = pa.concat_arrays([self.dictionary, pa.array(new, pa.string())])
+        mapping = pa.array([self.codes[v] for v in distinct], pa.int32())
+        return pa.DictionaryArray.from_arrays(pc.take(mapping, local.indices), self.dictionary)
+
+
+def record_batches(schema, rows, batch_rows=BATCH_ROWS):
+    """Yield record batches of schema from row tuples."""
+    pa, _ = _pyarrow()
+    dictionaries = {f.name: DictionaryColumn() for f in schema
+                    if pa.types.is_dictionary(f.type)}
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_rows:
+            yield _record_batch(schema, batch, dictionaries)
+            batch = []
+    if batch:
+        yield _record_batch(schema, batch, dictionaries)
+
+
+def _record_batch(schema, batch, dictionaries):
+    pa, _ = _pyarrow()
+    arrays = []
+    for field, values in zip(schema, zip(*batch)):
+        if field.name in dictionaries:
+            arrays.append(dictionaries[field.name].encode(values))
+        else:
+            arrays.append(pa.array(values, field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+# ── Writing ──────────────────────────────────────────────────────────────────
+def snapshot_path(out_dir, name, snapshot_date, fmt):
+    return os.path.join(out_dir, name, f"snapshot_date={snapshot_date}",
+                        f"{name}{FORMATS[fmt]}")
+
+
+def write_snapshot(path, schema, batches, fmt):
+    """Write record batches to path (replaced atomically); returns the row count."""
+    pa, _ = _pyarrow()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    rows = 0
+    try:
+        if fmt == "arrow":
+            options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+            with pa.OSFile(tmp_path, "wb") as sink, \
+                    pa.ipc.new_file(sink, schema, options=options) as writer:
+                for batch in batches:
+                    writer.write_batch(batch)
+                    rows += batch.num_rows
+        else:
+            import pyarrow.parquet as pq
+
+            # One row group per batch, so only the current page is held in memory
+            with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+                for batch in batches:
+                    writer.write_batch(batch, row_group_size=ROW_GROUP_ROWS)
+                    rows += batch.num_rows
+                if not rows:
+                    writer.write_table(schema.empty_table())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
+
+
+def export_query(conn, name, out_dir=HISTORY_DIR, fmt="parquet", snapshot_date=None,
+                 values=None, page_size=50000, fetch_size=5000, timeout=None):
+    """Export one query's current result as a snapshot; returns (path, rows)."""
+    pa, _ = _pyarrow()
+    snapshot_date = snapshot_date or datetime.date.today().isoformat()
+    name, title, query = resolve_query(name, values)
+    description, rows = fetch(conn, name, query, page_size, fetch_size, timeout)
+    rows = iter(rows)
+    first = [row for _, row in zip(range(BATCH_ROWS), rows)]
+    schema = build_schema(description, first).with_metadata({
+        "query": name,
+        "title": title,
+        "snapshot_date": snapshot_date,
+        "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "sql_sha256": hashlib.sha256(query["command"].encode("utf-8")).hexdigest(),
+    })
+
+    def all_rows():
+        yield from first
+        yield from rows
+
+    path = snapshot_path(out_dir, name, snapshot_date, fmt)
+    return path, write_snapshot(path, schema, record_batches(schema, all_rows()), fmt)
+
+
+# ── Loading ──────────────────────────────────────────────────────────────────
+def snapshot_dates(out_dir, name):
+    """Snapshot dates available for a query, oldest first."""
+    base = os.path.join(out_dir, export_name(name))
+    if not os.path.isdir(base):
+        return []
+    return sorted(d.partition("=")[2] for d in os.listdir(base)
+                  if d.startswith("snapshot_date="))
+
+
+def load_snapshot(out_dir, name, snapshot_date=None):
+    """
+    Load one snapshot (the latest by default) as a pyarrow Table. Arrow files
+    are memory-mapped, so columns are read from the page cache on access.
+    """
+    pa, _ = _pyarrow()
+    name = export_name(name)
+    dates = snapshot_dates(out_dir, name)
+    if snapshot_date is None and dates:
+        snapshot_date = dates[-1]
+    if snapshot_date not in dates:
+        raise FileNotFoundError(f"no snapshot of {name} for {snapshot_date or 'any date'} "
+                                f"in {out_dir}")
+    path = snapshot_path(out_dir, name, snapshot_date, "arrow")
+    if os.path.exists(path):
+        return pa.ipc.open_file(pa.memory_map(path)).read_all()
+    import pyarrow.parquet as pq
+
+    return pq.read_table(snapshot_path(out_dir, name, snapshot_date, "parquet"),
+                         memory_map=True)
+
+
+def load_history(out_dir, name, fmt="parquet"):
+    """All of a query's snapshots in fmt as one pyarrow dataset with a snapshot_date column."""
+    _pyarrow()
+    import pyarrow.dataset as ds
+
+    name = export_name(name)
+    base = os.path.join(out_dir, name)
+    paths = [snapshot_path(out_dir, name, d, fmt) for d in snapshot_dates(out_dir, name)]
+    paths = [p for p in paths if os.path.exists(p)]
+    return ds.dataset(paths, format="ipc" if fmt == "arrow" else "parquet",
+                      partitioning="hive", partition_base_dir=base)
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    from delta_refresh import parse_param
+    from generate_dashboard import add_connection_args, open_connection
+
+    parser = argparse.ArgumentParser(description="Export query results as columnar snapshots.")
+    parser.add_argument("queries", nargs="*", metavar="QUERY",
+                        help="catalog queries (file name or title) or dashboard security queries")
+    parser.add_argument("--all", action="store_true", help="export every query")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet",
+                        help="parquet (compressed) or arrow (memory-mapped on reload)")
+    parser.add_argument("--out", default=HISTORY_DIR, help="snapshot directory")
+    parser.add_argument("--date", help="snapshot date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--load", action="store_true",
+                        help="load the latest (or --date) snapshot of each query instead")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a DECLARE default, e.g. InactiveDays=60")
+    add_connection_args(parser)
+    parser.add_argument("--page-size", type=int, default=50000)
+    parser.add_argument("--fetch-size", type=int, default=5000)
+    parser.add_argument("--query-timeout", type=int, default=600)
+    args = parser.parse_args(argv)
+
+    names = all_queries() if args.all else args.queries
+    if not names:
+        parser.error("name at least one query, or use --all")
+    if args.date:
+        try:
+            datetime.date.fromisoformat(args.date)
+        except ValueError:
+            parser.error(f"--date must be YYYY-MM-DD, not {args.date}")
+
+    if args.load:
+        _pyarrow()
+        for name in names:
+            start = time.perf_counter()
+            table = load_snapshot(args.out, name, args.date)
+            print(f"  {name}: {table.num_rows} rows, {table.num_columns} columns, "
+                  f"snapshot {table.schema.metadata[b'snapshot_date'].decode()}, "
+                  f"loaded in {time.perf_counter() - start:.3f}s")
+        return
+
+    _pyarrow()
+    conn = open_connection(args)
+
+    values = dict(parse_param(p) for p in args.param)
+    try:
+        for name in names:
+            try:
+                declared = {p["name"] for p in get_catalog().get(name)["params"]}
+            except KeyError:
+                declared = set()
+            start = time.perf_counter()
+            path, rows = export_query(conn, name, args.out, args.format, args.date,
+                                      {k: v for k, v in values.items() if k in declared},
+                                      page_size=args.page_size, fetch_size=args.fetch_size,
+                                      timeout=args.query_timeout)
+            print(f"  {name}: {rows} rows -> {os.path.relpath(path)} "
+                  f"({os.path.getsize(path) / 1048576:.1f} MB, "
+                  f"{time.perf_counter() - start:.2f}s)")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
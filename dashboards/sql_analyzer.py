@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+SQL Query Analyzer (SARGability)
+
+Walks every .sql file in the query library and flags patterns that keep SQL
+Server from seeking an index, or that cost work on every row:
+
+- non-sargable predicates: a column wrapped in a function inside a WHERE,
+  ON or HAVING condition (DATEDIFF(DAY, ch.LastDDR, GETDATE()) > @Days,
+  UPPER(col) = ..., ISNULL(col, ...) = ...), and LIKE patterns, literal or
+  a DECLARE default, that start with a wildcard
+- FORMAT() calls, which go through the CLR once per row
+- COUNT(DISTINCT ...), each of which needs its own sort or hash aggregate
+
+Where an equivalent form exists it is emitted as a rewrite:
+
+    DATEDIFF(DAY, col, GETDATE()) > n  ->  col < DATEADD(DAY, -n, CAST(GETDATE() AS DATE))
+    FORMAT(col, 'yyyy-MM-dd HH:mm')    ->  CONVERT(VARCHAR(16), col, 120)
+
+DATEDIFF(DAY, ...) counts midnight boundaries, so comparing the column with
+a midnight n days back returns exactly the same rows (<, <=, >= and > are
+all handled). Leading-wildcard LIKEs have no equivalent and are only
+reported.
+
+Queries are ranked by an estimated scan cost: rows read from each view
+(VIEW_ROWS_PER_DEVICE x --devices, or a fixed SITE_ROWS count), with views
+that have a sargable filter read at SEEK_FRACTION, plus the per-row cost of
+FORMAT() and COUNT(DISTINCT). Whether an index exists is not known here;
+the ranking assumes a sargable filter could use one.
+
+    python3 sql_analyzer.py                        # ranked report
+    python3 sql_analyzer.py Inactive_Clients --diff
+    python3 sql_analyzer.py --verify standin.db    # rewrites return the same rows
+    python3 sql_analyzer.py Inactive_Clients --apply
+"""
+
+import argparse
+import difflib
+import os
+import re
+from collections import Counter
+
+from sql_catalog import get_catalog, parse_sql
+
+# Estimated rows per managed device in each view; site-wide views that do
+# not grow with the device count have a fixed estimate in SITE_ROWS. Views
+# not listed count as one row per device.
+VIEW_ROWS_PER_DEVICE = {
+    "v_GS_X86_PC_MEMORY": 2,
+    "v_GS_LOGICAL_DISK": 2,
+    "v_GS_BITLOCKER_DETAILS": 2,
+    "v_GS_ADD_REMOVE_PROGRAMS": 150,
+    "v_GS_SERVER_FEATURE": 3,
+    "v_GS_REGISTRY": 20,
+    "v_UpdateComplianceStatus": 300,
+    "v_AssignmentTargetedMachines": 10,
+    "v_AppIntentAssetData": 10,
+    "v_FullCollectionMembership": 25,
+}
+SITE_ROWS = {
+    "v_UpdateInfo": 20000,
+    "v_AuthListInfo": 50,
+    "v_CIAssignment": 500,
+    "v_DeploymentSummary": 500,
+    "fn_ListApplicationCIs": 300,
+    "v_Collection": 400,
+}
+DEFAULT_DEVICES = 10000
+SEEK_FRACTION = 0.1      # share of a view read when a sargable filter can seek
+FORMAT_ROW_COST = 0.5    # one FORMAT() call, per output row, in row reads
+DISTINCT_ROW_COST = 1.0  # one COUNT(DISTINCT) pass, per row read
+
+# FORMAT pattern -> CONVERT target type and style giving the same text
+FORMAT_STYLES = {
+    "yyyy-MM-dd": ("VARCHAR(10)", 23),
+    "yyyy-MM-dd HH:mm": ("VARCHAR(16)", 120),
+    "yyyy-MM-dd HH:mm:ss": ("VARCHAR(19)", 120),
+}
+# Scalar functions that hide a column from the optimizer when applied to it
+# in a predicate
+HIDING_FUNCTIONS = {
+    "UPPER", "LOWER", "LTRIM", "RTRIM", "TRIM", "ISNULL", "COALESCE", "CONVERT", "CAST",
+    "TRY_CONVERT", "TRY_CAST", "YEAR", "MONTH", "DAY", "DATEPART", "DATENAME", "DATEDIFF",
+    "DATEADD", "EOMONTH", "LEFT", "RIGHT", "SUBSTRING", "LEN", "REPLACE", "FORMAT", "ABS",
+    "ROUND", "FLOOR", "CEILING",
+}
+DAY_UNITS = {"DAY", "DD", "D"}
+KEYWORDS = {
+    "ON", "WHERE", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "JOIN", "GROUP",
+    "ORDER", "HAVING", "UNION", "WITH", "AS",
+}
+
+_LITERAL_OR_COMMENT = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", re.S)
+_CLAUSE = re.compile(r"\(|\)|;|\b(?:WHERE|ON|HAVING|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|"
+                     r"GROUP\s+BY|ORDER\s+BY|UNION|EXCEPT|INTERSECT|SELECT|FROM)\b", re.I)
+_COLUMN = r"\[?[A-Za-z_]\w*\]?\.\[?[A-Za-z_]\w*\]?"
+_COLUMN_REF = re.compile(r"\b([A-Za-z_]\w*)\]?\.\[?[A-Za-z_]\w*")
+_NOW = r"(?:GETDATE\s*\(\s*\)|SYSDATETIME\s*\(\s*\)|CURRENT_TIMESTAMP)"
+_DATEDIFF_CMP = re.compile(rf"\bDATEDIFF\s*\(\s*(\w+)\s*,\s*({_COLUMN})\s*,\s*{_NOW}\s*\)"
+                           rf"\s*(>=|<=|>|<)\s*(@\w+|\d+)\b", re.I)
+_FUNCTION = re.compile(r"\b([A-Za-z_]\w*)\s*\(")
+_LIKE = re.compile(rf"({_COLUMN})\s+(?:NOT\s+)?LIKE\s+(N?'[^']*'|@\w+)", re.I)
+_FORMAT = re.compile(r"\bFORMAT\s*\(", re.I)
+_COUNT_DISTINCT = re.compile(r"\bCOUNT\s*\(\s*DISTINCT\b", re.I)
+_SOURCE = re.compile(r"\b(?:FROM|JOIN)\s+\[?(\w+)\]?(?:\s*\([^)]*\))?(?:\s+(?:AS\s+)?(\w+))?",
+                     re.I)
+_FILTER = re.compile(rf"\b([A-Za-z_]\w*)\]?\.\[?[A-Za-z_]\w*\]?\s*"
+                     rf"(?:<=|>=|=|<|>|\bIS\s+NULL\b|\bIN\s*\(|\bBETWEEN\b|\bLIKE\b)\s*(\S*)",
+                     re.I)
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+def mask(sql):
+    """
+    Blank out comments and the inside of string literals, keeping every
+    offset, so patterns only match code.
+    """
+    def blank(m):
+        text = m.group(0)
+        if text.startswith("'"):
+            return "'" + "_" * (len(text) - 2) + "'"
+        return re.sub(r"[^\n]", " ", text)
+    return _LITERAL_OR_COMMENT.sub(blank, sql)
+
+
+def call_end(masked, open_paren):
+    """Offset just past the parenthesis matching the one at open_paren."""
+    depth = 0
+    for i in range(open_paren, len(masked)):
+        if masked[i] == "(":
+            depth += 1
+        elif masked[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(masked)
+
+
+def split_args(text):
+    """Split the inside of a call at its top-level commas."""
+    args, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+
+def predicate_regions(masked):
+    """(start, end) of every WHERE, ON and HAVING condition, subqueries included."""
+    regions, open_regions, depth = [], [], 0
+    for m in _CLAUSE.finditer(masked):
+        token = m.group(0).upper()
+        if token == "(":
+            depth += 1
+            continue
+        while open_regions and open_regions[-1][0] == depth:
+            regions.append((open_regions.pop()[1], m.start()))
+        if token == ")":
+            depth -= 1
+        elif token in ("WHERE", "ON", "HAVING"):
+            open_regions.append((depth, m.end()))
+    regions.extend((start, len(masked)) for _, start in open_regions)
+    return sorted(regions)
+
+
+def sources(masked):
+    """alias -> view for every FROM / JOIN source (the view name when unaliased)."""
+    found = {}
+    for m in _SOURCE.finditer(masked):
+        view, alias = m.group(1), m.group(2)
+        if alias is None or alias.upper() in KEYWORDS:
+            alias = view
+        found[alias.lower()] = view
+    return found
+
+
+# ── Rules ────────────────────────────────────────────────────────────────────
+def datediff_rewrite(column, op, operand):
+    """Sargable form of DATEDIFF(DAY, column, GETDATE()) <op> operand."""
+    back = f"-{operand}" if operand != "0" else "0"
+    back_one = str(1 - int(operand)) if operand.isdigit() else f"1 - {operand}"
+    cmp, days = {">": ("<", back), ">=": ("<", back_one),
+                 "<": (">=", back_one), "<=": (">=", back)}[op]
+    return f"{column} {cmp} DATEADD(DAY, {days}, CAST(GETDATE() AS DATE))"
+
+
+def find_issues(sql, params=()):
+    """
+    Return the findings for one query's SQL text: dicts with rule, start,
+    end, alias, message and rewrite (None when there is no safe one).
+    """
+    masked = mask(sql)
+    defaults = {p["name"].lower(): p["default"] for p in params}
+    issues = []
+
+    def covered(start, end):
+        return any(i["start"] <= start and end <= i["end"] for i in issues)
+
+    def alias_of(text):
+        m = _COLUMN_REF.search(text)
+        return m.group(1).lower() if m else None
+
+    for start, end in predicate_regions(masked):
+        region = masked[start:end]
+        for m in _DATEDIFF_CMP.finditer(region):
+            unit, column, op, operand = m.groups()
+            s, e = start + m.start(), start + m.end()
+            if covered(s, e):
+                continue
+            day = unit.upper() in DAY_UNITS
+            issues.append({
+                "rule": "non-sargable", "start": s, "end": e, "alias": alias_of(column),
+                "message": f"DATEDIFF on {column} hides it from any index; compare the "
+                           f"column with a date instead",
+                "rewrite": datediff_rewrite(column, op, operand) if day else None,
+            })
+        for m in _LIKE.finditer(region):
+            column, pattern = m.groups()
+            s, e = start + m.start(), start + m.end()
+            if pattern.startswith("@"):
+                default = defaults.get(pattern[1:].lower())
+                shown = f"{pattern} (default {default!r})"
+            else:
+                default = sql[start + m.start(2):start + m.end(2)].lstrip("Nn")[1:-1]
+                shown = f"'{default}'"
+            if not isinstance(default, str) or not default[:1] in ("%", "_"):
+                continue
+            issues.append({
+                "rule": "leading-wildcard", "start": s, "end": e, "alias": alias_of(column),
+                "message": f"LIKE {shown} starts with a wildcard, so {column} is scanned; "
+                           f"a prefix pattern or full-text search can seek",
+                "rewrite": None,
+            })
+        for m in _FUNCTION.finditer(region):
+            name = m.group(1).upper()
+            if name not in HIDING_FUNCTIONS:
+                continue
+            s = start + m.start()
+            e = call_end(masked, start + m.end() - 1)
+            if covered(s, e):
+                continue
+            alias = alias_of(masked[s:e])
+            if alias is None:
+                continue
+            issues.append({
+                "rule": "non-sargable", "start": s, "end": e, "alias": alias,
+                "message": f"{name}() applied to a column in a predicate forces a scan",
+                "rewrite": None,
+            })
+
+    for m in _FORMAT.finditer(masked):
+        s, e = m.start(), call_end(masked, m.end() - 1)
+        args = split_args(sql[m.end():e - 1])
+        rewrite = None
+        if len(args) == 2 and args[1].startswith("'"):
+            style = FORMAT_STYLES.get(args[1][1:-1])
+            if style:
+                rewrite = f"CONVERT({style[0]}, {args[0]}, {style[1]})"
+        issues.append({
+            "rule": "format", "start": s, "end": e, "alias": alias_of(masked[s:e]),
+            "message": "FORMAT() runs through the CLR once per row",
+            "rewrite": rewrite,
+        })
+
+    distinct = [(m.start(), call_end(masked, masked.index("(", m.start())))
+                for m in _COUNT_DISTINCT.finditer(masked)]
+    columns = {re.sub(r"\s+", "", masked[s:e].upper()) for s, e in distinct}
+    for s, e in distinct:
+        issues.append({
+            "rule": "count-distinct", "start": s, "end": e, "alias": alias_of(masked[s:e]),
+            "message": "COUNT(DISTINCT) needs its own sort or hash aggregate"
+                       + (f"; {len(columns)} different distinct counts in this query"
+                          if len(columns) > 1 else ""),
+            "rewrite": None,
+        })
+
+    for issue in issues:
+        issue["line"] = sql.count("\n", 0, issue["start"]) + 1
+        issue["text"] = " ".join(sql[issue["start"]:issue["end"]].split())
+    return sorted(issues, key=lambda i: i["start"])
+
+
+def apply_rewrites(sql, issues):
+    """Return sql with every available rewrite applied."""
+    out, pos = [], 0
+    for issue in issues:
+        if issue["rewrite"] is None or issue["start"] < pos:
+            continue
+        out.append(sql[pos:issue["start"]])
+        out.append(issue["rewrite"])
+        pos = issue["end"]
+    out.append(sql[pos:])
+    return "".join(out)
+
+
+# ── Cost ─────────────────────────────────────────────────────────────────────
+def scan_cost(sql, issues, devices=DEFAULT_DEVICES):
+    """
+    Estimated cost of one query in row reads: each view read in full, or at
+    SEEK_FRACTION when it has a sargable filter and no non-sargable one,
+    plus FORMAT() per output row and a pass per COUNT(DISTINCT).
+    """
+    masked = mask(sql)
+    views = sources(masked)
+    blocked = {i["alias"] for i in issues if i["rule"] in ("non-sargable", "leading-wildcard")}
+    filtered = set()
+    for start, end in predicate_regions(masked):
+        for m in _FILTER.finditer(masked, start, end):
+            operand = m.group(2)
+            # alias.col = other.col is a join condition, not a filter
+            if _COLUMN_REF.match(operand) and not operand.startswith("@"):
+                continue
+            if not any(i["start"] <= m.start() < i["end"] for i in issues):
+                filtered.add(m.group(1).lower())
+
+    rows_read, widest = 0.0, 0.0
+    for alias, view in views.items():
+        rows = SITE_ROWS.get(view, VIEW_ROWS_PER_DEVICE.get(view, 1) * devices)
+        if alias in filtered and alias not in blocked:
+            rows *= SEEK_FRACTION
+        rows_read += rows
+        widest = max(widest, rows)
+    formats = sum(1 for i in issues if i["rule"] == "format")
+    distincts = sum(1 for i in issues if i["rule"] == "count-distinct")
+    return (rows_read + FORMAT_ROW_COST * formats * widest
+            + DISTINCT_ROW_COST * distincts * rows_read)
+
+
+def analyze(entry, root, devices=DEFAULT_DEVICES):
+    """Analyze one catalog entry; returns the findings, rewrite and both costs."""
+    path = os.path.join(root, entry["path"])
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        content = f.read()
+    issues = find_issues(content, entry["params"])
+    rewritten = apply_rewrites(content, issues)
+    after = find_issues(rewritten, entry["params"])
+    return {
+        "entry": entry,
+        "path": path,
+        "content": content,
+        "issues": issues,
+        "rewritten": rewritten,
+        "cost": scan_cost(content, issues, devices),
+        "cost_after": scan_cost(rewritten, after, devices),
+    }
+
+
+# ── Verification ─────────────────────────────────────────────────────────────
+def verify(report, standin):
+    """
+    Run each rewritten query and its original against a stand-in database
+    and compare the rows (as multisets). Returns the paths that differ.
+    """
+    from query_executor import connect_standin, execute_query, prepare_query
+
+    connect = connect_standin(standin)
+    differ = []
+    for res in report:
+        if res["rewritten"] == res["content"]:
+            continue
+        rows = []
+        for content in (res["content"], res["rewritten"]):
+            entry = dict(parse_sql(content), path=res["entry"]["path"])
+            query = prepare_query(entry)
+            conn = connect()
+            try:
+                columns, result = execute_query(conn, query["command"], query["params"])
+            finally:
+                conn.close()
+            rows.append((columns, Counter(result)))
+        same = rows[0] == rows[1]
+        print(f"  {'same' if same else 'DIFFERENT':<9} {res['entry']['path']} "
+              f"({sum(rows[0][1].values())} rows)")
+        if not same:
+            differ.append(res["entry"]["path"])
+    return differ
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+def print_report(report, devices):
+    print(f"Estimated scan cost at {devices:,} devices (row reads)\n")
+    print(f"{'#':>3}  {'Query':<56} {'Cost':>12} {'Rewritten':>12}  Findings")
+    for rank, res in enumerate(report, start=1):
+        counts = Counter(i["rule"] for i in res["issues"])
+        summary = ", ".join(f"{n} {rule}" for rule, n in sorted(counts.items()))
+        print(f"{rank:>3}  {res['entry']['path']:<56} {res['cost']:>12,.0f} "
+              f"{res['cost_after']:>12,.0f}  {summary}")
+    for res in report:
+        if not res["issues"]:
+            continue
+        print(f"\n{res['entry']['path']}")
+        for issue in res["issues"]:
+            print(f"  line {issue['line']:<4} {issue['rule']:<16} {issue['text']}")
+            print(f"       {'':<16} {issue['message']}")
+            if issue["rewrite"]:
+                print(f"       {'':<16} -> {issue['rewrite']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Flag non-sargable predicates and per-row costs in the SQL library.")
+    parser.add_argument("queries", nargs="*",
+                        help="queries to analyze (file stem, title or path; default: all)")
+    parser.add_argument("--devices", type=int, default=DEFAULT_DEVICES,
+                        help=f"device count for the cost estimate (default: {DEFAULT_DEVICES})")
+    parser.add_argument("--diff", action="store_true",
+                        help="print the rewrites as a unified diff instead of the report")
+    parser.add_argument("--apply", action="store_true",
+                        help="write the rewrites back to the .sql files")
+    parser.add_argument("--verify", metavar="STANDIN",
+                        help="check every rewrite returns the original rows on a stand-in "
+                             "database (exit status 1 if any differ)")
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    entries = [catalog.get(q) for q in args.queries] if args.queries else list(catalog)
+    report = sorted((analyze(e, catalog.root, args.devices) for e in entries),
+                    key=lambda r: -r["cost"])
+
+    if args.diff:
+        for res in report:
+            if res["rewritten"] != res["content"]:
+                print("".join(difflib.unified_diff(
+                    res["content"].splitlines(True), res["rewritten"].splitlines(True),
+                    "a/" + res["entry"]["path"], "b/" + res["entry"]["path"])), end="")
+    else:
+        print_report(report, args.devices)
+
+    if args.verify:
+        print(f"\nVerifying rewrites against {args.verify}")
+        if verify(report, args.verify):
+            raise SystemExit(1)
+
+    if args.apply:
+        for res in report:
+            if res["rewritten"] != res["content"]:
+                with open(res["path"], "w", encoding="utf-8", newline="") as f:
+                    f.write(res["rewritten"])
+                print(f"Rewrote {res['entry']['path']}")
+
+
+if __name__ == "__main__":
+    main()
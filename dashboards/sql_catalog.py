@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+SQL Catalog Index
+
+Scans every .sql file in the repository once and keeps a pre-parsed index,
+so the dashboard generator (and any other tool) can look a query up by name,
+path or view without re-reading and re-parsing the files on every run.
+
+For each query the index holds:
+- the header metadata (title, Description, Views Used, Usage, Profile)
+- the DECLARE @Param TYPE = default lines, parsed into name/type/default
+- the SQL with the comment header stripped, and the body without DECLAREs
+- a parameterised command: the body with each @Param replaced by an ODBC
+  ``?`` marker, and the parameter name bound to each marker
+
+The index is saved as JSON next to this script. On load, files are only
+re-parsed when their mtime or size changed and their content hash differs;
+new files are added and deleted files dropped.
+
+    python3 sql_catalog.py                    # list every query
+    python3 sql_catalog.py --view v_GS_TPM    # queries using a view
+    python3 sql_catalog.py --show Inactive_Clients
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sql_catalog.json")
+INDEX_VERSION = 3
+
+_HEADER = re.compile(r"^\s*/\*(.*?)\*/", re.S)
+_FIELD = re.compile(r"^\s*(Description|Views Used|Usage|Profile)\s*:\s*(.*)$")
+_DECLARE = re.compile(
+    r"^\s*DECLARE\s+@(\w+)\s+([A-Za-z]+(?:\s*\([^)]*\))?)\s*(?:=\s*(.+?))?\s*;?\s*$",
+    re.I)
+# String literals and comments are matched first so @ inside them is left alone
+_TOKEN = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/|@@?\w+", re.S)
+_ORDER_TOKEN = re.compile(r"'(?:[^']|'')*'|--[^\n]*|\(|\)|\bORDER\s+BY\b", re.IGNORECASE)
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+def strip_header(content):
+    """Return the SQL with the leading /* ... */ comment header removed."""
+    lines = content.strip().splitlines()
+    sql_lines = []
+    in_comment = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("/*"):
+            in_comment = "*/" not in stripped
+            continue
+        if in_comment:
+            if "*/" in stripped:
+                in_comment = False
+            continue
+        sql_lines.append(line)
+    return "\n".join(sql_lines).strip()
+
+
+def parse_default(value):
+    """Turn a DECLARE default literal into a Python value."""
+    if value is None:
+        return None
+    if value.upper() == "NULL":
+        return None
+    if value[:2].upper() == "N'":
+        value = value[1:]
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("''", "'")
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+def parameterise(body, params):
+    """
+    Replace references to declared parameters with ODBC ``?`` markers.
+    Returns (command, names) where names[i] is the parameter bound to the
+    i-th marker; a parameter used twice is bound twice.
+    """
+    declared = {p["name"].lower(): p["name"] for p in params}
+    names = []
+
+    def marker(m):
+        token = m.group(0)
+        if token.startswith("@") and not token.startswith("@@"):
+            name = declared.get(token[1:].lower())
+            if name:
+                names.append(name)
+                return "?"
+        return token
+
+    return _TOKEN.sub(marker, body), names
+
+
+def strip_order_by(sql):
+    """Remove a trailing top-level ORDER BY so the query can be a derived table."""
+    depth, last = 0, None
+    for m in _ORDER_TOKEN.finditer(sql):
+        token = m.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0 and token.upper().startswith("ORDER"):
+            last = m.start()
+    return sql[:last].rstrip() if last is not None else sql
+
+
+def parse_sql(content):
+    """Parse one .sql file into title, header fields, parameters and SQL text."""
+    entry = {"title": "", "description": "", "views": [], "usage": "", "profile": "",
+             "params": []}
+
+    header = _HEADER.match(content)
+    if header:
+        lines = [l.strip() for l in header.group(1).strip().splitlines()]
+        entry["title"] = lines[0] if lines else ""
+        for line in lines[1:]:
+            m = _FIELD.match(line)
+            if not m:
+                continue
+            field, value = m.groups()
+            if field == "Views Used":
+                entry["views"] = [v.strip() for v in value.split(",") if v.strip()]
+            else:
+                entry[field.lower()] = value.strip()
+
+    sql = strip_header(content)
+    body = []
+    for line in sql.splitlines():
+        m = _DECLARE.match(line)
+        if m:
+            name, sql_type, default = m.groups()
+            entry["params"].append({"name": name, "type": " ".join(sql_type.upper().split()),
+                                    "default": parse_default(default)})
+        else:
+            body.append(line)
+    entry["sql"] = sql
+    entry["body"] = "\n".join(body).strip()
+    entry["command"], entry["markers"] = parameterise(entry["body"], entry["params"])
+    return entry
+
+
+# ── Index ────────────────────────────────────────────────────────────────────
+class SqlCatalog:
+    """Pre-parsed index of every .sql file under root, keyed by relative path.
+
+    Lookups by file stem ("Inactive_Clients"), title ("Inactive Clients") or
+    relative path ("Client-Health/Inactive_Clients.sql") are dict lookups.
+    """
+
+    def __init__(self, root=BASE_DIR, index_path=INDEX_FILE):
+        self.root = root
+        self.index_path = index_path
+        self.entries = {}
+        self.rebuilt = []
+        self._by_name = {}
+        self._by_view = {}
+
+    @classmethod
+    def load(cls, root=BASE_DIR, index_path=INDEX_FILE):
+        """Load the saved index, refresh changed files and save it if anything changed."""
+        catalog = cls(root, index_path)
+        catalog._read_index()
+        if catalog.refresh():
+            catalog.save()
+        return catalog
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == INDEX_VERSION and data.get("root") == self.root:
+            self.entries = data.get("entries", {})
+
+    def scan(self):
+        """Yield (relative_path, os.stat_result) for every .sql file under root."""
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".sql"):
+                    path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+                    yield rel, os.stat(path)
+
+    def refresh(self):
+        """Re-parse new or modified files and drop deleted ones. Returns True if changed."""
+        self.rebuilt = []
+        changed = False
+        seen = set()
+        for rel, st in self.scan():
+            seen.add(rel)
+            old = self.entries.get(rel)
+            if old and old["mtime"] == st.st_mtime_ns and old["size"] == st.st_size:
+                continue
+            with open(os.path.join(self.root, rel), "rb") as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            changed = True
+            if old and old["sha256"] == digest:
+                # Touched but unchanged: keep the parsed entry
+                old["mtime"], old["size"] = st.st_mtime_ns, st.st_size
+                continue
+            entry = parse_sql(raw.decode("utf-8-sig"))
+            entry.update({
+                "path": rel,
+                "name": os.path.splitext(os.path.basename(rel))[0],
+                "folder": rel.split("/")[0] if "/" in rel else "",
+                "mtime": st.st_mtime_ns,
+                "size": st.st_size,
+                "sha256": digest,
+            })
+            self.entries[rel] = entry
+            self.rebuilt.append(rel)
+        for rel in set(self.entries) - seen:
+            del self.entries[rel]
+            changed = True
+        self._build_lookups()
+        return changed
+
+    def _build_lookups(self):
+        self._by_name = {}
+        self._by_view = {}
+        for rel, entry in sorted(self.entries.items()):
+            for key in (rel, entry["name"], entry["title"]):
+                if key:
+                    self._by_name.setdefault(key.lower(), entry)
+            for view in entry["views"]:
+                self._by_view.setdefault(view.lower(), []).append(entry)
+
+    def save(self):
+        """Write the index atomically."""
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "root": self.root, "entries": self.entries},
+                      f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def get(self, name):
+        """Return the entry for a relative path, file stem or title (case-insensitive)."""
+        entry = self._by_name.get(name.replace("\\", "/").lower())
+        if entry is None:
+            raise KeyError(f"no query named {name!r} in {self.root}")
+        return entry
+
+    def by_view(self, view):
+        """Return every entry whose 'Views Used' header lists this view."""
+        return list(self._by_view.get(view.lower(), []))
+
+    def __contains__(self, name):
+        return name.replace("\\", "/").lower() in self._by_name
+
+    def __iter__(self):
+        return iter(self.entries[rel] for rel in sorted(self.entries))
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_catalog = None
+
+
+def get_catalog():
+    """Process-wide catalog, loaded (and refreshed) on first use."""
+    global _catalog
+    if _catalog is None:
+        _catalog = SqlCatalog.load()
+    return _catalog
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index and look up the project's SQL queries.")
+    parser.add_argument("--view", help="list queries that use this view")
+    parser.add_argument("--show", metavar="QUERY", help="print one query's metadata and SQL")
+    parser.add_argument("--rebuild", action="store_true", help="discard the saved index first")
+    args = parser.parse_args(argv)
+
+    if args.rebuild and os.path.exists(INDEX_FILE):
+        os.remove(INDEX_FILE)
+    catalog = SqlCatalog.load()
+    if catalog.rebuilt:
+        print(f"Indexed {len(catalog.rebuilt)} of {len(catalog)} files -> {INDEX_FILE}")
+
+    if args.show:
+        entry = catalog.get(args.show)
+        print(f"{entry['title']}  ({entry['path']})")
+        print(f"  Description: {entry['description']}")
+        print(f"  Views Used:  {', '.join(entry['views'])}")
+        if entry["usage"]:
+            print(f"  Usage:       {entry['usage']}")
+        if entry["profile"]:
+            print(f"  Profile:     {entry['profile']}")
+        for p in entry["params"]:
+            print(f"  @{p['name']} {p['type']} = {p['default']!r}")
+        print()
+        print(entry["command"] if entry["params"] else entry["body"])
+        if entry["markers"]:
+            print(f"\n-- ? markers bind: {', '.join('@' + n for n in entry['markers'])}")
+        return
+
+    entries = catalog.by_view(args.view) if args.view else list(catalog)
+    for entry in entries:
+        params = ", ".join("@" + p["name"] for p in entry["params"])
+        print(f"{entry['path']:<58} {entry['title']}" + (f"  [{params}]" if params else ""))
+
+
+if __name__ == "__main__":
+    main()
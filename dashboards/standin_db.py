@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+MECM Site Database Stand-in
+
+Builds a local SQLite database that mimics the MECM site database views used
+by the project's .sql files (v_R_System_Valid, v_GS_*, v_CH_*, v_Update*,
+v_Collection*, fn_ListApplicationCIs), seeded with synthetic devices.
+
+The stand-in lets the dashboard generator's live mode run offline:
+
+    python3 standin_db.py standin.db --devices 5000
+    python3 generate_dashboard.py --live --standin standin.db
+
+Connections returned by connect_standin() translate the T-SQL constructs used
+by the query library (FORMAT, DATEDIFF, DATEADD, GETDATE, CONVERT to
+character types, CAST(GETDATE() AS DATE), table-valued function calls,
+OFFSET ... FETCH NEXT paging, SELECT ... INTO #temp batches read with
+nextset()) so the shipped queries run unmodified.
+"""
+
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+# ── Schema ───────────────────────────────────────────────────────────────────
+# One table per MECM view, named exactly as the view the queries reference.
+SCHEMA = {
+    "v_R_System_Valid": [
+        "ResourceID INTEGER PRIMARY KEY", "Name0 TEXT", "UserName0 TEXT",
+        "AD_Site_Name0 TEXT", "Client0 INTEGER", "Client_Version0 TEXT",
+        "Operating_System_Name_and0 TEXT",
+    ],
+    "v_GS_OPERATING_SYSTEM": [
+        "ResourceID INTEGER", "Caption0 TEXT", "Version0 TEXT", "BuildNumber0 TEXT",
+        "CSDVersion0 TEXT", "InstallDate0 TEXT", "LastBootUpTime0 TEXT",
+    ],
+    "v_GS_COMPUTER_SYSTEM": [
+        "ResourceID INTEGER", "Manufacturer0 TEXT", "Model0 TEXT", "SystemType0 TEXT",
+        "NumberOfProcessors0 INTEGER",
+    ],
+    "v_GS_SYSTEM_ENCLOSURE": ["ResourceID INTEGER", "ChassisTypes0 INTEGER"],
+    "v_GS_X86_PC_MEMORY": ["ResourceID INTEGER", "TotalPhysicalMemory0 INTEGER"],
+    "v_GS_PC_BIOS": ["ResourceID INTEGER", "SerialNumber0 TEXT"],
+    "v_GS_PROCESSOR": [
+        "ResourceID INTEGER", "Name0 TEXT", "NumberOfCores0 INTEGER",
+        "NumberOfLogicalProcessors0 INTEGER",
+    ],
+    "v_GS_LOGICAL_DISK": [
+        "ResourceID INTEGER", "DeviceID0 TEXT", "VolumeName0 TEXT", "FileSystem0 TEXT",
+        "DriveType0 INTEGER", "Size0 INTEGER", "FreeSpace0 INTEGER",
+    ],
+    "v_GS_BITLOCKER_DETAILS": [
+        "ResourceID INTEGER", "DriveLetter0 TEXT", "ProtectionStatus0 INTEGER",
+        "ConversionStatus0 INTEGER", "EncryptionMethod0 TEXT", "KeyProtectorTypes0 TEXT",
+    ],
+    "v_GS_FIRMWARE": ["ResourceID INTEGER", "SecureBoot0 INTEGER", "UEFI0 INTEGER"],
+    "v_GS_TPM": [
+        "ResourceID INTEGER", "IsActivated_InitialValue0 INTEGER",
+        "IsEnabled_InitialValue0 INTEGER", "IsOwned_InitialValue0 INTEGER",
+        "SpecVersion0 TEXT", "ManufacturerVersion0 TEXT",
+    ],
+    "v_GS_WINDOWS_DEFENDER_STATUS": [
+        "ResourceID INTEGER", "AMServiceEnabled0 INTEGER",
+        "RealTimeProtectionEnabled0 INTEGER", "AntivirusSignatureVersion0 TEXT",
+        "AntivirusSignatureUpdateDateTime0 TEXT", "EngineVersion0 TEXT",
+    ],
+    "v_GS_SYSTEM_CONSOLE_USAGE": ["ResourceID INTEGER", "TopConsoleUser0 TEXT"],
+    "v_GS_ADD_REMOVE_PROGRAMS": [
+        "ResourceID INTEGER", "DisplayName0 TEXT", "Version0 TEXT", "Publisher0 TEXT",
+        "InstallDate0 TEXT",
+    ],
+    "v_GS_SERVER_FEATURE": [
+        "ResourceID INTEGER", "Name0 TEXT", "ID0 INTEGER", "InstallState0 INTEGER",
+    ],
+    "v_GS_REGISTRY": [
+        "ResourceID INTEGER", "KeyName0 TEXT", "ValueName0 TEXT", "Value0 TEXT",
+    ],
+    "v_GS_PROVISIONINGMODE0": [
+        "ResourceID INTEGER", "ProvisioningMode0 TEXT", "TimeStamp TEXT",
+    ],
+    "v_CH_ClientSummary": [
+        "ResourceID INTEGER", "ClientActiveStatus INTEGER", "IsActiveDDR INTEGER",
+        "IsActiveHW INTEGER", "LastDDR TEXT", "LastHW TEXT", "LastPolicyRequest TEXT",
+    ],
+    "v_CombinedDeviceResources": [
+        "MachineID INTEGER", "PendingReboot INTEGER", "LastHardwareScan TEXT",
+    ],
+    "v_UpdateInfo": [
+        "CI_ID INTEGER PRIMARY KEY", "Title TEXT", "ArticleID TEXT", "BulletinID TEXT",
+        "Severity INTEGER", "UpdateClassification TEXT", "DatePosted TEXT",
+        "IsDeployed INTEGER",
+    ],
+    "v_UpdateComplianceStatus": [
+        "ResourceID INTEGER", "CI_ID INTEGER", "Status INTEGER",
+    ],
+    "v_UpdateScanStatus": [
+        "ResourceID INTEGER", "LastScanTime TEXT", "LastScanState INTEGER",
+    ],
+    "v_AuthListInfo": ["CI_UniqueID TEXT", "Title TEXT"],
+    "v_CIAssignment": [
+        "AssignmentID INTEGER PRIMARY KEY", "AssignmentType INTEGER",
+        "AssignedCI_UniqueID TEXT", "CI_ID INTEGER",
+    ],
+    "v_AssignmentTargetedMachines": ["AssignmentID INTEGER", "ResourceID INTEGER"],
+    "v_DeploymentSummary": [
+        "AssignmentID INTEGER", "CollectionName TEXT", "NumberTotal INTEGER",
+        "NumberSuccess INTEGER", "NumberInProgress INTEGER", "NumberErrors INTEGER",
+        "NumberUnknown INTEGER",
+    ],
+    "fn_ListApplicationCIs": [
+        "CI_ID INTEGER PRIMARY KEY", "DisplayName TEXT", "Manufacturer TEXT",
+        "SoftwareVersion TEXT", "IsDeployed INTEGER", "IsEnabled INTEGER",
+        "NumberOfDeploymentTypes INTEGER", "DateCreated TEXT", "DateLastModified TEXT",
+    ],
+    "v_AppIntentAssetData": [
+        "MachineID INTEGER", "AppCI INTEGER", "ComplianceState INTEGER",
+        "EnforcementState INTEGER",
+    ],
+    "v_Collection": [
+        "CollectionID TEXT PRIMARY KEY", "Name TEXT", "Comment TEXT",
+        "MemberCount INTEGER", "CollectionType INTEGER", "RefreshType INTEGER",
+        "LimitToCollectionName TEXT",
+    ],
+    "v_FullCollectionMembership": [
+        "CollectionID TEXT", "ResourceID INTEGER", "IsDirect INTEGER",
+    ],
+}
+
+INDEXES = [
+    ("v_GS_OPERATING_SYSTEM", "ResourceID"),
+    ("v_GS_COMPUTER_SYSTEM", "ResourceID"),
+    ("v_GS_SYSTEM_ENCLOSURE", "ResourceID"),
+    ("v_GS_X86_PC_MEMORY", "ResourceID"),
+    ("v_GS_LOGICAL_DISK", "ResourceID"),
+    ("v_GS_BITLOCKER_DETAILS", "ResourceID"),
+    ("v_GS_FIRMWARE", "ResourceID"),
+    ("v_GS_TPM", "ResourceID"),
+    ("v_GS_WINDOWS_DEFENDER_STATUS", "ResourceID"),
+    ("v_GS_ADD_REMOVE_PROGRAMS", "ResourceID"),
+    ("v_CH_ClientSummary", "ResourceID"),
+    ("v_UpdateComplianceStatus", "ResourceID"),
+    ("v_FullCollectionMembership", "ResourceID"),
+]
+
+# ── Synthetic Data Pools ─────────────────────────────────────────────────────
+SITES = ["HQ-Site", "Branch-A", "Branch-B", "Branch-C", "DataCenter"]
+CLIENT_VERSIONS = ["5.00.9128.1007", "5.00.9122.1009", "5.00.9114.1012", "5.00.9106.1000"]
+WORKSTATION_OS = [
+    # (Caption, Version, Build, weight)
+    ("Microsoft Windows 11 Enterprise", "10.0.26100", "26100", 30),
+    ("Microsoft Windows 11 Enterprise", "10.0.22631", "22631", 18),
+    ("Microsoft Windows 10 Enterprise", "10.0.19045", "19045", 28),
+    ("Microsoft Windows 11 Pro", "10.0.26100", "26100", 10),
+    ("Microsoft Windows 11 Pro", "10.0.22631", "22631", 5),
+    ("Microsoft Windows 10 Pro", "10.0.19045", "19045", 9),
+]
+SERVER_OS = [
+    ("Microsoft Windows Server 2022 Standard", "10.0.20348", "20348", 35),
+    ("Microsoft Windows Server 2019 Standard", "10.0.17763", "17763", 28),
+    ("Microsoft Windows Server 2022 Datacenter", "10.0.20348", "20348", 12),
+    ("Microsoft Windows Server 2016 Standard", "10.0.14393", "14393", 10),
+    ("Microsoft Windows Server 2019 Datacenter", "10.0.17763", "17763", 8),
+    ("Microsoft Windows Server 2012 R2 Standard", "6.3.9600", "9600", 5),
+]
+MODELS = [
+    # (Manufacturer, Model, ChassisTypes0, weight)
+    ("Dell Inc.", "Latitude 5540", 9, 145),
+    ("Dell Inc.", "OptiPlex 7090", 3, 130),
+    ("LENOVO", "ThinkPad T14 Gen 4", 10, 115),
+    ("HP", "EliteBook 840 G10", 10, 95),
+    ("Dell Inc.", "Latitude 7440", 9, 85),
+    ("LENOVO", "ThinkCentre M90q", 35, 70),
+    ("Microsoft Corporation", "Virtual Machine", 1, 60),
+    ("HP", "ProDesk 400 G7", 4, 55),
+]
+RAM_GB = [(4, 3), (8, 18), (16, 45), (32, 28), (64, 6)]
+PROCESSORS = [
+    ("Intel(R) Core(TM) i5-1345U", 10, 12),
+    ("Intel(R) Core(TM) i7-1365U", 10, 12),
+    ("Intel(R) Core(TM) i7-10700", 8, 16),
+    ("Intel(R) Xeon(R) Gold 6338", 32, 64),
+]
+SOFTWARE = [
+    # (DisplayName, Version, Publisher, install probability)
+    ("Microsoft 365 Apps for enterprise", "16.0.17328.20184", "Microsoft Corporation", 0.95),
+    ("Google Chrome", "120.0.6099.130", "Google LLC", 0.9),
+    ("Microsoft Edge", "120.0.2210.91", "Microsoft Corporation", 0.99),
+    ("Adobe Acrobat Reader DC", "23.008.20470", "Adobe Inc.", 0.7),
+    ("7-Zip 23.01 (x64)", "23.01", "Igor Pavlov", 0.5),
+    ("Zoom Workplace", "6.0.2", "Zoom Video Communications, Inc.", 0.6),
+    ("Notepad++ (64-bit x64)", "8.6.2", "Notepad++ Team", 0.2),
+    ("Microsoft Visual C++ 2015-2022 Redistributable (x64)", "14.38.33130", "Microsoft Corporation", 0.97),
+    ("Mozilla Firefox (x64 en-US)", "121.0", "Mozilla", 0.25),
+    ("VLC media player", "3.0.20", "VideoLAN", 0.3),
+]
+UPDATE_CLASSES = ["Security Updates", "Critical Updates", "Definition Updates",
+                  "Update Rollups", "Feature Packs"]
+UPDATE_GROUPS = ["2026-01 Security Updates", "2026-02 Security Updates",
+                 ".NET Framework Updates", "Microsoft 365 Updates"]
+APPLICATIONS = [
+    ("Microsoft 365 Apps", "Microsoft"), ("Google Chrome", "Google"),
+    ("Adobe Acrobat Reader", "Adobe"), ("Zoom Workplace", "Zoom"),
+    ("7-Zip", "Igor Pavlov"), ("Notepad++", "Don Ho"),
+]
+SERVER_ROLES = ["AD-Domain-Services", "DNS", "DHCP", "File-Services", "Web-Server",
+                "Print-Services", "Hyper-V", "WSUS"]
+
+DATE_FMT = "%Y-%m-%d %H:%M:%S"
+
+
+def _weighted(rng, pool):
+    return rng.choices(pool, weights=[p[-1] for p in pool])[0]
+
+
+def _ts(dt):
+    return dt.strftime(DATE_FMT) if dt else None
+
+
+# ── Data Generation ──────────────────────────────────────────────────────────
+def create_standin(path, devices=1000, seed=1, server_ratio=0.08):
+    """Create (or replace) a stand-in site database with synthetic devices."""
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+
+    conn = sqlite3.connect(path)
+    for table, columns in SCHEMA.items():
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    for table, column in INDEXES:
+        conn.execute(f"CREATE INDEX ix_{table}_{column} ON {table} ({column})")
+
+    rows = {table: [] for table in SCHEMA}
+    for i in range(devices):
+        rid = 16777216 + i
+        is_server = rng.random() < server_ratio
+        name = f"SRV-{i:05d}" if is_server else f"PC-{i:05d}"
+        user = f"user{rng.randrange(devices):05d}"
+        has_client = rng.random() > 0.035
+        caption, version, build, _ = _weighted(rng, SERVER_OS if is_server else WORKSTATION_OS)
+
+        rows["v_R_System_Valid"].append((
+            rid, name, user, rng.choice(SITES), int(has_client),
+            rng.choice(CLIENT_VERSIONS) if has_client else None, caption,
+        ))
+        if not has_client:
+            continue
+
+        installed = now - timedelta(days=rng.randrange(30, 1500))
+        booted = now - timedelta(days=rng.randrange(0, 60), hours=rng.randrange(24))
+        rows["v_GS_OPERATING_SYSTEM"].append(
+            (rid, caption, version, build, None, _ts(installed), _ts(booted)))
+
+        manufacturer, model, chassis, _ = _weighted(rng, MODELS)
+        rows["v_GS_COMPUTER_SYSTEM"].append(
+            (rid, manufacturer, model, "x64-based PC", 2 if is_server else 1))
+        rows["v_GS_SYSTEM_ENCLOSURE"].append((rid, 23 if is_server else chassis))
+        ram, _ = _weighted(rng, RAM_GB)
+        rows["v_GS_X86_PC_MEMORY"].append((rid, ram * 1024 * 1024))
+        rows["v_GS_PC_BIOS"].append((rid, f"SN{rng.randrange(10**8):08d}"))
+        proc = PROCESSORS[3] if is_server else rng.choice(PROCESSORS[:3])
+        rows["v_GS_PROCESSOR"].append((rid,) + proc)
+        rows["v_GS_SYSTEM_CONSOLE_USAGE"].append((rid, f"CONTOSO\\{user}"))
+
+        size_mb = rng.choice([119, 237, 476, 953]) * 1024
+        free_mb = int(size_mb * rng.betavariate(2, 3))
+        rows["v_GS_LOGICAL_DISK"].append((rid, "C:", "OS", "NTFS", 3, size_mb, free_mb))
+        if rng.random() < 0.25:
+            rows["v_GS_LOGICAL_DISK"].append(
+                (rid, "D:", "Data", "NTFS", 3, 953 * 1024, rng.randrange(953 * 1024)))
+
+        if rng.random() < 0.95:
+            protected = rng.random() < 0.86
+            rows["v_GS_BITLOCKER_DETAILS"].append((
+                rid, "C:", int(protected), 1 if protected else rng.choice([0, 2, 3]),
+                "XTS-AES 128", "Tpm, NumericalPassword" if protected else None,
+            ))
+        if rng.random() < 0.95:
+            rows["v_GS_FIRMWARE"].append((rid, int(rng.random() < 0.9), int(rng.random() < 0.95)))
+        if rng.random() < 0.96:
+            activated = int(rng.random() < 0.94)
+            rows["v_GS_TPM"].append(
+                (rid, activated, activated, activated, "2.0, 0, 1.59", "7.2.3.1"))
+        if rng.random() < 0.97:
+            sig = now - timedelta(days=rng.choice([0, 0, 0, 1, 1, 2, 5, 9, 20]),
+                                  hours=rng.randrange(24))
+            rows["v_GS_WINDOWS_DEFENDER_STATUS"].append((
+                rid, int(rng.random() < 0.98), int(rng.random() < 0.96),
+                f"1.403.{rng.randrange(100, 999)}.0", _ts(sig), "1.1.23110.2",
+            ))
+
+        last_ddr = now - timedelta(days=int(rng.expovariate(1 / 6)), hours=rng.randrange(24))
+        last_hw = last_ddr - timedelta(days=rng.randrange(0, 7))
+        rows["v_CH_ClientSummary"].append((
+            rid, 1 if (now - last_ddr).days < 30 else 0, 1, 1,
+            _ts(last_ddr), _ts(last_hw), _ts(last_ddr + timedelta(minutes=5)),
+        ))
+        rows["v_CombinedDeviceResources"].append(
+            (rid, int(rng.random() < 0.07), _ts(last_hw)))
+        rows["v_UpdateScanStatus"].append(
+            (rid, _ts(last_ddr - timedelta(hours=rng.randrange(48))), rng.choice([2, 2, 2, 3])))
+
+        for display, ver, publisher, prob in SOFTWARE:
+            if rng.random() < prob:
+                rows["v_GS_ADD_REMOVE_PROGRAMS"].append(
+                    (rid, display, ver, publisher, installed.strftime("%Y-%m-%d")))
+
+        if is_server:
+            for fid, role in enumerate(SERVER_ROLES, start=10):
+                if rng.random() < 0.3:
+                    rows["v_GS_SERVER_FEATURE"].append((rid, role, fid, 1))
+            rows["v_GS_REGISTRY"].append((
+                rid, "HKLM\\SYSTEM\\CurrentControlSet\\Control\\SecurityProviders\\"
+                     "SCHANNEL\\Protocols\\TLS 1.0\\Server",
+                "Enabled", rng.choice(["0", "1"]),
+            ))
+        if rng.random() < 0.01:
+            rows["v_GS_PROVISIONINGMODE0"].append((rid, "true", _ts(last_hw)))
+
+    _seed_updates(rng, now, rows)
+    _seed_applications(rng, now, rows)
+    _seed_collections(rng, rows)
+
+    for table, data in rows.items():
+        if data:
+            marks = ", ".join("?" * len(data[0]))
+            conn.executemany(f"INSERT INTO {table} VALUES ({marks})", data)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _client_ids(rows):
+    return [r[0] for r in rows["v_GS_OPERATING_SYSTEM"]]
+
+
+def _seed_updates(rng, now, rows):
+    ci_id = 16800000
+    per_class = {}
+    for cls in UPDATE_CLASSES:
+        for n in range(8):
+            ci_id += 1
+            severity = rng.choice([10, 8, 6, 2, 0]) if cls != "Definition Updates" else 0
+            rows["v_UpdateInfo"].append((
+                ci_id, f"{cls[:-1]} for Windows (KB50{ci_id % 100000:05d})",
+                f"50{ci_id % 100000:05d}", "", severity, cls,
+                _ts(now - timedelta(days=rng.randrange(5, 120))), 1,
+            ))
+            per_class.setdefault(cls, []).append(ci_id)
+
+    clients = _client_ids(rows)
+    missing_rate = {cls: rng.uniform(0.03, 0.2) for cls in UPDATE_CLASSES}
+    for rid in clients:
+        for cls, cis in per_class.items():
+            for cid in rng.sample(cis, 3):
+                status = 2 if rng.random() < missing_rate[cls] else 3
+                rows["v_UpdateComplianceStatus"].append((rid, cid, status))
+
+    for aid, title in enumerate(UPDATE_GROUPS, start=1):
+        unique_id = f"ScopeId_SUG/AuthList_{aid:04d}"
+        rows["v_AuthListInfo"].append((unique_id, title))
+        rows["v_CIAssignment"].append((aid, 5, unique_id, None))
+        for rid in clients:
+            if rng.random() < 0.9:
+                rows["v_AssignmentTargetedMachines"].append((aid, rid))
+
+
+def _seed_applications(rng, now, rows):
+    clients = _client_ids(rows)
+    for n, (app, manufacturer) in enumerate(APPLICATIONS, start=1):
+        ci_id = 16900000 + n
+        aid = 100 + n
+        created = now - timedelta(days=rng.randrange(60, 900))
+        rows["fn_ListApplicationCIs"].append((
+            ci_id, app, manufacturer, None, 1, 1, 1,
+            _ts(created), _ts(created + timedelta(days=rng.randrange(30))),
+        ))
+        rows["v_CIAssignment"].append((aid, 2, None, ci_id))
+        targeted = [rid for rid in clients if rng.random() < 0.8]
+        counts = {"success": 0, "progress": 0, "errors": 0, "unknown": 0}
+        for rid in targeted:
+            roll = rng.random()
+            if roll < 0.93:
+                outcome, compliance, state = "success", 1, 1000
+            elif roll < 0.96:
+                outcome, compliance, state = "progress", 2, 2000
+            elif roll < 0.99:
+                outcome, compliance, state = "errors", 3, rng.choice([4000, 5000, 5001])
+            else:
+                outcome, compliance, state = "unknown", 4, 0
+            counts[outcome] += 1
+            rows["v_AppIntentAssetData"].append((rid, ci_id, compliance, state))
+        rows["v_DeploymentSummary"].append((
+            aid, "All Workstations", len(targeted), counts["success"],
+            counts["progress"], counts["errors"], counts["unknown"],
+        ))
+
+
+def _seed_collections(rng, rows):
+    devices = [r[0] for r in rows["v_R_System_Valid"]]
+    collections = [
+        ("SMS00001", "All Systems", devices),
+        ("PS100010", "All Workstations", [d for d, r in zip(devices, rows["v_R_System_Valid"])
+                                          if r[1].startswith("PC-")]),
+        ("PS100011", "All Servers", [d for d, r in zip(devices, rows["v_R_System_Valid"])
+                                     if r[1].startswith("SRV-")]),
+        ("PS100012", "Pilot Ring", rng.sample(devices, min(50, len(devices)))),
+        ("PS100013", "Decommissioned Devices", []),
+    ]
+    for cid, name, members in collections:
+        rows["v_Collection"].append((
+            cid, name, "", len(members), 2, rng.choice([1, 2, 4, 6]),
+            None if cid == "SMS00001" else "All Systems",
+        ))
+        for rid in members:
+            rows["v_FullCollectionMembership"].append((cid, rid, int(name == "Pilot Ring")))
+
+
+# ── T-SQL Translation ────────────────────────────────────────────────────────
+_TVF_CALL = re.compile(r"\b(fn_\w+)\s*\(\s*\d+\s*\)")
+_DATE_UNIT = re.compile(r"\b(DATEDIFF|DATEADD)\s*\(\s*(\w+)\s*,", re.IGNORECASE)
+_NET_FORMAT = [("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"),
+               ("ss", "%S")]
+_CONVERT_TYPE = re.compile(r"\bCONVERT\s*\(\s*(N?(?:VAR)?CHAR\s*\(\s*\d+\s*\))\s*,",
+                           re.IGNORECASE)
+_CAST_TODAY = re.compile(r"\bCAST\s*\(\s*GETDATE\s*\(\s*\)\s+AS\s+DATE\s*\)", re.IGNORECASE)
+# CONVERT(VARCHAR(n), datetime, style) styles, truncated to n characters
+_CONVERT_STYLES = {120: "%Y-%m-%d %H:%M:%S", 121: "%Y-%m-%d %H:%M:%S", 23: "%Y-%m-%d"}
+_UNIT_SECONDS = {"DAY": 86400, "DD": 86400, "HOUR": 3600, "HH": 3600,
+                 "MINUTE": 60, "MI": 60, "SECOND": 1, "SS": 1}
+
+
+# Batches: statement splitting, SELECT ... INTO #temp and session settings
+_BATCH_TOKEN = re.compile(r"'(?:[^']|'')*'|--[^\n]*|;|\?")
+_SELECT_INTO = re.compile(r"^\s*SELECT\s+(.*?)\s+INTO\s+#(\w+)\s+(FROM\b.*)$",
+                          re.IGNORECASE | re.DOTALL)
+_TEMP_TABLE = re.compile(r"#(\w+)")
+_SESSION_SET = re.compile(r"^\s*SET\s+NOCOUNT\b", re.IGNORECASE)
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+# Reporting schema (reporting_schema.py): rpt.X is the table rpt_X
+_REPORTING_TABLE = re.compile(r"\brpt\.(\w+)")
+_OFFSET_FETCH = re.compile(r"\bOFFSET\s+(\d+)\s+ROWS\s+FETCH\s+NEXT\s+(\S+)\s+ROWS\s+ONLY\b",
+                           re.IGNORECASE)
+
+
+def translate_tsql(sql):
+    """Rewrite T-SQL-only syntax used by the query library into SQLite syntax."""
+    sql = _TVF_CALL.sub(r"\1", sql)
+    sql = _SELECT_INTO.sub(r"CREATE TEMP TABLE \2 AS SELECT \1 \3", sql)
+    sql = _TEMP_TABLE.sub(r"\1", sql)
+    sql = _REPORTING_TABLE.sub(r"rpt_\1", sql)
+    sql = _OFFSET_FETCH.sub(r"LIMIT \2 OFFSET \1", sql)
+    sql = _CAST_TODAY.sub("date(GETDATE())", sql)
+    sql = _CONVERT_TYPE.sub(lambda m: f"CONVERT('{' '.join(m.group(1).upper().split())}',", sql)
+    return _DATE_UNIT.sub(lambda m: f"{m.group(1)}('{m.group(2).upper()}',", sql)
+
+
+def split_batch(sql, parameters=()):
+    """Split a ;-separated batch into (statement, parameters) pairs."""
+    statements, start, markers, used = [], 0, 0, 0
+    for m in _BATCH_TOKEN.finditer(sql):
+        if m.group(0) == "?":
+            markers += 1
+        elif m.group(0) == ";":
+            statements.append((sql[start:m.start()], tuple(parameters[used:used + markers])))
+            start, used, markers = m.end(), used + markers, 0
+    statements.append((sql[start:], tuple(parameters[used:used + markers])))
+    return [(stmt, params) for stmt, params in statements
+            if _LINE_COMMENT.sub("", stmt).strip() and not _SESSION_SET.match(stmt)]
+
+
+def _parse_dt(value):
+    if value is None:
+        return None
+    return datetime.strptime(value[:19], DATE_FMT) if len(value) > 10 \
+        else datetime.strptime(value, "%Y-%m-%d")
+
+
+def _format(value, pattern):
+    dt = _parse_dt(value)
+    if dt is None:
+        return None
+    for net, py in _NET_FORMAT:
+        pattern = pattern.replace(net, py)
+    return dt.strftime(pattern)
+
+
+def _convert(sql_type, value, style):
+    dt = _parse_dt(value)
+    if dt is None:
+        return None
+    length = int(re.search(r"\d+", sql_type).group())
+    return dt.strftime(_CONVERT_STYLES[style])[:length]
+
+
+def _datediff(unit, start, end):
+    start, end = _parse_dt(start), _parse_dt(end)
+    if start is None or end is None:
+        return None
+    if unit in ("DAY", "DD"):
+        return (end.date() - start.date()).days
+    return int((end - start).total_seconds() // _UNIT_SECONDS[unit])
+
+
+def _dateadd(unit, amount, value):
+    dt = _parse_dt(value)
+    if dt is None:
+        return None
+    return _ts(dt + timedelta(seconds=amount * _UNIT_SECONDS[unit]))
+
+
+class StandinCursor(sqlite3.Cursor):
+    """
+    Cursor that translates T-SQL and enforces the connection's query timeout.
+    Like pyodbc, a ;-separated batch is accepted: execute() stops at the first
+    statement that returns rows and nextset() moves on to the next one.
+    """
+
+    _pending = ()
+
+    def execute(self, sql, parameters=()):
+        conn = self.connection
+        if conn.timeout:
+            deadline = time.monotonic() + conn.timeout
+            conn.set_progress_handler(lambda: time.monotonic() > deadline, 10000)
+        else:
+            conn.set_progress_handler(None, 0)
+        self._pending = split_batch(sql, parameters) or [("SELECT 1 WHERE 0", ())]
+        self._advance()
+        return self
+
+    def _advance(self):
+        while self._pending:
+            (stmt, params), self._pending = self._pending[0], self._pending[1:]
+            super().execute(translate_tsql(stmt), params)
+            if self.description is not None:
+                return True
+        return False
+
+    def nextset(self):
+        return self._advance()
+
+
+class StandinConnection(sqlite3.Connection):
+    """sqlite3 connection with a pyodbc-style ``timeout`` attribute (seconds)."""
+
+    timeout = 0
+
+    def cursor(self, factory=StandinCursor):
+        return super().cursor(factory)
+
+
+def connect_standin(path):
+    """Open the stand-in database for use from any worker thread."""
+    conn = sqlite3.connect(path, factory=StandinConnection, check_same_thread=False)
+    conn.create_function("FORMAT", 2, _format, deterministic=True)
+    conn.create_function("CONVERT", 3, _convert, deterministic=True)
+    conn.create_function("DATEDIFF", 3, _datediff, deterministic=True)
+    conn.create_function("DATEADD", 3, _dateadd, deterministic=True)
+    conn.create_function("GETDATE", 0, lambda: _ts(datetime.now()))
+    return conn
+
+
+# ── Main ─────────────────────────────────────────────────────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Create a synthetic MECM site database.")
+    parser.add_argument("path", help="SQLite file to create (replaced if it exists)")
+    parser.add_argument("--devices", type=int, default=1000, help="number of devices")
+    parser.add_argument("--seed", type=int, default=1, help="random seed")
+    args = parser.parse_args()
+
+    create_standin(args.path, devices=args.devices, seed=args.seed)
+    print(f"Stand-in database created: {args.path} ({args.devices} devices)")
+
+
+if __name__ == "__main__":
+    main()
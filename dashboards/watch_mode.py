@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Watch Mode
+
+Keeps the dashboard workbook current from a long-running process
+(generate_dashboard.py --watch). The query catalog is parsed once, and the
+database connection pool and a sheet-builder process pool stay open between
+cycles.
+
+Each dashboard sheet is refreshed on its own schedule: the shortest cache TTL
+among the queries it reads (15 minutes for client health and security, 1
+hour for updates and applications, 6 hours for inventory), or
+--watch-interval. When sheets fall due, only their queries run. Every
+result set is hashed, and a sheet is rebuilt only when the hash of one of
+its queries changed. Rebuilt sheets are built as separate parts (see
+parallel_build.py) and assembled with the unchanged sheets' parts from
+earlier cycles. When nothing changed, the .xlsx is not written at all.
+
+A query that fails keeps its last good result. Which queries a sheet reads
+is found at startup by running each builder against empty results.
+"""
+
+import hashlib
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import generate_dashboard as gd
+from parallel_build import assemble_workbook, build_part
+from query_executor import run_queries
+
+
+class _QueryRecorder(dict):
+    """Empty live results that record the query names a sheet builder reads."""
+
+    def __init__(self):
+        super().__init__()
+        self.names = []
+
+    def get(self, name, default=None):
+        if name not in self.names:
+            self.names.append(name)
+        return default
+
+
+def builder_queries(builders):
+    """Builder name -> the live queries it reads, in the order it reads them."""
+    wb = gd.DashboardWorkbook()
+    wb.remove(wb.active)
+    reads = {}
+    for builder in builders:
+        recorder = _QueryRecorder()
+        builder(wb, recorder)
+        reads[builder.__name__] = recorder.names
+    return reads
+
+
+def result_hash(res):
+    """Content hash of one result set (columns and rows)."""
+    return hashlib.sha256(repr((res["columns"], res["rows"])).encode("utf-8")).hexdigest()
+
+
+class DashboardWatcher:
+    """Scheduling, change detection and partial rebuilds for --watch."""
+
+    def __init__(self, args, pool, executor, workdir):
+        self.args = args
+        self.pool = pool
+        self.executor = executor
+        self.workdir = workdir
+        self.sql_files = gd.build_query_catalog()
+        if args.summary_tables:
+            from reporting_schema import summary_catalog
+            self.sql_files = summary_catalog(self.sql_files)
+        self.catalog = gd.apply_profiles(gd.top_n_catalog(self.sql_files, args.top_n),
+                                         args.conn_profile)
+        self.conn_list = gd.connection_list(self.sql_files, args.data_url, args.conn_profile)
+        self.builders = [b.__name__ for b in gd.SHEET_BUILDERS]
+        self.reads = builder_queries(gd.SHEET_BUILDERS)
+        self.intervals = {b: args.watch_interval or min(self.catalog[q]["ttl"]
+                                                        for q in self.reads[b])
+                          for b in self.builders}
+        self.next_due = {b: 0.0 for b in self.builders}
+        self.live, self.hashes, self.parts = {}, {}, {}
+
+    def run_cycle(self):
+        """Refresh the sheets that are due; returns the builders rebuilt."""
+        start = time.perf_counter()
+        now = time.monotonic()
+        due = [b for b in self.builders if self.next_due[b] <= now]
+        names = list(dict.fromkeys(q for b in due for q in self.reads[b]))
+        results = run_queries(self.pool, {n: self.catalog[n] for n in names},
+                              workers=self.args.workers, timeout=self.args.query_timeout,
+                              log=lambda msg: None,
+                              batches=gd.live_batches(self.args))
+        changed = []
+        for name, res in results.items():
+            if res["error"]:
+                # Only good results are kept; a query that never succeeded stays empty
+                print(f"  [watch] {name}: FAILED - {res['error']}; "
+                      + ("keeping the last result" if name in self.live
+                         else "its table stays empty"))
+                continue
+            digest = result_hash(res)
+            if self.hashes.get(name) != digest:
+                self.hashes[name] = digest
+                self.live[name] = res
+                changed.append(name)
+        for b in due:
+            self.next_due[b] = now + self.intervals[b]
+
+        stale = [b for b in self.builders
+                 if b not in self.parts or set(self.reads[b]) & set(changed)]
+        query_seconds = time.perf_counter() - start
+        if not stale:
+            print(f"[watch] {len(names)} queries in {query_seconds:.2f}s, no result changed; "
+                  f"{self.args.output} left as is")
+            return stale
+        futures = {b: self.executor.submit(build_part, ("builder", b), self.args,
+                                           {q: self.live[q] for q in self.reads[b]
+                                            if q in self.live}, self.workdir)
+                   for b in stale}
+        for b, future in futures.items():
+            self.parts[b] = future.result()
+        assemble_workbook(self.args, [self.parts[b] for b in self.builders], self.sql_files,
+                          self.conn_list, self.executor, self.workdir)
+        print(f"[watch] {len(names)} queries in {query_seconds:.2f}s, {len(changed)} changed "
+              f"({', '.join(changed)}); rebuilt {len(stale)} of {len(self.builders)} sheets, "
+              f"wrote {self.args.output} in {time.perf_counter() - start - query_seconds:.2f}s")
+        return stale
+
+    def seconds_to_next(self):
+        return max(0.0, min(self.next_due.values()) - time.monotonic())
+
+
+def interval_text(seconds):
+    if seconds >= 3600:
+        return f"{seconds / 3600:g}h"
+    return f"{seconds / 60:g} min" if seconds >= 60 else f"{seconds:g}s"
+
+
+def watch(args):
+    """Run the dashboard in watch mode until interrupted (or --watch-cycles)."""
+    if args.sites or args.detail or args.device_facts or args.changes:
+        raise SystemExit("--watch does not support --sites, --detail, --device-facts or "
+                         "--changes")
+    if not (args.live or args.standin):
+        raise SystemExit("--watch needs --live or --standin")
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    # SIGTERM (service stop) unwinds like Ctrl+C, so the pools and parts are cleaned up
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    connect, target = gd.live_target(args, args.conn_profile)
+    if args.summary_tables:
+        gd.check_summary_tables(connect, target, args.query_timeout)
+    processes = args.processes or os.cpu_count() or 1
+    workdir = tempfile.mkdtemp(prefix="mecm_watch_",
+                               dir=os.path.dirname(os.path.abspath(args.output)))
+    try:
+        with gd.profile_pools(args, args.pool_size or args.workers) as pool, \
+                ProcessPoolExecutor(max_workers=processes) as executor:
+            watcher = DashboardWatcher(args, pool, executor, workdir)
+            print(f"Watching {target}: " + ", ".join(
+                f"{b.replace('build_', '')} every {interval_text(watcher.intervals[b])}"
+                for b in watcher.builders))
+            cycles = 0
+            while True:
+                watcher.run_cycle()
+                cycles += 1
+                if args.watch_cycles and cycles >= args.watch_cycles:
+                    break
+                time.sleep(watcher.seconds_to_next())
+    except KeyboardInterrupt:
+        print("Watch stopped.")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)